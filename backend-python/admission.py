@@ -0,0 +1,303 @@
+"""Admission control: per-client rate limits and a bounded concurrency gate.
+
+Every API request passes two checks before it reaches a handler:
+
+1. A token bucket per (route budget, client). The client is the ``X-User-Id``
+   header or ``user_id`` query parameter when present, else the remote
+   address. User ids are client-supplied (there is no auth here), so this is
+   protection against runaway clients, not against a determined attacker.
+   Over budget -> ``429`` with ``Retry-After``.
+2. A concurrency gate sized to what the DB pool can usefully serve (four
+   requests per connection by default). Beyond ``ADMISSION_CONCURRENCY``
+   in-flight requests, requests wait in a FIFO queue for at most
+   ``ADMISSION_MAX_WAIT_MS``; when the queue is full or the wait runs out -> ``503`` with ``Retry-After``. Rejecting early
+   keeps the latency of admitted requests flat instead of letting thousands of
+   coroutines queue inside ``pool.acquire()``.
+
+Buckets live in process memory by default (each worker enforces its own
+budget). Set ``RATE_LIMIT_URL=redis://host:6379/0`` to share them across
+workers and hosts; if Redis is unreachable the in-memory buckets take over.
+
+Environment:
+  RATE_LIMIT_ENABLED       0 disables rate limiting (default 1)
+  RATE_LIMITS              overrides, e.g. ``like=2:10,default=50:100`` (rate/s:burst)
+  RATE_LIMIT_URL           shared bucket store (default: in memory)
+  ADMISSION_CONCURRENCY    in-flight requests before queueing (default 4 x DB_POOL_SIZE, 0 disables)
+  ADMISSION_QUEUE_SIZE     waiting requests before 503 (default 100)
+  ADMISSION_MAX_WAIT_MS    longest queue wait (default 1000)
+"""
+import os
+import re
+import math
+import json
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from typing import Deque, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs
+
+import metrics
+
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') != '0'
+RATE_LIMITS = os.getenv('RATE_LIMITS', '')
+RATE_LIMIT_URL = os.getenv('RATE_LIMIT_URL', '')
+ADMISSION_CONCURRENCY = int(os.getenv('ADMISSION_CONCURRENCY') or 4 * int(os.getenv('DB_POOL_SIZE', '5')))
+ADMISSION_QUEUE_SIZE = int(os.getenv('ADMISSION_QUEUE_SIZE', '100'))
+ADMISSION_MAX_WAIT_MS = float(os.getenv('ADMISSION_MAX_WAIT_MS', '1000'))
+# Clients tracked by the in-memory store; the least recently seen are forgotten
+MAX_BUCKETS = 100_000
+# Long-lived or DB-free endpoints that must never queue behind API traffic
+EXEMPT_PREFIXES = ("/api/health", "/metrics", "/api/media/")
+EXEMPT_SUFFIXES = ("/events",)
+
+logger = logging.getLogger("admission")
+
+
+class Budget(NamedTuple):
+    name: str
+    methods: Tuple[str, ...]
+    pattern: "re.Pattern"
+    rate: float   # tokens per second
+    burst: float  # bucket size
+
+
+# First match wins; "default" catches the rest of /api
+BUDGETS: List[Budget] = [
+    Budget("like", ("POST",), re.compile(r"^/api/journeys/[^/]+/like$"), 2, 10),
+    Budget("exchanges", ("GET",), re.compile(r"^/api/memory-exchanges/[^/]+$"), 1, 5),
+    Budget("batch_reads", ("POST",), re.compile(r"^/api/[a-z-]+:batchGet$"), 10, 30),
+    Budget("uploads", ("POST",), re.compile(r"^/api/(media|albums/[^/]+/photos)$"), 1, 10),
+    Budget("writes", ("POST", "PUT", "PATCH", "DELETE"), re.compile(r"^/api/"), 5, 20),
+    Budget("default", ("GET", "HEAD"), re.compile(r"^/api/"), 20, 60),
+]
+
+
+def _apply_overrides(budgets: List[Budget], spec: str) -> List[Budget]:
+    overrides = {}
+    for part in spec.split(","):
+        name, _, value = part.strip().partition("=")
+        if not value:
+            continue
+        rate, _, burst = value.partition(":")
+        overrides[name] = (float(rate), float(burst or rate))
+    return [b._replace(rate=overrides[b.name][0], burst=overrides[b.name][1]) if b.name in overrides else b
+            for b in budgets]
+
+
+BUDGETS = _apply_overrides(BUDGETS, RATE_LIMITS)
+
+
+def match_budget(method: str, path: str) -> Optional[Budget]:
+    for budget in BUDGETS:
+        if method in budget.methods and budget.pattern.match(path):
+            return budget
+    return None
+
+
+def client_key(scope) -> str:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-user-id" and value:
+            return "user:" + value.decode("latin-1")
+    query = scope.get("query_string", b"")
+    if b"user_id=" in query:
+        user_id = parse_qs(query.decode("latin-1")).get("user_id")
+        if user_id and user_id[0]:
+            return "user:" + user_id[0]
+    client = scope.get("client")
+    return "ip:" + (client[0] if client else "unknown")
+
+
+# ---------- Token buckets ----------
+class LocalBuckets:
+    def __init__(self, max_buckets: int = MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        """Spend one token; 0 if allowed, else seconds until one is available."""
+        now = time.monotonic()
+        tokens, stamp = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - stamp) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return wait
+
+    async def close(self):
+        self._buckets.clear()
+
+
+# Same arithmetic as LocalBuckets, atomic in Redis and timed by the Redis clock
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'stamp')
+local tokens = tonumber(state[1]) or burst
+local stamp = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - stamp) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'stamp', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBuckets(LocalBuckets):
+    """Buckets shared by every worker; falls back to local buckets while Redis is down."""
+
+    def __init__(self, url: str):
+        super().__init__()
+        import redis.asyncio as aioredis  # optional dependency
+
+        self._redis = aioredis.from_url(url)
+        self._take = self._redis.register_script(_TAKE_SCRIPT)
+        self._warned = False
+
+    async def take(self, key: str, rate: float, burst: float) -> float:
+        try:
+            wait = float(await self._take(keys=["ratelimit:" + key], args=[rate, burst]))
+            self._warned = False
+            return wait
+        except Exception as e:
+            if not self._warned:
+                logger.warning("rate limit store unavailable, using local buckets", extra={"fields": {"error": repr(e)}})
+                self._warned = True
+            return await super().take(key, rate, burst)
+
+    async def close(self):
+        await self._redis.aclose()
+        await super().close()
+
+
+_buckets: Optional[LocalBuckets] = None
+
+
+def get_buckets() -> LocalBuckets:
+    global _buckets
+    if _buckets is None:
+        _buckets = RedisBuckets(RATE_LIMIT_URL) if RATE_LIMIT_URL else LocalBuckets()
+    return _buckets
+
+
+async def close_buckets():
+    global _buckets
+    if _buckets is not None:
+        await _buckets.close()
+        _buckets = None
+
+
+# ---------- Concurrency gate ----------
+class ConcurrencyLimiter:
+    """At most ``limit`` holders; the rest wait in FIFO order, up to ``queue_size`` of them."""
+
+    def __init__(self, limit: int = ADMISSION_CONCURRENCY, queue_size: int = ADMISSION_QUEUE_SIZE,
+                 max_wait: float = ADMISSION_MAX_WAIT_MS / 1000):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """None once admitted, else why not: ``queue_full`` or ``timeout``."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return None
+        if len(self._waiters) >= self.queue_size:
+            return "queue_full"
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(fut, self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if fut.done() and not fut.cancelled():
+                # Granted just as we gave up: hand the slot on
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            return "timeout"
+        finally:
+            metrics.admission_wait_duration.observe(value=time.perf_counter() - start)
+        return None  # the releasing request passed its slot to us
+
+    def release(self):
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self.active -= 1
+
+
+# ---------- ASGI middleware ----------
+async def _reject(send, status: int, retry_after: float, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode("latin-1")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """Rate limits, then admits through the concurrency gate, before the app sees a request."""
+
+    def __init__(self, app, limiter: Optional[ConcurrencyLimiter] = None):
+        self.app = app
+        self.limiter = limiter or ConcurrencyLimiter()
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        method = scope.get("method", "GET")
+        if (
+            scope["type"] != "http" or method == "OPTIONS"
+            or path.startswith(EXEMPT_PREFIXES) or path.endswith(EXEMPT_SUFFIXES)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        if RATE_LIMIT_ENABLED:
+            budget = match_budget(method, path)
+            if budget is not None:
+                wait = await get_buckets().take(f"{budget.name}:{client_key(scope)}", budget.rate, budget.burst)
+                if wait > 0:
+                    metrics.admission_rejected_total.inc("rate_limited", budget.name)
+                    await _reject(send, 429, wait, "Too many requests")
+                    return
+
+        if self.limiter.limit <= 0:
+            await self.app(scope, receive, send)
+            return
+        refused = await self.limiter.acquire()
+        if refused is not None:
+            metrics.admission_rejected_total.inc(refused, "")
+            await _reject(send, 503, self.limiter.max_wait, "Server busy, retry shortly")
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release()
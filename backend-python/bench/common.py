@@ -0,0 +1,113 @@
+"""Shared helpers for the benchmark scripts: deterministic IDs and synthetic data.
+
+Seeded rows use ``uuid5`` IDs derived from (kind, index), so the load test can
+address any seeded journey/album/circle without reading IDs back from the DB.
+"""
+import os
+import sys
+import json
+import random
+import uuid
+from datetime import date, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+MANIFEST_PATH = os.path.join(RESULTS_DIR, "seed_manifest.json")
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+_NAMESPACE = uuid.UUID("6f1d3c0e-8d7a-4b8e-9a57-5e1a0c9b7d21")
+
+AIRPORTS = [
+    ("DEL", "New Delhi", "India"), ("BKK", "Bangkok", "Thailand"), ("DPS", "Bali", "Indonesia"),
+    ("JFK", "New York", "United States"), ("LHR", "London", "United Kingdom"), ("CDG", "Paris", "France"),
+    ("NRT", "Tokyo", "Japan"), ("SYD", "Sydney", "Australia"), ("DXB", "Dubai", "United Arab Emirates"),
+    ("SIN", "Singapore", "Singapore"), ("HKG", "Hong Kong", "Hong Kong"), ("ICN", "Seoul", "South Korea"),
+    ("BCN", "Barcelona", "Spain"), ("FCO", "Rome", "Italy"), ("AMS", "Amsterdam", "Netherlands"),
+    ("FRA", "Frankfurt", "Germany"), ("LAX", "Los Angeles", "United States"),
+    ("SFO", "San Francisco", "United States"), ("YYZ", "Toronto", "Canada"), ("MEX", "Mexico City", "Mexico"),
+    ("GRU", "São Paulo", "Brazil"), ("EZE", "Buenos Aires", "Argentina"), ("CAI", "Cairo", "Egypt"),
+    ("JNB", "Johannesburg", "South Africa"), ("IST", "Istanbul", "Turkey"),
+]
+KEYWORDS = [
+    "beach", "mountains", "food", "culture", "nightlife", "museums", "hiking", "temples", "markets",
+    "sunset", "islands", "street food", "architecture", "wildlife", "festival", "road trip", "coffee",
+    "history", "art", "snow", "diving", "train", "desert", "family", "friends", "solo", "romance",
+]
+JOURNEY_TYPES = ["solo", "family", "friends", "couple", "business"]
+PLANT_TYPES = ["rose", "tulip", "sunflower", "lotus", "orchid", "lily", "daisy", "cherry_blossom"]
+WORDS = (
+    "we wandered through narrow streets at dawn and found a tiny cafe where the owner told stories "
+    "about the harbour the old market the festival lights and the long train ride along the coast"
+).split()
+
+
+def make_id(kind: str, index: int) -> str:
+    return str(uuid.uuid5(_NAMESPACE, f"{kind}-{index}"))
+
+
+def user_id(index: int) -> str:
+    return f"bench_user_{index}"
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_legs(rng: random.Random, count: int) -> list:
+    start = date(2020, 1, 1) + timedelta(days=rng.randint(0, 1800))
+    stops = rng.sample(AIRPORTS, count + 1)
+    legs = []
+    for i in range(count):
+        (frm, from_city, from_country), (to, to_city, to_country) = stops[i], stops[i + 1]
+        legs.append({
+            "from": frm, "to": to,
+            "fromCity": from_city, "toCity": to_city,
+            "fromCountry": from_country, "toCountry": to_country,
+            "date": (start + timedelta(days=i * 3)).isoformat(),
+            "notes": sentence(rng, rng.randint(8, 40)),
+        })
+    return legs
+
+
+def make_cultural_insights(rng: random.Random, legs: list) -> dict:
+    return {
+        leg["toCity"]: {
+            "tradition": sentence(rng, 12),
+            "food": sentence(rng, 8),
+            "etiquette": sentence(rng, 10),
+        }
+        for leg in legs
+    }
+
+
+def journey_payload(rng: random.Random, owner: str) -> dict:
+    legs = make_legs(rng, rng.randint(1, 6))
+    return {
+        "user_id": owner,
+        "title": f"{legs[0]['fromCity']} to {legs[-1]['toCity']}",
+        "description": sentence(rng, 20),
+        "journey_type": rng.choice(JOURNEY_TYPES),
+        "departure_date": legs[0]["date"],
+        "return_date": legs[-1]["date"],
+        "legs": legs,
+        "keywords": rng.sample(KEYWORDS, rng.randint(2, 6)),
+        "ai_story": " ".join(sentence(rng, 20) for _ in range(rng.randint(5, 25))),
+        "similarity_score": round(rng.random() * 100, 2),
+        "rarity_score": round(rng.random() * 100, 2),
+        "cultural_insights": make_cultural_insights(rng, legs),
+        "visibility": "public" if rng.random() < 0.8 else "private",
+    }
+
+
+def load_manifest() -> dict:
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+def save_json(path: str, data: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
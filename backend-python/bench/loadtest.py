@@ -0,0 +1,405 @@
+"""Mixed read/write load test against every API route.
+
+    python bench/seed.py --scale 1
+    python bench/loadtest.py --duration 60 --concurrency 32
+    python bench/loadtest.py --compare bench/results/<earlier run>.json
+
+By default the app is booted with uvicorn on a free port using the current
+DB_* environment; pass ``--url`` to target a server that is already running.
+Per-endpoint throughput and p50/p95/p99 latencies are printed and written to
+``bench/results/<timestamp>.json``. With ``--compare`` the exit code is 1 if any
+endpoint's p95 or throughput regressed by more than ``--threshold`` percent.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from common import (
+    BACKEND_DIR, RESULTS_DIR, KEYWORDS, JOURNEY_TYPES,
+    journey_payload, load_manifest, make_id, save_json, sentence, user_id,
+)
+
+# ---------- Workload ----------
+# (name, weight, route template, builder) ; builder(ctx) -> (method, path, json body or None)
+Request = Tuple[str, str, Optional[dict]]
+
+
+class Context:
+    def __init__(self, cfg: dict, rng: random.Random):
+        self.cfg = cfg
+        self.rng = rng
+        # IDs created during the run, so update/delete routes have targets
+        self.created: Dict[str, List[str]] = defaultdict(list)
+
+    def pick(self, kind: str, count_key: str) -> str:
+        return make_id(kind, self.rng.randrange(self.cfg[count_key]))
+
+    def user(self) -> str:
+        return user_id(self.rng.randrange(self.cfg["users"]))
+
+    def take(self, kind: str, fallback: Callable[[], str]) -> str:
+        items = self.created[kind]
+        return items.pop() if items else fallback()
+
+
+def w_list_journeys(c): return "GET", f"/api/journeys?limit=20&journey_type={c.rng.choice(JOURNEY_TYPES + ['all'])}", None
+def w_user_journeys(c): return "GET", f"/api/users/{c.user()}/journeys", None
+def w_get_journey(c): return "GET", f"/api/journeys/{c.pick('journey', 'journeys')}", None
+def w_create_journey(c): return "POST", "/api/journeys", journey_payload(c.rng, c.user())
+def w_update_journey(c): return "PUT", f"/api/journeys/{c.pick('journey', 'journeys')}", {"description": sentence(c.rng, 15)}
+def w_batch_get_journeys(c):
+    return "POST", "/api/journeys:batchGet", {"ids": [c.pick('journey', 'journeys') for _ in range(c.rng.randint(2, 12))]}
+def w_trending_journeys(c): return "GET", f"/api/journeys/trending?window={c.rng.choice(['24h', '7d'])}&limit=20", None
+def w_top_journeys(c): return "GET", f"/api/journeys/top?window={c.rng.choice(['24h', '7d', 'all'])}&limit=20", None
+def w_like_journey(c): return "POST", f"/api/journeys/{c.pick('journey', 'journeys')}/like", None
+def w_delete_journey(c): return "DELETE", f"/api/journeys/{c.take('journey', lambda: make_id('missing', 0))}", None
+def w_feed(c): return "GET", f"/api/users/{c.user()}/feed?limit=20", None
+
+def w_list_albums(c): return "GET", f"/api/albums?user_id={user_id(c.rng.randrange(c.cfg['albums']) % c.cfg['users'])}", None
+def w_get_album(c): return "GET", f"/api/albums/{c.pick('album', 'albums')}", None
+def w_create_album(c): return "POST", "/api/albums", {"user_id": c.user(), "title": sentence(c.rng, 3)}
+def w_update_album(c): return "PUT", f"/api/albums/{c.pick('album', 'albums')}", {"description": sentence(c.rng, 8)}
+def w_delete_album(c): return "DELETE", f"/api/albums/{c.take('album', lambda: make_id('missing', 0))}", None
+def w_list_photos(c): return "GET", f"/api/albums/{c.pick('album', 'albums')}/photos?width={c.rng.choice([320, 640])}", None
+def w_create_photo(c):
+    return "POST", f"/api/albums/{c.pick('album', 'albums')}/photos", {
+        "user_id": c.user(), "image_url": f"https://example.com/p/{c.rng.random()}.jpg", "caption": sentence(c.rng, 5)}
+def w_update_photo(c):
+    a = c.rng.randrange(c.cfg["albums"])
+    p = a * c.cfg["photos_per_album"] + c.rng.randrange(c.cfg["photos_per_album"])
+    return "PUT", f"/api/albums/{make_id('album', a)}/photos/{make_id('photo', p)}", {"caption": sentence(c.rng, 4)}
+def w_delete_photo(c): return "DELETE", f"/api/albums/{c.pick('album', 'albums')}/photos/{make_id('missing', 0)}", None
+def w_list_pages(c): return "GET", f"/api/albums/{c.pick('album', 'albums')}/pages", None
+def w_put_page(c): return "PUT", f"/api/albums/{c.pick('album', 'albums')}/pages/{c.rng.randint(1, 8)}", {"content": sentence(c.rng, 30)}
+def w_post_page(c): return "POST", f"/api/albums/{c.pick('album', 'albums')}/pages", {"page_number": c.rng.randint(1, 8), "content": sentence(c.rng, 30)}
+
+def w_list_plans(c): return "GET", f"/api/users/{c.user()}/plans", None
+def w_create_plan(c): return "POST", "/api/plans", {"user_id": c.user(), "destination": sentence(c.rng, 2)}
+def w_update_plan(c): return "PUT", f"/api/plans/{c.pick('plan', 'plans')}", {"notes": sentence(c.rng, 10)}
+def w_delete_plan(c): return "DELETE", f"/api/plans/{c.take('plan', lambda: make_id('missing', 0))}", None
+
+def w_create_circle(c): return "POST", "/api/memory-circles", {"name": sentence(c.rng, 2), "owner_id": c.user()}
+def w_list_circles(c): return "GET", f"/api/memory-circles?user_id={c.user()}", None
+def w_get_circle(c): return "GET", f"/api/memory-circles/{c.pick('circle', 'circles')}", None
+def w_add_circle_member(c): return "POST", f"/api/memory-circles/{c.pick('circle', 'circles')}/members", {"user_id": c.user()}
+def w_share_circle(c):
+    return "POST", f"/api/memory-circles/{c.pick('circle', 'circles')}/journeys", {
+        "journey_id": c.pick("journey", "journeys"), "shared_by": c.user()}
+
+def w_create_journal(c): return "POST", "/api/collaborative-journals", {"title": sentence(c.rng, 3), "created_by": c.user()}
+def w_list_journals(c): return "GET", f"/api/collaborative-journals?user_id={c.user()}", None
+def w_get_journal(c): return "GET", f"/api/collaborative-journals/{c.pick('journal', 'journals')}", None
+def w_journal_header(c): return "GET", f"/api/collaborative-journals/{c.pick('journal', 'journals')}/header", None
+def w_journal_entries(c): return "GET", f"/api/collaborative-journals/{c.pick('journal', 'journals')}/entries?limit=50", None
+def w_add_entry(c):
+    return "POST", f"/api/collaborative-journals/{c.pick('journal', 'journals')}/entries", {
+        "user_id": c.user(), "user_name": "Bench", "content": sentence(c.rng, 25)}
+def w_add_journal_member(c): return "POST", f"/api/collaborative-journals/{c.pick('journal', 'journals')}/members", {"user_id": c.user()}
+
+def w_create_memory(c):
+    return "POST", "/api/anonymous-memories", {
+        "journey_id": c.pick("journey", "journeys"), "user_id": c.user(), "title": sentence(c.rng, 3),
+        "story": sentence(c.rng, 60), "location": "Paris, France", "keywords": c.rng.sample(KEYWORDS, 3)}
+def w_list_memories(c): return "GET", f"/api/anonymous-memories?travel_type={c.rng.choice(JOURNEY_TYPES)}", None
+def w_memory_matches(c):
+    m = c.rng.randrange(c.cfg["memories"])
+    return "GET", f"/api/anonymous-memories/{make_id('memory', m)}/matches?user_id={user_id(m % c.cfg['users'])}", None
+def w_match_exchange(c):
+    m = c.rng.randrange(c.cfg["memories"])
+    return "POST", "/api/memory-exchanges/match", {"user_id": user_id(m % c.cfg["users"]), "memory_id": make_id("memory", m)}
+def w_create_exchange(c):
+    return "POST", "/api/memory-exchanges", {
+        "user1_id": c.user(), "user2_id": c.user(),
+        "memory1_id": c.pick("memory", "memories"), "memory2_id": c.pick("memory", "memories")}
+def w_user_exchanges(c): return "GET", f"/api/memory-exchanges/{c.user()}", None
+
+def w_add_friend(c): return "POST", "/api/friends", {"user_id": c.user(), "friend_id": c.user()}
+def w_list_friends(c): return "GET", f"/api/friends?user_id={c.user()}", None
+def w_suggestions(c): return "GET", f"/api/friends/suggestions?user_id={c.user()}", None
+def w_mutual(c): return "GET", f"/api/friends/{c.user()}/mutual/{c.user()}", None
+def w_delete_friend(c): return "DELETE", f"/api/friends/{make_id('missing', 0)}", None
+
+def w_get_garden(c): return "GET", f"/api/garden/{c.user()}", None
+def w_garden_compact(c): return "GET", f"/api/garden/{c.user()}?layout=compact", None
+def w_water(c): return "POST", f"/api/garden/water/{c.pick('plant', 'journeys')}", None
+def w_water_all(c): return "POST", f"/api/garden/{c.user()}/water-all", None
+
+def w_health(c): return "GET", "/api/health", None
+def w_ready(c): return "GET", "/api/health/ready", None
+def w_metrics(c): return "GET", "/metrics", None
+
+
+WORKLOAD = [
+    # journeys: read heavy
+    ("list_journeys", 12, "GET /api/journeys", w_list_journeys),
+    ("get_user_journeys", 6, "GET /api/users/{user_id}/journeys", w_user_journeys),
+    ("get_journey", 12, "GET /api/journeys/{journey_id}", w_get_journey),
+    ("create_journey", 2, "POST /api/journeys", w_create_journey),
+    ("update_journey", 1, "PUT /api/journeys/{journey_id}", w_update_journey),
+    ("batch_get_journeys", 4, "POST /api/journeys:batchGet", w_batch_get_journeys),
+    ("trending_journeys", 4, "GET /api/journeys/trending", w_trending_journeys),
+    ("top_journeys", 2, "GET /api/journeys/top", w_top_journeys),
+    ("like_journey", 3, "POST /api/journeys/{journey_id}/like", w_like_journey),
+    ("delete_journey", 0.5, "DELETE /api/journeys/{journey_id}", w_delete_journey),
+    ("get_feed", 8, "GET /api/users/{user_id}/feed", w_feed),
+    # albums
+    ("list_albums", 3, "GET /api/albums", w_list_albums),
+    ("get_album", 3, "GET /api/albums/{album_id}", w_get_album),
+    ("create_album", 0.5, "POST /api/albums", w_create_album),
+    ("update_album", 0.5, "PUT /api/albums/{album_id}", w_update_album),
+    ("delete_album", 0.2, "DELETE /api/albums/{album_id}", w_delete_album),
+    ("list_photos", 5, "GET /api/albums/{album_id}/photos", w_list_photos),
+    ("create_photo", 1, "POST /api/albums/{album_id}/photos", w_create_photo),
+    ("update_photo", 0.5, "PUT /api/albums/{album_id}/photos/{photo_id}", w_update_photo),
+    ("delete_photo", 0.2, "DELETE /api/albums/{album_id}/photos/{photo_id}", w_delete_photo),
+    ("list_pages", 2, "GET /api/albums/{album_id}/pages", w_list_pages),
+    ("update_page", 0.5, "PUT /api/albums/{album_id}/pages/{page_number}", w_put_page),
+    ("upsert_page", 0.5, "POST /api/albums/{album_id}/pages", w_post_page),
+    # plans
+    ("list_plans", 2, "GET /api/users/{user_id}/plans", w_list_plans),
+    ("create_plan", 0.5, "POST /api/plans", w_create_plan),
+    ("update_plan", 0.5, "PUT /api/plans/{plan_id}", w_update_plan),
+    ("delete_plan", 0.2, "DELETE /api/plans/{plan_id}", w_delete_plan),
+    # circles
+    ("create_memory_circle", 0.3, "POST /api/memory-circles", w_create_circle),
+    ("list_memory_circles", 2, "GET /api/memory-circles", w_list_circles),
+    ("get_memory_circle", 3, "GET /api/memory-circles/{circle_id}", w_get_circle),
+    ("add_circle_member", 0.3, "POST /api/memory-circles/{circle_id}/members", w_add_circle_member),
+    ("share_journey_to_circle", 0.5, "POST /api/memory-circles/{circle_id}/journeys", w_share_circle),
+    # journals
+    ("create_collaborative_journal", 0.3, "POST /api/collaborative-journals", w_create_journal),
+    ("list_collaborative_journals", 2, "GET /api/collaborative-journals", w_list_journals),
+    ("get_collaborative_journal", 2, "GET /api/collaborative-journals/{journal_id}", w_get_journal),
+    ("get_collaborative_journal_header", 2, "GET /api/collaborative-journals/{journal_id}/header", w_journal_header),
+    ("list_journal_entries", 4, "GET /api/collaborative-journals/{journal_id}/entries", w_journal_entries),
+    ("add_journal_entry", 1.5, "POST /api/collaborative-journals/{journal_id}/entries", w_add_entry),
+    ("add_journal_member", 0.3, "POST /api/collaborative-journals/{journal_id}/members", w_add_journal_member),
+    # anonymous exchange
+    ("create_anonymous_memory", 0.5, "POST /api/anonymous-memories", w_create_memory),
+    ("list_anonymous_memories", 2, "GET /api/anonymous-memories", w_list_memories),
+    ("list_memory_matches", 1, "GET /api/anonymous-memories/{memory_id}/matches", w_memory_matches),
+    ("match_memory_exchange", 0.3, "POST /api/memory-exchanges/match", w_match_exchange),
+    ("create_memory_exchange", 0.3, "POST /api/memory-exchanges", w_create_exchange),
+    ("get_user_exchanges", 1, "GET /api/memory-exchanges/{user_id}", w_user_exchanges),
+    # friends
+    ("add_friend", 0.5, "POST /api/friends", w_add_friend),
+    ("list_friends", 3, "GET /api/friends", w_list_friends),
+    ("friend_suggestions", 1, "GET /api/friends/suggestions", w_suggestions),
+    ("mutual_friends", 1, "GET /api/friends/{user_id}/mutual/{other_id}", w_mutual),
+    ("delete_friend", 0.2, "DELETE /api/friends/{friend_id}", w_delete_friend),
+    # garden
+    ("get_garden", 3, "GET /api/garden/{user_id}", w_get_garden),
+    ("get_garden_compact", 1, "GET /api/garden/{user_id}", w_garden_compact),
+    ("water_plant", 1, "POST /api/garden/water/{plant_id}", w_water),
+    ("water_all_plants", 0.3, "POST /api/garden/{user_id}/water-all", w_water_all),
+    # ops
+    ("health", 0.5, "GET /api/health", w_health),
+    ("readiness", 0.5, "GET /api/health/ready", w_ready),
+    ("metrics", 0.1, "GET /metrics", w_metrics),
+]
+# Long-lived streams are not request/response, and media needs binary fixtures
+UNBENCHED_ROUTES = {
+    "GET /api/collaborative-journals/{journal_id}/events",
+    "POST /api/media",
+    "GET /api/media/{key}",
+    "GET /api/health/live",  # same handler as /api/health
+}
+
+
+def uncovered_routes() -> List[str]:
+    """Routes registered on the app that no workload entry exercises."""
+    sys.path.insert(0, BACKEND_DIR)
+    from main import app
+
+    covered = {w[2] for w in WORKLOAD} | UNBENCHED_ROUTES
+    missing = []
+    for route in app.routes:
+        for method in sorted(getattr(route, "methods", None) or ()):
+            if method in ("HEAD", "OPTIONS") or route.path.startswith(("/docs", "/redoc", "/openapi")):
+                continue
+            key = f"{method} {route.path}"
+            if key not in covered:
+                missing.append(key)
+    return missing
+
+
+# ---------- Runner ----------
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+async def worker(client: httpx.AsyncClient, ctx: Context, deadline: float, samples, errors):
+    names = [w[0] for w in WORKLOAD]
+    weights = [w[1] for w in WORKLOAD]
+    builders = {w[0]: w[3] for w in WORKLOAD}
+    while time.perf_counter() < deadline:
+        name = ctx.rng.choices(names, weights)[0]
+        method, path, body = builders[name](ctx)
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, path, json=body)
+            status = resp.status_code
+        except httpx.HTTPError:
+            status = 0
+        samples[name].append(time.perf_counter() - start)
+        if status == 0 or status >= 500:
+            errors[name] += 1
+        elif method == "POST" and status == 201 and name in ("create_journey", "create_album", "create_plan"):
+            kind = {"create_journey": "journey", "create_album": "album", "create_plan": "plan"}[name]
+            ctx.created[kind].append(resp.json().get("id"))
+
+
+def summarize(samples, errors, elapsed: float) -> dict:
+    endpoints = {}
+    total = 0
+    for name, values in sorted(samples.items()):
+        values.sort()
+        total += len(values)
+        endpoints[name] = {
+            "count": len(values),
+            "errors": errors.get(name, 0),
+            "rps": round(len(values) / elapsed, 2),
+            "mean_ms": round(sum(values) / len(values) * 1000, 2),
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    return {"endpoints": endpoints, "total_requests": total, "total_rps": round(total / elapsed, 2)}
+
+
+def print_table(summary: dict):
+    print(f"{'endpoint':36s} {'count':>8s} {'err':>5s} {'rps':>8s} {'p50':>8s} {'p95':>8s} {'p99':>8s}")
+    for name, s in summary["endpoints"].items():
+        print(f"{name:36s} {s['count']:>8d} {s['errors']:>5d} {s['rps']:>8.1f} "
+              f"{s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f}")
+    print(f"\ntotal: {summary['total_requests']} requests, {summary['total_rps']} req/s")
+
+
+def compare(current: dict, baseline_path: str, threshold: float) -> bool:
+    import json
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)["summary"]["endpoints"]
+    regressed = False
+    print(f"\n{'endpoint':36s} {'p95 base':>9s} {'p95 now':>9s} {'Δp95':>8s} {'rps Δ':>8s}")
+    for name, now in current["endpoints"].items():
+        base = baseline.get(name)
+        if not base or not base["p95_ms"] or not base["rps"]:
+            continue
+        d_p95 = (now["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100
+        d_rps = (now["rps"] - base["rps"]) / base["rps"] * 100
+        flag = ""
+        if d_p95 > threshold or d_rps < -threshold:
+            flag = "  REGRESSION"
+            regressed = True
+        print(f"{name:36s} {base['p95_ms']:>9.1f} {now['p95_ms']:>9.1f} {d_p95:>+7.1f}% {d_rps:>+7.1f}%{flag}")
+    return regressed
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_ready(url: str, timeout: float = 60.0):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/api/health/ready")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"server at {url} did not become ready")
+
+
+async def run(args) -> int:
+    manifest = load_manifest()
+    cfg = dict(manifest["config"])
+    cfg["plans"] = cfg["users"] * 2
+
+    missing = uncovered_routes() if not args.url else []
+    if missing:
+        print("warning: routes without a workload entry:\n  " + "\n  ".join(missing))
+
+    server = None
+    url = args.url
+    if not url:
+        port = free_port()
+        url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND_DIR,
+            env={**os.environ, "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+                 # One client replaying many users would trip the per-client budgets
+                 "RATE_LIMIT_ENABLED": os.getenv("RATE_LIMIT_ENABLED", "0")},
+        )
+    try:
+        await wait_ready(url)
+        samples: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+            if args.warmup:
+                await asyncio.gather(*[
+                    worker(client, Context(cfg, random.Random(1000 + i)), time.perf_counter() + args.warmup, defaultdict(list), defaultdict(int))
+                    for i in range(args.concurrency)
+                ])
+            start = time.perf_counter()
+            await asyncio.gather(*[
+                worker(client, Context(cfg, random.Random(args.seed + i)), start + args.duration, samples, errors)
+                for i in range(args.concurrency)
+            ])
+            elapsed = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    summary = summarize(samples, errors, elapsed)
+    print_table(summary)
+    rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                         capture_output=True, text=True).stdout.strip()
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    out = args.output or os.path.join(RESULTS_DIR, f"{stamp}-{rev or 'local'}.json")
+    save_json(out, {
+        "timestamp": stamp, "git_rev": rev, "url": args.url or "local",
+        "params": {"duration": args.duration, "concurrency": args.concurrency, "seed": args.seed},
+        "seed_manifest": manifest, "summary": summary,
+    })
+    print(f"results written to {out}")
+    if args.compare and compare(summary, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="benchmark an already running server instead of booting one")
+    parser.add_argument("--duration", type=float, default=30.0, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=5.0, help="unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="results file (default bench/results/<timestamp>-<rev>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
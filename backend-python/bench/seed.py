@@ -0,0 +1,255 @@
+"""Seed a local MySQL/MariaDB database with benchmark-sized data.
+
+    python bench/seed.py --scale 1        # ~100k journeys, 200k photos, 200k friend rows
+    python bench/seed.py --scale 20       # ~2M journeys
+
+Connection settings come from the usual DB_* environment variables. Point
+them at a throwaway database: seeding truncates every table it fills.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from common import (
+    KEYWORDS, JOURNEY_TYPES, PLANT_TYPES, AIRPORTS, MANIFEST_PATH,
+    journey_payload, make_id, save_json, sentence, user_id,
+)
+
+import db
+
+BASE = {
+    "users": 10000,
+    "journeys": 100000,
+    "albums": 5000,
+    "photos_per_album": 40,
+    "circles": 1000,
+    "circle_size": 50,
+    "friends_per_user": 20,
+    "memories": 50000,
+    "journals": 500,
+    "entries_per_journal": 200,
+}
+
+TABLES = [
+    "albums", "album_photos", "album_pages", "future_plans", "journeys", "journey_likes",
+    "memory_circles", "memory_circle_members", "memory_circle_journeys",
+    "collaborative_journals", "collaborative_journal_members", "collaborative_journal_entries",
+    "anonymous_memories", "memory_exchanges", "user_friends", "memory_garden_plants",
+    "user_feed_entries", "feed_pull_sources",
+]
+
+
+def ts(rng: random.Random, days: int = 720) -> datetime:
+    return datetime(2024, 1, 1) + timedelta(seconds=rng.randint(0, days * 86400))
+
+
+async def bulk_insert(cur, sql: str, rows, batch: int):
+    buf = []
+    total = 0
+    for row in rows:
+        buf.append(row)
+        if len(buf) >= batch:
+            await cur.executemany(sql, buf)
+            total += len(buf)
+            buf = []
+    if buf:
+        await cur.executemany(sql, buf)
+        total += len(buf)
+    return total
+
+
+def journey_rows(cfg, rng):
+    for i in range(cfg["journeys"]):
+        owner = user_id(rng.randrange(cfg["users"]))
+        p = journey_payload(rng, owner)
+        created = ts(rng)
+        yield (
+            make_id("journey", i), owner, p["title"], p["description"], p["journey_type"],
+            p["departure_date"], p["return_date"], json.dumps(p["legs"]), json.dumps(p["keywords"]),
+            p["ai_story"], p["similarity_score"], p["rarity_score"], json.dumps(p["cultural_insights"]),
+            p["visibility"], rng.randint(0, 500), rng.randint(0, 5000), created, created,
+        )
+
+
+def plant_rows(cfg, rng):
+    for i in range(cfg["journeys"]):
+        yield (
+            make_id("plant", i), user_id(i % cfg["users"]), make_id("journey", i),
+            rng.choice(PLANT_TYPES), f"Plant {i}", rng.randint(1, 5), ts(rng), ts(rng, 30) + timedelta(days=690),
+            rng.randint(50, 750), rng.randint(50, 550), "#22c55e",
+        )
+
+
+def album_rows(cfg, rng):
+    for i in range(cfg["albums"]):
+        created = ts(rng)
+        yield (make_id("album", i), user_id(i % cfg["users"]), f"Album {i}", sentence(rng, 10),
+               make_id("journey", rng.randrange(cfg["journeys"])), "public", created, created)
+
+
+def photo_rows(cfg, rng):
+    for a in range(cfg["albums"]):
+        for p in range(cfg["photos_per_album"]):
+            yield (make_id("photo", a * cfg["photos_per_album"] + p), make_id("album", a), user_id(a % cfg["users"]),
+                   f"https://example.com/photos/{a}/{p}.jpg", sentence(rng, 6), p // 6 + 1, None, ts(rng))
+
+
+def friend_rows(cfg, rng):
+    for u in range(cfg["users"]):
+        for f in rng.sample(range(cfg["users"]), min(cfg["friends_per_user"] // 2, cfg["users"] - 1)):
+            if f == u:
+                continue
+            added = ts(rng)
+            for a, b in ((u, f), (f, u)):
+                yield (make_id("friend", a * cfg["users"] + b), user_id(a), user_id(b),
+                       f"User {b}", f"user{b}@example.com", "", "active", added, added)
+
+
+def circle_rows(cfg, rng):
+    for c in range(cfg["circles"]):
+        created = ts(rng)
+        yield (make_id("circle", c), f"Circle {c}", sentence(rng, 8), user_id(c % cfg["users"]), created, created)
+
+
+def circle_member_rows(cfg, rng):
+    for c in range(cfg["circles"]):
+        members = {c % cfg["users"]} | set(rng.sample(range(cfg["users"]), min(cfg["circle_size"], cfg["users"])))
+        for m in members:
+            yield (make_id("circle_member", c * cfg["users"] + m), make_id("circle", c), user_id(m),
+                   "admin" if m == c % cfg["users"] else "member", ts(rng))
+
+
+def circle_journey_rows(cfg, rng):
+    for c in range(cfg["circles"]):
+        for k in range(10):
+            yield (make_id("circle_journey", c * 10 + k), make_id("circle", c),
+                   make_id("journey", rng.randrange(cfg["journeys"])), user_id(c % cfg["users"]), ts(rng))
+
+
+def journal_rows(cfg, rng):
+    for j in range(cfg["journals"]):
+        created = ts(rng)
+        yield (make_id("journal", j), f"Journal {j}", sentence(rng, 10), user_id(j % cfg["users"]), created, created)
+
+
+def journal_member_rows(cfg, rng):
+    for j in range(cfg["journals"]):
+        for k in range(5):
+            u = (j + k * 7) % cfg["users"]
+            yield (make_id("journal_member", j * 5 + k), make_id("journal", j), user_id(u), f"User {u}",
+                   "admin" if k == 0 else "contributor", ts(rng))
+
+
+def journal_entry_rows(cfg, rng):
+    n = cfg["entries_per_journal"]
+    for j in range(cfg["journals"]):
+        for e in range(n):
+            u = (j + (e % 5) * 7) % cfg["users"]
+            yield (make_id("entry", j * n + e), make_id("journal", j), user_id(u), f"User {u}",
+                   sentence(rng, rng.randint(10, 80)), "text", None, rng.choice(AIRPORTS)[1], ts(rng))
+
+
+def memory_rows(cfg, rng):
+    for m in range(cfg["memories"]):
+        _, city, country = rng.choice(AIRPORTS)
+        yield (make_id("memory", m), make_id("journey", rng.randrange(cfg["journeys"])), user_id(m % cfg["users"]),
+               f"Memory {m}", sentence(rng, rng.randint(30, 120)), f"{city}, {country}",
+               rng.choice(JOURNEY_TYPES), json.dumps(rng.sample(KEYWORDS, rng.randint(2, 5))), ts(rng))
+
+
+def plan_rows(cfg, rng):
+    for u in range(cfg["users"]):
+        for k in range(2):
+            created = ts(rng)
+            yield (make_id("plan", u * 2 + k), user_id(u), rng.choice(AIRPORTS)[1], None, None,
+                   sentence(rng, 8), sentence(rng, 12), created, created)
+
+
+STEPS = [
+    ("journeys", """INSERT INTO journeys (id, user_id, title, description, journey_type, departure_date, return_date,
+        legs, keywords, ai_story, similarity_score, rarity_score, cultural_insights, visibility, likes_count,
+        views_count, created_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+     journey_rows),
+    ("memory_garden_plants", """INSERT INTO memory_garden_plants (id, user_id, journey_id, plant_type, plant_name,
+        growth_stage, planted_at, last_watered, position_x, position_y, color)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""", plant_rows),
+    ("albums", """INSERT INTO albums (id, user_id, title, description, journey_id, visibility, created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""", album_rows),
+    ("album_photos", """INSERT INTO album_photos (id, album_id, user_id, image_url, caption, page_number, meta, created_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""", photo_rows),
+    ("user_friends", """INSERT IGNORE INTO user_friends (id, user_id, friend_id, friend_name, friend_email,
+        friend_avatar, status, added_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""", friend_rows),
+    ("memory_circles", """INSERT INTO memory_circles (id, name, description, owner_id, created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s)""", circle_rows),
+    ("memory_circle_members", """INSERT INTO memory_circle_members (id, circle_id, user_id, role, joined_at)
+        VALUES (%s, %s, %s, %s, %s)""", circle_member_rows),
+    ("memory_circle_journeys", """INSERT INTO memory_circle_journeys (id, circle_id, journey_id, shared_by, shared_at)
+        VALUES (%s, %s, %s, %s, %s)""", circle_journey_rows),
+    ("collaborative_journals", """INSERT INTO collaborative_journals (id, title, description, created_by, created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s)""", journal_rows),
+    ("collaborative_journal_members", """INSERT INTO collaborative_journal_members (id, journal_id, user_id, user_name, role, joined_at)
+        VALUES (%s, %s, %s, %s, %s, %s)""", journal_member_rows),
+    ("collaborative_journal_entries", """INSERT INTO collaborative_journal_entries (id, journal_id, user_id, user_name,
+        content, entry_type, image_url, location, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+     journal_entry_rows),
+    ("anonymous_memories", """INSERT INTO anonymous_memories (id, journey_id, original_user_id, title, story, location,
+        travel_type, keywords, created_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""", memory_rows),
+    ("future_plans", """INSERT INTO future_plans (id, user_id, destination, start_date, end_date, reason, notes,
+        created_at, updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)""", plan_rows),
+]
+
+# Feed entries for seeded friendships, built in SQL from the seeded tables
+FEED_SQL = """INSERT IGNORE INTO user_feed_entries (id, user_id, journey_id, actor_id, source_type, source_id, created_at)
+    SELECT UUID(), uf.user_id, j.id, j.user_id, 'friend', j.user_id, j.created_at
+    FROM user_friends uf INNER JOIN journeys j ON j.user_id = uf.friend_id AND j.visibility <> 'private'"""
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier applied to every base volume")
+    parser.add_argument("--batch", type=int, default=1000, help="rows per multi-row INSERT")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--no-feed", action="store_true", help="skip precomputing user_feed_entries")
+    for key, value in BASE.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=int, default=None, help=f"override (base {value})")
+    args = parser.parse_args()
+
+    cfg = {}
+    for key, value in BASE.items():
+        override = getattr(args, key)
+        if override is not None:
+            cfg[key] = override
+        elif key in ("photos_per_album", "circle_size", "friends_per_user", "entries_per_journal"):
+            cfg[key] = value  # per-parent sizes don't scale
+        else:
+            cfg[key] = max(1, int(value * args.scale))
+
+    await db.init_schema()
+    pool = await db.get_pool()
+    rng = random.Random(args.seed)
+    counts = {}
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            for table in TABLES:
+                await cur.execute(f"TRUNCATE TABLE {table}")
+            for table, sql, gen in STEPS:
+                start = time.perf_counter()
+                counts[table] = await bulk_insert(cur, sql, gen(cfg, rng), args.batch)
+                print(f"{table:32s} {counts[table]:>10d} rows  {time.perf_counter() - start:7.1f}s")
+            if not args.no_feed:
+                start = time.perf_counter()
+                await cur.execute(FEED_SQL)
+                counts["user_feed_entries"] = cur.rowcount
+                print(f"{'user_feed_entries':32s} {cur.rowcount:>10d} rows  {time.perf_counter() - start:7.1f}s")
+
+    save_json(MANIFEST_PATH, {"config": cfg, "counts": counts, "seed": args.seed,
+                              "seeded_at": datetime.utcnow().isoformat()})
+    await db.close_pool()
+    print(f"manifest written to {MANIFEST_PATH}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,206 @@
+"""Micro-benchmarks for the journey row -> JSON response path.
+
+    python bench/serialization.py
+    python bench/serialization.py --rows 100 --sizes large
+    python bench/serialization.py --compare bench/results/serialization-<earlier run>.json
+
+Synthetic rows shaped like a ``SELECT {JOURNEY_COLUMNS}`` result (JSON columns
+as strings, DATE/DATETIME objects) are pushed through each stage the list
+endpoints run: building dicts with ``serializers.journey_row`` and encoding them
+with ``serializers.dumps`` (``current``), next to the decode-everything path
+through FastAPI's default ``JSONResponse`` and other encoders. Each case is calibrated to ``--min-time`` per sample and the median of
+``--samples`` samples is reported, pyperf style. No database is needed.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List
+
+from common import BACKEND_DIR, RESULTS_DIR, journey_payload, make_id, save_json, sentence, user_id
+
+import serializers
+from serializers import journey_row
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+except ImportError:
+    jsonable_encoder = JSONResponse = ORJSONResponse = None
+
+# (legs, story sentences) per row size
+SIZES = {"small": (1, 2), "medium": (4, 10), "large": (12, 40)}
+
+
+def make_rows(size: str, count: int, seed: int = 1) -> List[tuple]:
+    """Rows as aiomysql returns them for ``JOURNEY_COLUMNS``."""
+    legs, story = SIZES[size]
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        p = journey_payload(rng, user_id(i))
+        while len(p["legs"]) < legs:
+            p["legs"] += p["legs"][: legs - len(p["legs"])]
+        p["legs"] = p["legs"][:legs]
+        created = datetime(2024, 1, 1) + timedelta(minutes=i)
+        rows.append((
+            make_id("journey", i), p["user_id"], p["title"], p["description"], p["journey_type"],
+            date.fromisoformat(p["departure_date"]), date.fromisoformat(p["return_date"]),
+            json.dumps(p["legs"]), json.dumps(p["keywords"]),
+            " ".join(sentence(rng, 20) for _ in range(story)),
+            p["similarity_score"], p["rarity_score"], json.dumps(p["cultural_insights"]),
+            p["visibility"], rng.randint(0, 500), rng.randint(0, 5000), created, created,
+        ))
+    return rows
+
+
+def stdlib_render(content) -> bytes:
+    """What ``JSONResponse.render`` does, for trees without FastAPI installed."""
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def decoded_journey_row(r) -> dict:
+    """``journey_row`` with the JSON columns parsed, as handlers built it before fragments."""
+    return dict(journey_row(r), legs=json.loads(r[7]) if r[7] else [],
+                keywords=json.loads(r[8]) if r[8] else [],
+                cultural_insights=json.loads(r[12]) if r[12] else {})
+
+
+def build_cases(dicts: list) -> Dict[str, Callable[[list], object]]:
+    """name -> fn(rows). ``current`` is what the handlers do today (``FastJSONResponse``);
+    ``encode_only/*`` reuse decoded ``dicts`` prebuilt from the same rows to isolate the encoder."""
+    cases = {
+        "rows_to_dicts": lambda rows: [journey_row(r) for r in rows],
+        "current": lambda rows: serializers.dumps([journey_row(r) for r in rows]),
+        "decode_json_columns/stdlib": lambda rows: [
+            (json.loads(r[7]), json.loads(r[8]), json.loads(r[12])) for r in rows],
+    }
+    if jsonable_encoder is not None:
+        cases["decoded+JSONResponse"] = lambda rows: JSONResponse(
+            jsonable_encoder([decoded_journey_row(r) for r in rows])).body
+        cases["encode_only/jsonable_encoder+json"] = lambda rows: stdlib_render(jsonable_encoder(dicts))
+    else:
+        cases["decoded+json"] = lambda rows: stdlib_render([decoded_journey_row(r) for r in rows])
+    cases["encode_only/json"] = lambda rows: stdlib_render(dicts)
+    if orjson is not None:
+        cases["decode_json_columns/orjson"] = lambda rows: [
+            (orjson.loads(r[7]), orjson.loads(r[8]), orjson.loads(r[12])) for r in rows]
+        cases["encode_only/orjson"] = lambda rows: orjson.dumps(dicts)
+        cases["decoded+orjson"] = lambda rows: orjson.dumps([decoded_journey_row(r) for r in rows])
+    if ORJSONResponse is not None:
+        cases["decoded+ORJSONResponse"] = lambda rows: ORJSONResponse([decoded_journey_row(r) for r in rows]).body
+    if msgspec is not None:
+        encoder = msgspec.json.Encoder()
+        cases["encode_only/msgspec"] = lambda rows: encoder.encode(dicts)
+        cases["decoded+msgspec"] = lambda rows: encoder.encode([decoded_journey_row(r) for r in rows])
+    return cases
+
+
+def measure(fn: Callable[[list], object], rows: list, samples: int, min_time: float) -> List[float]:
+    """Seconds per call, one value per sample."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn(rows)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed == 0 else max(2, int(min_time / elapsed * 1.2))
+    values = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn(rows)
+        values.append((time.perf_counter() - start) / loops)
+    return values
+
+
+def run(args) -> dict:
+    results = {}
+    for size in args.sizes:
+        rows = make_rows(size, args.rows)
+        dicts = [decoded_journey_row(r) for r in rows]
+        payload = len(stdlib_render(dicts))
+        for name, fn in build_cases(dicts).items():
+            if args.only and not any(o in name for o in args.only):
+                continue
+            values = measure(fn, rows, args.samples, args.min_time)
+            median = statistics.median(values)
+            key = f"{size}/{name}"
+            results[key] = {
+                "median_us": round(median * 1e6, 2),
+                "stdev_us": round(statistics.stdev(values) * 1e6, 2) if len(values) > 1 else 0.0,
+                "us_per_row": round(median * 1e6 / len(rows), 3),
+                "rows_per_s": round(len(rows) / median),
+                "payload_bytes": payload,
+            }
+            r = results[key]
+            print(f"{key:48s} {r['median_us']:>11.1f} us  ±{r['stdev_us']:>8.1f}  "
+                  f"{r['us_per_row']:>8.2f} us/row  {r['rows_per_s']:>10d} rows/s")
+        print()
+    return results
+
+
+def compare(current: dict, baseline_path: str, threshold: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressed = False
+    for key, now in current.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        delta = (now["median_us"] - base["median_us"]) / base["median_us"] * 100
+        flag = "  REGRESSION" if delta > threshold else ""
+        regressed = regressed or bool(flag)
+        print(f"{key:48s} {base['median_us']:>11.1f} -> {now['median_us']:>11.1f} us  {delta:>+7.1f}%{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20, help="rows per response (list_journeys default limit)")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=list(SIZES))
+    parser.add_argument("--only", nargs="+", help="run cases whose name contains any of these")
+    parser.add_argument("--samples", type=int, default=15)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per sample")
+    parser.add_argument("--output", help="results file (default bench/results/serialization-<timestamp>-<rev>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent")
+    args = parser.parse_args()
+
+    results = run(args)
+    rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                         capture_output=True, text=True).stdout.strip()
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    out = args.output or os.path.join(RESULTS_DIR, f"serialization-{stamp}-{rev or 'local'}.json")
+    save_json(out, {
+        "timestamp": stamp, "git_rev": rev, "python": sys.version.split()[0],
+        "params": {"rows": args.rows, "samples": args.samples, "min_time": args.min_time},
+        "libraries": {
+            "orjson": getattr(orjson, "__version__", None),
+            "msgspec": getattr(msgspec, "__version__", None),
+            "fastapi": JSONResponse is not None,
+        },
+        "results": results,
+    })
+    print(f"results written to {out}")
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
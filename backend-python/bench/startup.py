@@ -0,0 +1,156 @@
+"""Cold-start benchmark: how long until a fresh worker can serve traffic.
+
+    python bench/startup.py --runs 10
+    python bench/startup.py --compare bench/results/startup-<earlier run>.json
+
+Each run starts a new interpreter and measures
+
+* ``import_ms``  - ``import main`` (FastAPI, middlewares, every router module),
+  with the per-router share taken from ``routes.load_times``;
+* ``ready_ms``   - from spawning ``uvicorn main:app`` to the first 200 from
+  ``/api/health/ready`` (needs the database from the DB_* environment; the
+  schema is already current after the first run, so later runs skip the DDL).
+
+Medians are printed and written to ``bench/results/startup-<timestamp>-<rev>.json``.
+With ``--compare`` the exit code is 1 if a median regressed by more than
+``--threshold`` percent; with ``--budget-ms`` it is 1 if the median ready time
+exceeds the budget.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from common import BACKEND_DIR, RESULTS_DIR, save_json
+
+IMPORT_PROBE = (
+    "import json, time; t = time.perf_counter(); import main; "
+    "print(json.dumps({'import_s': time.perf_counter() - t, 'routers': main.routes.load_times}))"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_import() -> dict:
+    out = subprocess.run([sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR, env=os.environ,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure_ready(timeout: float) -> float:
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/health/ready"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env={**os.environ, "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING")},
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError, OSError):
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"server not ready after {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def summarize(values) -> dict:
+    return {
+        "median_ms": round(statistics.median(values) * 1000, 1),
+        "min_ms": round(min(values) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1),
+    }
+
+
+def run(args) -> dict:
+    imports, routers, ready = [], {}, []
+    for i in range(args.runs):
+        probe = measure_import()
+        imports.append(probe["import_s"])
+        for name, seconds in probe["routers"].items():
+            routers.setdefault(name, []).append(seconds)
+        line = f"run {i + 1:>2}: import {probe['import_s'] * 1000:7.1f} ms"
+        if not args.import_only:
+            ready.append(measure_ready(args.timeout))
+            line += f"   ready {ready[-1] * 1000:7.1f} ms"
+        print(line)
+
+    results = {"import": summarize(imports)}
+    for name, values in routers.items():
+        results[f"router/{name}"] = summarize(values)
+    if ready:
+        results["ready"] = summarize(ready)
+    print(f"\n{'phase':24s} {'median':>10s} {'min':>10s} {'max':>10s}")
+    for key, r in results.items():
+        print(f"{key:24s} {r['median_ms']:>8.1f}ms {r['min_ms']:>8.1f}ms {r['max_ms']:>8.1f}ms")
+    return results
+
+
+def compare(current: dict, baseline_path: str, threshold: float) -> bool:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+    regressed = False
+    for key, now in current.items():
+        base = baseline.get(key)
+        if not base or not base["median_ms"]:
+            continue
+        delta = (now["median_ms"] - base["median_ms"]) / base["median_ms"] * 100
+        flag = "  REGRESSION" if delta > threshold else ""
+        regressed = regressed or bool(flag)
+        print(f"{key:24s} {base['median_ms']:>8.1f} -> {now['median_ms']:>8.1f} ms  {delta:>+7.1f}%{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-only", action="store_true", help="skip the server start (no database needed)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds to wait for readiness")
+    parser.add_argument("--output", help="results file (default bench/results/startup-<timestamp>-<rev>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="regression threshold in percent")
+    parser.add_argument("--budget-ms", type=float, help="fail if the median ready time exceeds this")
+    args = parser.parse_args()
+
+    results = run(args)
+    rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                         capture_output=True, text=True).stdout.strip()
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    out = args.output or os.path.join(RESULTS_DIR, f"startup-{stamp}-{rev or 'local'}.json")
+    save_json(out, {
+        "timestamp": stamp, "git_rev": rev, "python": sys.version.split()[0],
+        "params": {"runs": args.runs, "import_only": args.import_only},
+        "results": results,
+    })
+    print(f"results written to {out}")
+    failed = False
+    if args.compare:
+        failed = compare(results, args.compare, args.threshold)
+    if args.budget_ms and "ready" in results and results["ready"]["median_ms"] > args.budget_ms:
+        print(f"median ready time {results['ready']['median_ms']} ms exceeds the {args.budget_ms} ms budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Pub/sub broker used to push realtime events (journal entries, members) to clients.
+
+The default broker is in-process, which is enough for a single worker. Set
+``BROKER_URL=redis://host:6379/0`` to relay events through Redis pub/sub so
+every worker sees every publish; any Redis-compatible server (e.g. a local
+``redis-server``) can stand in for development. That needs the optional
+``redis`` package (``pip install redis``). If the Redis connection drops, the
+reader logs it, backs off and resubscribes every topic with local subscribers;
+events published meanwhile are missed.
+"""
+import os
+import json
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Set
+
+BROKER_URL = os.getenv('BROKER_URL', '')
+# Per-subscriber buffer; the oldest events are dropped for slow consumers
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv('BROKER_QUEUE_SIZE', '100'))
+# Backoff between reconnect attempts after the Redis connection fails, in seconds
+RECONNECT_MIN_SECONDS = 0.5
+RECONNECT_MAX_SECONDS = 30.0
+
+logger = logging.getLogger("broker")
+
+
+class LocalBroker:
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._subscribers.get(topic))
+
+    def deliver(self, topic: str, message: dict):
+        for queue in self._subscribers.get(topic, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    async def publish(self, topic: str, message: dict):
+        self.deliver(topic, message)
+
+    async def _on_first_subscriber(self, topic: str):
+        pass
+
+    async def _on_last_unsubscribe(self, topic: str):
+        pass
+
+    @asynccontextmanager
+    async def subscribe(self, topic: str):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        subscribers = self._subscribers.setdefault(topic, set())
+        subscribers.add(queue)
+        if len(subscribers) == 1:
+            await self._on_first_subscriber(topic)
+        try:
+            yield queue
+        finally:
+            subscribers.discard(queue)
+            if not subscribers:
+                self._subscribers.pop(topic, None)
+                await self._on_last_unsubscribe(topic)
+
+    async def close(self):
+        self._subscribers.clear()
+
+
+class RedisBroker(LocalBroker):
+    """Relays publishes through Redis; local subscribers are fed by one reader task per worker."""
+
+    def __init__(self, url: str, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        super().__init__(queue_size)
+        import redis.asyncio as aioredis  # optional dependency
+
+        self._redis = aioredis.from_url(url)
+        self._pubsub = self._redis.pubsub()
+        self._reader: Optional[asyncio.Task] = None
+
+    async def publish(self, topic: str, message: dict):
+        await self._redis.publish(topic, json.dumps(message))
+
+    async def _on_first_subscriber(self, topic: str):
+        await self._pubsub.subscribe(topic)
+        if self._reader is None:
+            self._reader = asyncio.create_task(self._read_loop())
+
+    async def _on_last_unsubscribe(self, topic: str):
+        await self._pubsub.unsubscribe(topic)
+
+    async def _read_loop(self):
+        delay = 0.0
+        while True:
+            try:
+                if delay:
+                    await asyncio.sleep(delay)
+                    await self._resubscribe()
+                    delay = 0.0
+                await self._read_messages()
+            except Exception as e:
+                # Subscribers stay connected, so the stream must come back rather than end silently
+                delay = min(max(delay * 2, RECONNECT_MIN_SECONDS), RECONNECT_MAX_SECONDS)
+                logger.warning("broker read failed, resubscribing", extra={"fields": {
+                    "error": repr(e), "retry_in_s": delay, "topics": len(self._subscribers)}})
+
+    async def _resubscribe(self):
+        """Replace the pub/sub connection and subscribe again to every topic with local subscribers."""
+        old, self._pubsub = self._pubsub, self._redis.pubsub()
+        try:
+            await old.aclose()
+        except Exception:
+            pass
+        if self._subscribers:
+            await self._pubsub.subscribe(*self._subscribers)
+
+    async def _read_messages(self):
+        while True:
+            if not self._pubsub.subscribed:
+                await asyncio.sleep(0.1)
+                continue
+            msg = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if msg is None or msg.get('type') != 'message':
+                continue
+            topic = msg['channel']
+            if isinstance(topic, bytes):
+                topic = topic.decode()
+            try:
+                self.deliver(topic, json.loads(msg['data']))
+            except (TypeError, ValueError):
+                continue
+
+    async def close(self):
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        await self._pubsub.aclose()
+        await self._redis.aclose()
+        await super().close()
+
+
+_broker: Optional[LocalBroker] = None
+
+
+def get_broker() -> LocalBroker:
+    global _broker
+    if _broker is None:
+        _broker = RedisBroker(BROKER_URL) if BROKER_URL else LocalBroker()
+    return _broker
+
+
+async def close_broker():
+    global _broker
+    if _broker is not None:
+        await _broker.close()
+        _broker = None
+
+
+def journal_topic(journal_id: str) -> str:
+    return f"journal:{journal_id}"
@@ -0,0 +1,232 @@
+"""Response compression (zstd, brotli, gzip) with a cache of compressed bodies.
+
+Buffered JSON/text responses of at least ``COMPRESS_MIN_SIZE`` bytes are
+compressed with the best encoding the client accepts. Compressed bodies are
+kept in an LRU keyed by (encoding, digest of the uncompressed body), so a hot
+response - the public journey list, a popular journey - is compressed once and
+then served from memory until its content changes. Streaming responses (SSE)
+and bodies that already carry a Content-Encoding pass through untouched.
+
+brotli and zstd need the optional ``brotli`` / ``zstandard`` packages; gzip
+always works.
+
+Environment:
+  COMPRESS_MIN_SIZE        smallest body worth compressing, in bytes (default 1024)
+  COMPRESS_GZIP_LEVEL      1-9 (default 6)
+  COMPRESS_BROTLI_QUALITY  0-11 (default 4)
+  COMPRESS_ZSTD_LEVEL      1-22 (default 3)
+  COMPRESS_CACHE_BYTES     memory for cached compressed bodies (default 32 MiB, 0 disables)
+"""
+import os
+import gzip
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import metrics
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+COMPRESS_GZIP_LEVEL = int(os.getenv('COMPRESS_GZIP_LEVEL', '6'))
+COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', '4'))
+COMPRESS_ZSTD_LEVEL = int(os.getenv('COMPRESS_ZSTD_LEVEL', '3'))
+COMPRESS_CACHE_BYTES = int(os.getenv('COMPRESS_CACHE_BYTES', str(32 * 1024 * 1024)))
+# Bodies this large are compressed in a worker thread so the event loop keeps serving
+COMPRESS_THREAD_THRESHOLD = 256 * 1024
+COMPRESSIBLE_TYPES = (b"application/json", b"text/", b"application/javascript", b"application/xml", b"image/svg+xml")
+
+
+def _gzip(body: bytes) -> bytes:
+    return gzip.compress(body, compresslevel=COMPRESS_GZIP_LEVEL, mtime=0)
+
+
+def _brotli(body: bytes) -> bytes:
+    return brotli.compress(body, quality=COMPRESS_BROTLI_QUALITY)
+
+
+def _zstd(body: bytes) -> bytes:
+    # Compressor objects are not thread safe; they are cheap to create
+    return zstandard.ZstdCompressor(level=COMPRESS_ZSTD_LEVEL).compress(body)
+
+
+# Server preference order, used to break ties between equally weighted encodings
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {}
+if zstandard is not None:
+    ENCODERS["zstd"] = _zstd
+if brotli is not None:
+    ENCODERS["br"] = _brotli
+ENCODERS["gzip"] = _gzip
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick an encoding from an Accept-Encoding header, honouring q-values."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in ENCODERS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressedCache:
+    """Byte-bounded LRU of compressed bodies."""
+
+    def __init__(self, max_bytes: int = COMPRESS_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items: "OrderedDict[Tuple[str, bytes], bytes]" = OrderedDict()
+
+    def get(self, key: Tuple[str, bytes]) -> Optional[bytes]:
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key: Tuple[str, bytes], value: bytes):
+        # One huge response shouldn't flush everything else
+        if len(value) > self.max_bytes // 8 or key in self._items:
+            return
+        self._items[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+
+cache = CompressedCache()
+
+
+async def compress(body: bytes, encoding: str) -> bytes:
+    key = None
+    if cache.max_bytes > 0:
+        key = (encoding, hashlib.blake2b(body, digest_size=16).digest())
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.http_compression_total.inc(encoding, "hit")
+            return cached
+    encoder = ENCODERS[encoding]
+    if len(body) >= COMPRESS_THREAD_THRESHOLD:
+        compressed = await asyncio.to_thread(encoder, body)
+    else:
+        compressed = encoder(body)
+    metrics.http_compression_total.inc(encoding, "miss")
+    if key is not None:
+        cache.put(key, compressed)
+    return compressed
+
+
+def _header(headers, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+class CompressionMiddleware:
+    """Compresses complete (non-streaming) responses the client can decode."""
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = _header(scope.get("headers", ()), b"accept-encoding")
+        encoding = negotiate(accept.decode("latin-1")) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                start_message = message
+            elif message["type"] == "http.response.body" and start_message is not None:
+                passthrough = True
+                if message.get("more_body", False):
+                    # Streaming body (SSE, files): send as is, unbuffered
+                    await send(start_message)
+                    await send(message)
+                else:
+                    await self._send_complete(send, start_message, message.get("body", b""), encoding)
+            else:
+                # Anything else (http.response.pathsend, trailers) carries no body to compress,
+                # but the held-back start has to go out ahead of it
+                if start_message is not None:
+                    passthrough = True
+                    await send(start_message)
+                await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_complete(self, send, start_message, body: bytes, encoding: str):
+        status = start_message["status"]
+        headers = list(start_message.get("headers", []))
+        content_type = _header(headers, b"content-type") or b""
+        if (
+            status < 200 or status in (204, 206, 304)
+            or _header(headers, b"content-encoding") is not None
+            or not content_type.startswith(COMPRESSIBLE_TYPES)
+        ):
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        vary = _header(headers, b"vary")
+        if vary is None:
+            headers.append((b"vary", b"Accept-Encoding"))
+        elif b"accept-encoding" not in vary.lower():
+            headers = [(k, v) for k, v in headers if k.lower() != b"vary"]
+            headers.append((b"vary", vary + b", Accept-Encoding"))
+
+        if len(body) >= self.minimum_size:
+            compressed = await compress(body, encoding)
+            if len(compressed) < len(body):
+                metrics.http_compression_bytes_total.inc(encoding, "in", amount=len(body))
+                metrics.http_compression_bytes_total.inc(encoding, "out", amount=len(compressed))
+                body = compressed
+                rewritten = []
+                for key, value in headers:
+                    name = key.lower()
+                    if name == b"content-length":
+                        continue
+                    if name == b"etag" and value.startswith(b'"'):
+                        # The encoded bytes differ, so a strong validator becomes weak
+                        value = b"W/" + value
+                    rewritten.append((key, value))
+                headers = rewritten
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                headers.append((b"content-length", str(len(body)).encode("latin-1")))
+
+        await send({**start_message, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,74 @@
+"""Conditional GETs: ETag / Last-Modified from cheap row-version queries.
+
+A handler first runs a version query over the rows it is about to return
+(``updated_at`` plus the ``row_version`` edit counter, since two edits can
+land in the same second, or ``COUNT(*)``/``MAX(updated_at)`` for lists) and calls
+``not_modified()``; when the client's copy is current a bodiless 304 goes out
+before the full SELECT runs or anything is serialized.
+
+ETags are weak: they follow row versions rather than response bytes, so a
+counter that doesn't touch ``updated_at`` (journey views) can lag until the
+next real change. ``Last-Modified`` is the DB's naive DATETIME rendered as
+GMT; clients only echo it back, so the comparison stays consistent whatever
+the server time zone is.
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+# Cache, but revalidate every time; the 304 path is what keeps that cheap
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return 'W/"' + hashlib.sha1(raw.encode()).hexdigest()[:24] + '"'
+
+
+def _as_utc(dt: datetime) -> datetime:
+    return dt.replace(microsecond=0, tzinfo=timezone.utc) if dt.tzinfo is None else dt.replace(microsecond=0)
+
+
+def validators(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    """Headers for both the 200 and the 304 response."""
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def is_fresh(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """RFC 9110 precedence: If-None-Match (weak comparison) wins over If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+        return any(_opaque(tag) == _opaque(etag) for tag in if_none_match.split(","))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since is None:
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return _as_utc(last_modified) <= since
+    return False
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """A 304 response if the client's copy is current, else None."""
+    if is_fresh(request, etag, last_modified):
+        return Response(status_code=304, headers=validators(etag, last_modified))
+    return None
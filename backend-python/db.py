@@ -1,10 +1,47 @@
+"""MySQL connection pools, read-replica routing and schema setup.
+
+Everything goes to the primary (``DB_HOST``) unless replicas are configured in
+``DB_REPLICAS``. Handlers decorated with ``@read_only`` (or code inside
+``replica_reads()``) then get a replica pool from ``get_pool()``, round robin.
+Replicas share the primary's credentials and database name.
+
+Read-your-writes: after a client's successful write (any non-GET/HEAD/OPTIONS
+request), ``ReplicaRoutingMiddleware`` keeps that client's reads on the
+primary for ``DB_REPLICA_STICKY_SECONDS`` - longer than the usual replication
+lag. A client is its ``X-User-Id`` header when sent, else its address, and a
+short-lived cookie carries the window to the other workers.
+
+Handlers feeding the incremental in-process caches (friend graph, memory
+matcher) stay on the primary: their ``updated_at``/``created_at`` watermarks
+assume rows appear in commit order, which a lagging replica doesn't give.
+
+``init_schema()`` stores a hash of the DDL in ``schema_version`` and skips the
+DDL entirely on later starts while the hash matches, so a new worker is ready
+after one query instead of a few dozen.
+
+Environment:
+  DB_POOL_SIZE               connections per pool and process (default 5)
+  DB_SCHEMA_FORCE            1 applies the DDL on every start (default: only when it changed)
+  DB_REPLICAS                comma separated host[:port] list (default: none)
+  DB_REPLICA_STICKY_SECONDS  post-write primary window (default 5)
+"""
 import os
-import asyncio
-from typing import Optional
+import time
+import hashlib
+import inspect
+import functools
+import itertools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
 
 import aiomysql
 from dotenv import load_dotenv
 
+import metrics
+import profiler
+
 load_dotenv()
 
 DB_HOST = os.getenv('DB_HOST', 'localhost')
@@ -12,307 +49,694 @@ DB_PORT = int(os.getenv('DB_PORT', '3306'))
 DB_USER = os.getenv('DB_USER', 'root')
 DB_PASSWORD = os.getenv('DB_PASSWORD', '')
 DB_NAME = os.getenv('DB_NAME', 'memory_of_journeys')
+# Per process; serve.py derives it from DB_CONNECTION_BUDGET and the worker count
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+# Re-run the DDL even when schema_version says it is current (e.g. after a manual drop)
+DB_SCHEMA_FORCE = os.getenv('DB_SCHEMA_FORCE', '0') == '1'
+DB_REPLICAS = [h.strip() for h in os.getenv('DB_REPLICAS', '').split(',') if h.strip()]
+DB_REPLICA_STICKY_SECONDS = float(os.getenv('DB_REPLICA_STICKY_SECONDS', '5'))
+# A replica that failed to connect is retried after this long; reads use the primary meanwhile
+REPLICA_RETRY_SECONDS = 30
+STICKY_COOKIE = "db_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+# POST endpoints that only read (their request body is just too big for a query string)
+READ_ONLY_SUFFIXES = (":batchGet",)
 
 _pool: Optional[aiomysql.Pool] = None
+_replicas: Dict[str, aiomysql.Pool] = {}
+_replica_retry_at: Dict[str, float] = {}
+_replica_turn = itertools.count()
+_read_only: ContextVar[bool] = ContextVar("db_read_only", default=False)
+_pin_primary: ContextVar[bool] = ContextVar("db_pin_primary", default=False)
+logger = logging.getLogger("db")
+
+
+class InstrumentedCursor(aiomysql.Cursor):
+    """Cursor that reports every statement to metrics and the request profiler."""
+
+    async def execute(self, query, args=None):
+        start = time.perf_counter()
+        try:
+            return await super().execute(query, args)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.observe_query(query, elapsed)
+            profiler.record_query(query, elapsed, self.rowcount)
+
+
+async def _create_pool(host: str, port: int) -> aiomysql.Pool:
+    pool = await aiomysql.create_pool(
+        host=host,
+        port=port,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        db=DB_NAME,
+        minsize=1,
+        maxsize=DB_POOL_SIZE,
+        autocommit=True,
+        charset='utf8mb4',
+        cursorclass=InstrumentedCursor
+    )
+    return metrics.instrument_pool(pool)
+
+
+def _host_port(address: str) -> Tuple[str, int]:
+    host, sep, port = address.partition(":")
+    return host, int(port) if sep else DB_PORT
+
+
+async def _replica_pool() -> Optional[aiomysql.Pool]:
+    """Next replica pool in turn, or None when none is reachable."""
+    for _ in range(len(DB_REPLICAS)):
+        address = DB_REPLICAS[next(_replica_turn) % len(DB_REPLICAS)]
+        pool = _replicas.get(address)
+        if pool is not None:
+            return pool
+        if _replica_retry_at.get(address, 0) > time.monotonic():
+            continue
+        try:
+            pool = await _create_pool(*_host_port(address))
+        except Exception as e:
+            _replica_retry_at[address] = time.monotonic() + REPLICA_RETRY_SECONDS
+            logger.warning("replica unavailable, reading from primary",
+                           extra={"fields": {"replica": address, "error": repr(e)}})
+            continue
+        _replicas[address] = pool
+        return pool
+    return None
 
 
 async def get_pool() -> aiomysql.Pool:
+    """The primary pool, or a replica pool for reads inside ``read_only`` handlers."""
     global _pool
+    if DB_REPLICAS and _read_only.get():
+        replica = None if _pin_primary.get() else await _replica_pool()
+        metrics.db_read_route_total.inc("primary" if replica is None else "replica")
+        if replica is not None:
+            return replica
     if _pool is None:
-        _pool = await aiomysql.create_pool(
-            host=DB_HOST,
-            port=DB_PORT,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            db=DB_NAME,
-            minsize=1,
-            maxsize=5,
-            autocommit=True,
-            charset='utf8mb4'
-        )
+        _pool = await _create_pool(DB_HOST, DB_PORT)
     return _pool
 
 
+# ---------- Read routing ----------
+@contextmanager
+def replica_reads():
+    """Let ``get_pool()`` hand out replica pools within the block."""
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+def read_only(handler):
+    """Route a handler's queries to the replicas; it must not write."""
+    @functools.wraps(handler)
+    async def wrapper(*args, **kwargs):
+        with replica_reads():
+            return await handler(*args, **kwargs)
+    return wrapper
+
+
+_recent_writers: Dict[str, float] = {}
+
+
+def _client_keys(scope) -> List[str]:
+    keys = []
+    client = scope.get("client")
+    if client:
+        keys.append("ip:" + client[0])
+    for name, value in scope.get("headers", ()):
+        if name == b"x-user-id" and value:
+            keys.append("user:" + value.decode("latin-1"))
+    return keys
+
+
+def _cookie_deadline(scope) -> float:
+    for name, value in scope.get("headers", ()):
+        if name == b"cookie":
+            for part in value.decode("latin-1").split(";"):
+                key, _, raw = part.strip().partition("=")
+                if key == STICKY_COOKIE:
+                    try:
+                        # Never trust a window longer than the configured one
+                        return min(float(raw), time.time() + DB_REPLICA_STICKY_SECONDS)
+                    except ValueError:
+                        return 0.0
+    return 0.0
+
+
+def _remember_write(keys: List[str], until: float):
+    if len(_recent_writers) > 10000:
+        now = time.time()
+        for key in [k for k, deadline in _recent_writers.items() if deadline <= now]:
+            del _recent_writers[key]
+    for key in keys:
+        _recent_writers[key] = until
+
+
+class ReplicaRoutingMiddleware:
+    """Keeps a client's reads on the primary for a short window after it writes."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not DB_REPLICAS:
+            await self.app(scope, receive, send)
+            return
+        keys = _client_keys(scope)
+        now = time.time()
+        pinned = _cookie_deadline(scope) > now or any(_recent_writers.get(k, 0) > now for k in keys)
+        is_write = scope["method"] not in SAFE_METHODS and not scope["path"].endswith(READ_ONLY_SUFFIXES)
+
+        async def send_wrapper(message):
+            if is_write and message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + DB_REPLICA_STICKY_SECONDS
+                _remember_write(keys, until)
+                cookie = (f"{STICKY_COOKIE}={until:.3f}; Max-Age={int(DB_REPLICA_STICKY_SECONDS) + 1}; "
+                          "Path=/; HttpOnly; SameSite=Lax")
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode("latin-1"))]}
+            await send(message)
+
+        token = _pin_primary.set(pinned)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _pin_primary.reset(token)
+
+
+# ---------- Schema ----------
+async def ensure_index(cur, table: str, index: str, columns: str):
+    """Add an index to an existing table if it is missing (CREATE TABLE IF NOT EXISTS won't)."""
+    await cur.execute(
+        """SELECT 1 FROM information_schema.statistics
+           WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s LIMIT 1""",
+        (table, index),
+    )
+    if not await cur.fetchone():
+        await cur.execute(f"ALTER TABLE {table} ADD INDEX {index} ({columns})")
+
+
+async def column_exists(cur, table: str, column: str) -> bool:
+    await cur.execute(
+        """SELECT 1 FROM information_schema.columns
+           WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s LIMIT 1""",
+        (table, column),
+    )
+    return await cur.fetchone() is not None
+
+
+async def _apply_schema(cur):
+    """Create missing tables, columns and indexes. Every statement is idempotent."""
+    # albums
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS albums (
+          id CHAR(36) PRIMARY KEY,
+          user_id VARCHAR(64) NOT NULL,
+          title VARCHAR(500) NOT NULL,
+          description TEXT,
+          journey_id CHAR(36),
+          visibility VARCHAR(20) DEFAULT 'public',
+          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          row_version INT UNSIGNED NOT NULL DEFAULT 0,
+          INDEX idx_albums_user (user_id),
+          INDEX idx_albums_journey (journey_id)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # Bumped by every edit; updated_at has one-second precision, too coarse for an ETag
+    if not await column_exists(cur, "albums", "row_version"):
+        await cur.execute("ALTER TABLE albums ADD COLUMN row_version INT UNSIGNED NOT NULL DEFAULT 0 AFTER updated_at")
+    # album_photos
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS album_photos (
+          id CHAR(36) PRIMARY KEY,
+          album_id CHAR(36) NOT NULL,
+          user_id VARCHAR(64) NOT NULL,
+          image_url TEXT NOT NULL,
+          caption VARCHAR(500),
+          page_number INT DEFAULT 1,
+          meta TEXT,
+          variants TEXT NULL,
+          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          INDEX idx_album_photos_album (album_id),
+          INDEX idx_album_photos_page (album_id, page_number)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # Rendered thumbnails (see thumbnails.py); written by the server only, unlike meta
+    if not await column_exists(cur, "album_photos", "variants"):
+        await cur.execute("ALTER TABLE album_photos ADD COLUMN variants TEXT NULL AFTER meta")
+    # album_pages
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS album_pages (
+          id CHAR(36) PRIMARY KEY,
+          album_id CHAR(36) NOT NULL,
+          page_number INT NOT NULL,
+          content TEXT,
+          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          UNIQUE KEY uniq_album_page (album_id, page_number)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # future_plans
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS future_plans (
+          id CHAR(36) PRIMARY KEY,
+          user_id VARCHAR(64) NOT NULL,
+          destination VARCHAR(255) NOT NULL,
+          start_date DATE,
+          end_date DATE,
+          reason TEXT,
+          notes TEXT,
+          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          INDEX idx_future_plans_user (user_id),
+          INDEX idx_future_plans_dates (start_date, end_date)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # journeys
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS journeys (
+          id CHAR(36) PRIMARY KEY,
+          user_id VARCHAR(64) NOT NULL,
+          title VARCHAR(500) NOT NULL,
+          description TEXT,
+          journey_type VARCHAR(50) DEFAULT 'solo',
+          departure_date DATE,
+          return_date DATE,
+          legs JSON NOT NULL,
+          keywords JSON,
+          ai_story TEXT,
+          similarity_score FLOAT DEFAULT 0,
+          rarity_score FLOAT DEFAULT 50,
+          cultural_insights JSON,
+          visibility VARCHAR(20) DEFAULT 'public',
+          likes_count INT DEFAULT 0,
+          views_count INT DEFAULT 0,
+          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          row_version INT UNSIGNED NOT NULL DEFAULT 0,
+          INDEX idx_journeys_user (user_id),
+          INDEX idx_journeys_visibility (visibility),
+          INDEX idx_journeys_type (journey_type),
+          INDEX idx_journeys_created (created_at DESC),
+          INDEX idx_journeys_likes (likes_count DESC)
+        ) ENGINE=InnoDB;
+        """
+    )
+    if not await column_exists(cur, "journeys", "row_version"):
+        await cur.execute("ALTER TABLE journeys ADD COLUMN row_version INT UNSIGNED NOT NULL DEFAULT 0 AFTER updated_at")
+    # journey_likes
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS journey_likes (
+          id CHAR(36) PRIMARY KEY,
+          journey_id CHAR(36) NOT NULL,
+          user_id VARCHAR(64) NOT NULL,
+          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          UNIQUE KEY uniq_journey_user_like (journey_id, user_id),
+          INDEX idx_journey_likes_journey (journey_id),
+          INDEX idx_journey_likes_user (user_id)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # memory_circles
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS memory_circles (
+          id CHAR(36) PRIMARY KEY,
+          name VARCHAR(255) NOT NULL,
+          description TEXT,
+          owner_id VARCHAR(64) NOT NULL,
+          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          INDEX idx_memory_circles_owner (owner_id)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # memory_circle_members
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS memory_circle_members (
+          id CHAR(36) PRIMARY KEY,
+          circle_id CHAR(36) NOT NULL,
+          user_id VARCHAR(64) NOT NULL,
+          role VARCHAR(20) DEFAULT 'member',
+          joined_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          INDEX idx_mcm_circle (circle_id),
+          INDEX idx_mcm_user (user_id)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # memory_circle_journeys
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS memory_circle_journeys (
+          id CHAR(36) PRIMARY KEY,
+          circle_id CHAR(36) NOT NULL,
+          journey_id CHAR(36) NOT NULL,
+          shared_by VARCHAR(64) NOT NULL,
+          shared_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          INDEX idx_mcj_circle (circle_id),
+          INDEX idx_mcj_journey (journey_id)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # collaborative_journals
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS collaborative_journals (
+          id CHAR(36) PRIMARY KEY,
+          title VARCHAR(255) NOT NULL,
+          description TEXT,
+          created_by VARCHAR(64) NOT NULL,
+          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          INDEX idx_cj_creator (created_by)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # collaborative_journal_members
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS collaborative_journal_members (
+          id CHAR(36) PRIMARY KEY,
+          journal_id CHAR(36) NOT NULL,
+          user_id VARCHAR(64) NOT NULL,
+          user_name VARCHAR(255),
+          role VARCHAR(20) DEFAULT 'contributor',
+          joined_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          INDEX idx_cjm_journal (journal_id),
+          INDEX idx_cjm_user (user_id)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # collaborative_journal_entries
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS collaborative_journal_entries (
+          id CHAR(36) PRIMARY KEY,
+          journal_id CHAR(36) NOT NULL,
+          user_id VARCHAR(64) NOT NULL,
+          user_name VARCHAR(255),
+          content TEXT NOT NULL,
+          entry_type VARCHAR(20) DEFAULT 'text',
+          image_url TEXT,
+          location VARCHAR(255),
+          created_at DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6),
+          INDEX idx_cje_journal (journal_id),
+          INDEX idx_cje_user (user_id),
+          INDEX idx_cje_journal_created (journal_id, created_at, id)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # Sub-second timestamps keep the (created_at, id) sync cursor monotonic
+    await cur.execute(
+        """SELECT DATETIME_PRECISION FROM information_schema.columns
+           WHERE table_schema = DATABASE() AND table_name = 'collaborative_journal_entries'
+             AND column_name = 'created_at'"""
+    )
+    precision = await cur.fetchone()
+    if precision and not precision[0]:
+        await cur.execute(
+            "ALTER TABLE collaborative_journal_entries MODIFY created_at DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6)"
+        )
+    await ensure_index(cur, "collaborative_journal_entries", "idx_cje_journal_created", "journal_id, created_at, id")
+    # anonymous_memories
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS anonymous_memories (
+          id CHAR(36) PRIMARY KEY,
+          journey_id CHAR(36) NOT NULL,
+          original_user_id VARCHAR(64) NOT NULL,
+          title VARCHAR(255) NOT NULL,
+          story TEXT NOT NULL,
+          location VARCHAR(255),
+          travel_type VARCHAR(50),
+          keywords JSON,
+          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          INDEX idx_am_journey (journey_id),
+          INDEX idx_am_type (travel_type),
+          INDEX idx_am_created (created_at)
+        ) ENGINE=InnoDB;
+        """
+    )
+    await ensure_index(cur, "anonymous_memories", "idx_am_created", "created_at")
+    # memory_exchanges
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS memory_exchanges (
+          id CHAR(36) PRIMARY KEY,
+          user1_id VARCHAR(64) NOT NULL,
+          user2_id VARCHAR(64) NOT NULL,
+          memory1_id CHAR(36) NOT NULL,
+          memory2_id CHAR(36) NOT NULL,
+          exchanged_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          INDEX idx_me_user1 (user1_id),
+          INDEX idx_me_user2 (user2_id)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # user_friends
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_friends (
+          id CHAR(36) PRIMARY KEY,
+          user_id VARCHAR(64) NOT NULL,
+          friend_id VARCHAR(64) NOT NULL,
+          friend_name VARCHAR(255),
+          friend_email VARCHAR(255),
+          friend_avatar VARCHAR(500),
+          status VARCHAR(20) DEFAULT 'active',
+          added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          updated_at DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+          INDEX idx_user_friends_user (user_id),
+          INDEX idx_user_friends_friend (friend_id),
+          INDEX idx_user_friends_updated (updated_at),
+          INDEX idx_user_friends_user_added (user_id, added_at, id),
+          UNIQUE KEY uniq_user_friend (user_id, friend_id)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # Older one-directional friend tables: add the change timestamp and mirror every edge
+    if not await column_exists(cur, "user_friends", "updated_at"):
+        await cur.execute(
+            """ALTER TABLE user_friends
+               ADD COLUMN updated_at DATETIME(6) DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+               ADD INDEX idx_user_friends_updated (updated_at)"""
+        )
+        await cur.execute(
+            """INSERT IGNORE INTO user_friends (id, user_id, friend_id, status, added_at)
+               SELECT UUID(), friend_id, user_id, status, added_at FROM user_friends"""
+        )
+    await ensure_index(cur, "user_friends", "idx_user_friends_user_added", "user_id, added_at, id")
+    # memory_garden_plants
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS memory_garden_plants (
+          id CHAR(36) PRIMARY KEY,
+          user_id VARCHAR(64) NOT NULL,
+          journey_id CHAR(36),
+          plant_type VARCHAR(50) NOT NULL,
+          plant_name VARCHAR(255),
+          growth_stage INT DEFAULT 1,
+          planted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          last_watered DATETIME DEFAULT CURRENT_TIMESTAMP,
+          position_x INT DEFAULT 0,
+          position_y INT DEFAULT 0,
+          color VARCHAR(20),
+          INDEX idx_garden_user (user_id),
+          INDEX idx_garden_journey (journey_id),
+          INDEX idx_garden_user_planted (user_id, planted_at, id)
+        ) ENGINE=InnoDB;
+        """
+    )
+    await ensure_index(cur, "memory_garden_plants", "idx_garden_user_planted", "user_id, planted_at, id")
+    # user_feed_entries (fan-out on write home feed)
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS user_feed_entries (
+          id CHAR(36) PRIMARY KEY,
+          user_id VARCHAR(64) NOT NULL,
+          journey_id CHAR(36) NOT NULL,
+          actor_id VARCHAR(64) NOT NULL,
+          source_type VARCHAR(20) NOT NULL,
+          source_id VARCHAR(64) NOT NULL,
+          created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          UNIQUE KEY uniq_feed_user_journey (user_id, journey_id),
+          INDEX idx_feed_user_created (user_id, created_at DESC, journey_id DESC),
+          INDEX idx_feed_journey (journey_id)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # feed_pull_sources (high-follower authors / large circles, fan-out on read)
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS feed_pull_sources (
+          source_type VARCHAR(20) NOT NULL,
+          source_id VARCHAR(64) NOT NULL,
+          audience_size INT DEFAULT 0,
+          updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+          PRIMARY KEY (source_type, source_id)
+        ) ENGINE=InnoDB;
+        """
+    )
+    # idempotency_keys (stored responses of requests sent with an Idempotency-Key)
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+          id CHAR(64) PRIMARY KEY,
+          fingerprint CHAR(64) NOT NULL,
+          status SMALLINT NULL,
+          content_type VARCHAR(100) NULL,
+          headers TEXT NULL,
+          body MEDIUMBLOB NULL,
+          claimed_at DATETIME NOT NULL,
+          expires_at DATETIME NOT NULL,
+          INDEX idx_idempotency_expires (expires_at)
+        ) ENGINE=InnoDB;
+        """
+    )
+    if not await column_exists(cur, "idempotency_keys", "headers"):
+        await cur.execute("ALTER TABLE idempotency_keys ADD COLUMN headers TEXT NULL AFTER content_type")
+    # journey_engagement_hourly (likes and views per journey and hour; input of the leaderboards)
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS journey_engagement_hourly (
+          journey_id CHAR(36) NOT NULL,
+          bucket_start DATETIME NOT NULL,
+          likes INT NOT NULL DEFAULT 0,
+          views INT NOT NULL DEFAULT 0,
+          shares INT NOT NULL DEFAULT 0,
+          updated_at DATETIME(3) NOT NULL,
+          PRIMARY KEY (journey_id, bucket_start),
+          INDEX idx_engagement_bucket (bucket_start),
+          INDEX idx_engagement_updated (updated_at)
+        ) ENGINE=InnoDB;
+        """
+    )
+    if not await column_exists(cur, "journey_engagement_hourly", "shares"):
+        await cur.execute("ALTER TABLE journey_engagement_hourly ADD COLUMN shares INT NOT NULL DEFAULT 0 AFTER views")
+    # engagement_events (append-only views/likes/shares, one partition per UTC day; see engagement.py)
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS engagement_events (
+          id BIGINT UNSIGNED NOT NULL AUTO_INCREMENT,
+          occurred_at DATETIME(3) NOT NULL,
+          kind VARCHAR(10) NOT NULL,
+          journey_id CHAR(36) NOT NULL,
+          actor VARCHAR(100) NULL,
+          context_id VARCHAR(64) NULL,
+          PRIMARY KEY (id, occurred_at),
+          INDEX idx_engagement_events_journey (journey_id, occurred_at),
+          INDEX idx_engagement_events_actor (actor, occurred_at)
+        ) ENGINE=InnoDB
+        PARTITION BY RANGE COLUMNS (occurred_at) (
+          PARTITION p_future VALUES LESS THAN (MAXVALUE)
+        );
+        """
+    )
+    # engagement_compaction (how far engagement_events has been rolled up into counters)
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS engagement_compaction (
+          id TINYINT PRIMARY KEY,
+          last_event_id BIGINT UNSIGNED NOT NULL,
+          seen_event_id BIGINT UNSIGNED NOT NULL,
+          compacted_at DATETIME NOT NULL
+        ) ENGINE=InnoDB;
+        """
+    )
+    await cur.execute(
+        "INSERT IGNORE INTO engagement_compaction (id, last_event_id, seen_event_id, compacted_at) VALUES (1, 0, 0, NOW())"
+    )
+    # journey_leaderboards (materialized top N per board, read by position)
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS journey_leaderboards (
+          board VARCHAR(20) NOT NULL,
+          position INT NOT NULL,
+          journey_id CHAR(36) NOT NULL,
+          score DOUBLE NOT NULL,
+          PRIMARY KEY (board, position)
+        ) ENGINE=InnoDB;
+        """
+    )
+    await cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS journey_leaderboard_meta (
+          board VARCHAR(20) PRIMARY KEY,
+          source_version VARCHAR(64) NOT NULL,
+          entries INT NOT NULL,
+          refreshed_at DATETIME NOT NULL
+        ) ENGINE=InnoDB;
+        """
+    )
+
+
+# Any edit to the DDL above changes the version, so a deploy that touches the
+# schema applies it once and every other start skips straight to serving
+try:
+    SCHEMA_VERSION = hashlib.sha256(inspect.getsource(_apply_schema).encode()).hexdigest()[:16]
+except OSError:  # no source available: always apply
+    SCHEMA_VERSION = None
+
+
+async def _schema_version(cur) -> Optional[str]:
+    try:
+        await cur.execute("SELECT version FROM schema_version WHERE id = 1")
+    except aiomysql.ProgrammingError:  # table doesn't exist yet
+        return None
+    row = await cur.fetchone()
+    return row[0] if row else None
+
+
 async def init_schema():
+    """Bring the schema up to date unless it already matches ``SCHEMA_VERSION``."""
     pool = await get_pool()
     async with pool.acquire() as conn:
         async with conn.cursor() as cur:
-            # albums
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS albums (
-                  id CHAR(36) PRIMARY KEY,
-                  user_id VARCHAR(64) NOT NULL,
-                  title VARCHAR(500) NOT NULL,
-                  description TEXT,
-                  journey_id CHAR(36),
-                  visibility VARCHAR(20) DEFAULT 'public',
-                  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                  INDEX idx_albums_user (user_id),
-                  INDEX idx_albums_journey (journey_id)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # album_photos (drop and recreate to ensure schema is correct)
-            await cur.execute("DROP TABLE IF EXISTS album_photos")
-            await cur.execute(
-                """
-                CREATE TABLE album_photos (
-                  id CHAR(36) PRIMARY KEY,
-                  album_id CHAR(36) NOT NULL,
-                  user_id VARCHAR(64) NOT NULL,
-                  image_url TEXT NOT NULL,
-                  caption VARCHAR(500),
-                  page_number INT DEFAULT 1,
-                  meta TEXT,
-                  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  INDEX idx_album_photos_album (album_id),
-                  INDEX idx_album_photos_page (album_id, page_number)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # album_pages
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS album_pages (
-                  id CHAR(36) PRIMARY KEY,
-                  album_id CHAR(36) NOT NULL,
-                  page_number INT NOT NULL,
-                  content TEXT,
-                  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                  UNIQUE KEY uniq_album_page (album_id, page_number)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # future_plans
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS future_plans (
-                  id CHAR(36) PRIMARY KEY,
-                  user_id VARCHAR(64) NOT NULL,
-                  destination VARCHAR(255) NOT NULL,
-                  start_date DATE,
-                  end_date DATE,
-                  reason TEXT,
-                  notes TEXT,
-                  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                  INDEX idx_future_plans_user (user_id),
-                  INDEX idx_future_plans_dates (start_date, end_date)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # journeys
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS journeys (
-                  id CHAR(36) PRIMARY KEY,
-                  user_id VARCHAR(64) NOT NULL,
-                  title VARCHAR(500) NOT NULL,
-                  description TEXT,
-                  journey_type VARCHAR(50) DEFAULT 'solo',
-                  departure_date DATE,
-                  return_date DATE,
-                  legs JSON NOT NULL,
-                  keywords JSON,
-                  ai_story TEXT,
-                  similarity_score FLOAT DEFAULT 0,
-                  rarity_score FLOAT DEFAULT 50,
-                  cultural_insights JSON,
-                  visibility VARCHAR(20) DEFAULT 'public',
-                  likes_count INT DEFAULT 0,
-                  views_count INT DEFAULT 0,
-                  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                  INDEX idx_journeys_user (user_id),
-                  INDEX idx_journeys_visibility (visibility),
-                  INDEX idx_journeys_type (journey_type),
-                  INDEX idx_journeys_created (created_at DESC),
-                  INDEX idx_journeys_likes (likes_count DESC)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # journey_likes
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS journey_likes (
-                  id CHAR(36) PRIMARY KEY,
-                  journey_id CHAR(36) NOT NULL,
-                  user_id VARCHAR(64) NOT NULL,
-                  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  UNIQUE KEY uniq_journey_user_like (journey_id, user_id),
-                  INDEX idx_journey_likes_journey (journey_id),
-                  INDEX idx_journey_likes_user (user_id)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # memory_circles
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS memory_circles (
-                  id CHAR(36) PRIMARY KEY,
-                  name VARCHAR(255) NOT NULL,
-                  description TEXT,
-                  owner_id VARCHAR(64) NOT NULL,
-                  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                  INDEX idx_memory_circles_owner (owner_id)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # memory_circle_members
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS memory_circle_members (
-                  id CHAR(36) PRIMARY KEY,
-                  circle_id CHAR(36) NOT NULL,
-                  user_id VARCHAR(64) NOT NULL,
-                  role VARCHAR(20) DEFAULT 'member',
-                  joined_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  INDEX idx_mcm_circle (circle_id),
-                  INDEX idx_mcm_user (user_id)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # memory_circle_journeys
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS memory_circle_journeys (
-                  id CHAR(36) PRIMARY KEY,
-                  circle_id CHAR(36) NOT NULL,
-                  journey_id CHAR(36) NOT NULL,
-                  shared_by VARCHAR(64) NOT NULL,
-                  shared_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  INDEX idx_mcj_circle (circle_id),
-                  INDEX idx_mcj_journey (journey_id)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # collaborative_journals
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS collaborative_journals (
-                  id CHAR(36) PRIMARY KEY,
-                  title VARCHAR(255) NOT NULL,
-                  description TEXT,
-                  created_by VARCHAR(64) NOT NULL,
-                  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-                  INDEX idx_cj_creator (created_by)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # collaborative_journal_members
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS collaborative_journal_members (
-                  id CHAR(36) PRIMARY KEY,
-                  journal_id CHAR(36) NOT NULL,
-                  user_id VARCHAR(64) NOT NULL,
-                  user_name VARCHAR(255),
-                  role VARCHAR(20) DEFAULT 'contributor',
-                  joined_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  INDEX idx_cjm_journal (journal_id),
-                  INDEX idx_cjm_user (user_id)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # collaborative_journal_entries
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS collaborative_journal_entries (
-                  id CHAR(36) PRIMARY KEY,
-                  journal_id CHAR(36) NOT NULL,
-                  user_id VARCHAR(64) NOT NULL,
-                  user_name VARCHAR(255),
-                  content TEXT NOT NULL,
-                  entry_type VARCHAR(20) DEFAULT 'text',
-                  image_url TEXT,
-                  location VARCHAR(255),
-                  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  INDEX idx_cje_journal (journal_id),
-                  INDEX idx_cje_user (user_id)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # anonymous_memories
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS anonymous_memories (
-                  id CHAR(36) PRIMARY KEY,
-                  journey_id CHAR(36) NOT NULL,
-                  original_user_id VARCHAR(64) NOT NULL,
-                  title VARCHAR(255) NOT NULL,
-                  story TEXT NOT NULL,
-                  location VARCHAR(255),
-                  travel_type VARCHAR(50),
-                  keywords JSON,
-                  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  INDEX idx_am_journey (journey_id),
-                  INDEX idx_am_type (travel_type)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # memory_exchanges
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS memory_exchanges (
-                  id CHAR(36) PRIMARY KEY,
-                  user1_id VARCHAR(64) NOT NULL,
-                  user2_id VARCHAR(64) NOT NULL,
-                  memory1_id CHAR(36) NOT NULL,
-                  memory2_id CHAR(36) NOT NULL,
-                  exchanged_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  INDEX idx_me_user1 (user1_id),
-                  INDEX idx_me_user2 (user2_id)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # user_friends
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS user_friends (
-                  id CHAR(36) PRIMARY KEY,
-                  user_id VARCHAR(64) NOT NULL,
-                  friend_id VARCHAR(64) NOT NULL,
-                  friend_name VARCHAR(255),
-                  friend_email VARCHAR(255),
-                  friend_avatar VARCHAR(500),
-                  status VARCHAR(20) DEFAULT 'active',
-                  added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  INDEX idx_user_friends_user (user_id),
-                  INDEX idx_user_friends_friend (friend_id),
-                  UNIQUE KEY uniq_user_friend (user_id, friend_id)
-                ) ENGINE=InnoDB;
-                """
-            )
-            # memory_garden_plants
-            await cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS memory_garden_plants (
-                  id CHAR(36) PRIMARY KEY,
-                  user_id VARCHAR(64) NOT NULL,
-                  journey_id CHAR(36),
-                  plant_type VARCHAR(50) NOT NULL,
-                  plant_name VARCHAR(255),
-                  growth_stage INT DEFAULT 1,
-                  planted_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  last_watered DATETIME DEFAULT CURRENT_TIMESTAMP,
-                  position_x INT DEFAULT 0,
-                  position_y INT DEFAULT 0,
-                  color VARCHAR(20),
-                  INDEX idx_garden_user (user_id),
-                  INDEX idx_garden_journey (journey_id)
-                ) ENGINE=InnoDB;
-                """
-            )
-            print("✅ All database tables created successfully!")
+            if not DB_SCHEMA_FORCE and SCHEMA_VERSION and await _schema_version(cur) == SCHEMA_VERSION:
+                logger.info("database schema up to date", extra={"fields": {"version": SCHEMA_VERSION}})
+                return
+            # Workers starting together: one applies the DDL while the others wait, then re-check
+            await cur.execute("SELECT GET_LOCK('memory_of_journeys.schema', 60)")
+            try:
+                if DB_SCHEMA_FORCE or not SCHEMA_VERSION or await _schema_version(cur) != SCHEMA_VERSION:
+                    await _apply_schema(cur)
+                    await cur.execute(
+                        """CREATE TABLE IF NOT EXISTS schema_version (
+                             id TINYINT PRIMARY KEY,
+                             version VARCHAR(64) NOT NULL,
+                             applied_at DATETIME NOT NULL
+                           ) ENGINE=InnoDB"""
+                    )
+                    await cur.execute(
+                        "REPLACE INTO schema_version (id, version, applied_at) VALUES (1, %s, NOW())",
+                        (SCHEMA_VERSION or "",),
+                    )
+            finally:
+                await cur.execute("SELECT RELEASE_LOCK('memory_of_journeys.schema')")
+            logger.info("database schema ready", extra={"fields": {"version": SCHEMA_VERSION}})
 
 
 async def close_pool():
     global _pool
+    pools = list(_replicas.values())
+    _replicas.clear()
     if _pool is not None:
-        _pool.close()
-        await _pool.wait_closed()
+        pools.append(_pool)
         _pool = None
+    for pool in pools:
+        pool.close()
+        await pool.wait_closed()
@@ -0,0 +1,276 @@
+"""Engagement event log: views, likes and circle shares, ingested in batches.
+
+Handlers call ``emit()``, which appends a tuple to an in-process ring buffer
+and returns - no I/O on the request path. A flusher task writes the buffer to
+``engagement_events`` in multi-row ``INSERT`` batches every
+``ENGAGEMENT_FLUSH_MS`` (sooner once a batch is full). When the database is
+down the buffer keeps the newest ``ENGAGEMENT_BUFFER_SIZE`` events and counts
+the ones it drops; events still buffered when a worker dies are lost, so the
+log is for trends and abuse forensics, not billing.
+
+``engagement_events`` is append-only and partitioned by UTC day. The
+compactor (one worker at a time, ``GET_LOCK``) rolls new events up into
+``journey_engagement_hourly`` (read by the leaderboards) and ``views_count``,
+keeps ``ENGAGEMENT_PARTITIONS_AHEAD`` day partitions ready and drops the ones
+older than ``ENGAGEMENT_RETENTION_DAYS``, which is instant compared to a
+``DELETE``. Compaction only reads ids seen by the previous pass, so an insert
+that was allocated an id but not yet committed is never skipped.
+
+Likes still increment ``likes_count`` directly (the response shows the new
+count); views only reach ``views_count`` through compaction, which takes the
+per-view UPDATE of a hot row off ``get_journey``.
+
+Environment:
+  ENGAGEMENT_BUFFER_SIZE        events buffered per worker (default 100000)
+  ENGAGEMENT_FLUSH_MS           longest time an event waits in the buffer (default 1000)
+  ENGAGEMENT_FLUSH_BATCH        rows per INSERT (default 1000)
+  ENGAGEMENT_COMPACT_SECONDS    seconds between compaction passes (default 10, 0 disables)
+  ENGAGEMENT_RETENTION_DAYS     days of raw events kept (default 30)
+  ENGAGEMENT_PARTITIONS_AHEAD   future day partitions kept ready (default 3)
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Deque, List, Optional, Tuple
+
+import metrics
+
+ENGAGEMENT_BUFFER_SIZE = int(os.getenv('ENGAGEMENT_BUFFER_SIZE', '100000'))
+ENGAGEMENT_FLUSH_MS = float(os.getenv('ENGAGEMENT_FLUSH_MS', '1000'))
+ENGAGEMENT_FLUSH_BATCH = int(os.getenv('ENGAGEMENT_FLUSH_BATCH', '1000'))
+ENGAGEMENT_COMPACT_SECONDS = float(os.getenv('ENGAGEMENT_COMPACT_SECONDS', '10'))
+ENGAGEMENT_RETENTION_DAYS = int(os.getenv('ENGAGEMENT_RETENTION_DAYS', '30'))
+ENGAGEMENT_PARTITIONS_AHEAD = int(os.getenv('ENGAGEMENT_PARTITIONS_AHEAD', '3'))
+# Events rolled up per compaction transaction
+COMPACT_BATCH = 50_000
+COMPACT_LOCK = "memory_of_journeys.engagement"
+# How long shutdown waits for the last flush
+SHUTDOWN_FLUSH_SECONDS = 5.0
+
+# (occurred_at, kind, journey_id, actor, context_id)
+Event = Tuple[datetime, str, str, Optional[str], Optional[str]]
+
+logger = logging.getLogger("engagement")
+
+
+# ---------- Ingestion ----------
+class EngagementLog:
+    """Ring buffer of events plus the task that flushes it to ``engagement_events``."""
+
+    def __init__(self, capacity: int = ENGAGEMENT_BUFFER_SIZE, batch: int = ENGAGEMENT_FLUSH_BATCH,
+                 interval: float = ENGAGEMENT_FLUSH_MS / 1000):
+        self.capacity = capacity
+        self.batch = batch
+        self.interval = interval
+        self.dropped = 0
+        self._events: Deque[Event] = deque(maxlen=capacity)
+        self._retry: List[Event] = []  # a batch whose INSERT failed, written before anything newer
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._events) + len(self._retry)
+
+    def emit(self, kind: str, journey_id: str, actor: Optional[str] = None, context_id: Optional[str] = None):
+        """Buffer one event; never blocks and never touches the database."""
+        if len(self._events) == self.capacity:
+            self.dropped += 1  # deque(maxlen) evicts the oldest
+            metrics.engagement_events_total.inc(kind, "dropped")
+        self._events.append((datetime.utcnow(), kind, journey_id, actor, context_id))
+        if self._wake is not None and len(self._events) >= self.batch:
+            self._wake.set()
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = SHUTDOWN_FLUSH_SECONDS):
+        """Stop the flusher, then write out what is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except Exception as e:
+            logger.warning("engagement events lost on shutdown",
+                           extra={"fields": {"events": len(self), "error": repr(e)}})
+
+    async def flush(self):
+        """Write everything buffered so far; raises (keeping the failed batch) if the DB does."""
+        import db
+
+        while self._retry or self._events:
+            if not self._retry:
+                take = min(self.batch, len(self._events))
+                self._retry = [self._events.popleft() for _ in range(take)]
+            pool = await db.get_pool()
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cur:
+                    await cur.executemany(
+                        """INSERT INTO engagement_events (occurred_at, kind, journey_id, actor, context_id)
+                           VALUES (%s, %s, %s, %s, %s)""",
+                        self._retry,
+                    )
+            for event in self._retry:
+                metrics.engagement_events_total.inc(event[1], "written")
+            self._retry = []
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("engagement flush failed, retrying",
+                               extra={"fields": {"buffered": len(self), "error": repr(e)}})
+                await asyncio.sleep(self.interval)
+
+
+log = EngagementLog()
+
+
+def emit(kind: str, journey_id: str, actor: Optional[str] = None, context_id: Optional[str] = None):
+    log.emit(kind, journey_id, actor, context_id)
+
+
+# ---------- Compaction ----------
+def _partition_name(day: date) -> str:
+    return day.strftime("p%Y%m%d")
+
+
+async def maintain_partitions(cur, today: date):
+    """Keep day partitions up to ``today + ENGAGEMENT_PARTITIONS_AHEAD``; drop those past retention."""
+    await cur.execute(
+        """SELECT partition_name FROM information_schema.partitions
+           WHERE table_schema = DATABASE() AND table_name = 'engagement_events' AND partition_name IS NOT NULL"""
+    )
+    days = sorted(datetime.strptime(r[0], "p%Y%m%d").date()
+                  for r in await cur.fetchall() if r[0] != "p_future")
+    # The first day partition also takes whatever p_future held so far
+    start = days[-1] + timedelta(days=1) if days else today
+    new = [start + timedelta(days=i) for i in range((today + timedelta(days=ENGAGEMENT_PARTITIONS_AHEAD) - start).days + 1)]
+    if new:
+        parts = ", ".join(f"PARTITION {_partition_name(d)} VALUES LESS THAN ('{d + timedelta(days=1)}')" for d in new)
+        await cur.execute(
+            f"ALTER TABLE engagement_events REORGANIZE PARTITION p_future INTO "
+            f"({parts}, PARTITION p_future VALUES LESS THAN (MAXVALUE))"
+        )
+    expired = [d for d in days if d < today - timedelta(days=ENGAGEMENT_RETENTION_DAYS)]
+    if expired:
+        await cur.execute(
+            "ALTER TABLE engagement_events DROP PARTITION " + ", ".join(_partition_name(d) for d in expired)
+        )
+
+
+async def compact(conn, cur) -> int:
+    """Roll one batch of new events up into the counters; returns how many ids it covered."""
+    await conn.begin()
+    try:
+        await cur.execute("SELECT last_event_id, seen_event_id FROM engagement_compaction WHERE id = 1 FOR UPDATE")
+        last, seen = await cur.fetchone()
+        upto = min(seen, last + COMPACT_BATCH)
+        if upto > last:
+            await cur.execute(
+                """INSERT INTO journey_engagement_hourly (journey_id, bucket_start, likes, views, shares, updated_at)
+                   SELECT journey_id, TIMESTAMP(DATE(occurred_at), MAKETIME(HOUR(occurred_at), 0, 0)),
+                          SUM(kind = 'like'), SUM(kind = 'view'), SUM(kind = 'share'), NOW(3)
+                   FROM engagement_events WHERE id > %s AND id <= %s
+                   GROUP BY 1, 2
+                   ON DUPLICATE KEY UPDATE likes = likes + VALUES(likes), views = views + VALUES(views),
+                                           shares = shares + VALUES(shares), updated_at = VALUES(updated_at)""",
+                (last, upto),
+            )
+            # A view is not an edit, so keep updated_at (and the journey's ETag)
+            await cur.execute(
+                """UPDATE journeys j
+                   INNER JOIN (SELECT journey_id, COUNT(*) AS n FROM engagement_events
+                               WHERE id > %s AND id <= %s AND kind = 'view' GROUP BY journey_id) v
+                           ON v.journey_id = j.id
+                   SET j.views_count = j.views_count + v.n, j.updated_at = j.updated_at""",
+                (last, upto),
+            )
+        if upto == seen:
+            # Ids up to the current maximum are compacted next pass, once their inserts have committed
+            await cur.execute("SELECT COALESCE(MAX(id), 0) FROM engagement_events")
+            seen = max(seen, (await cur.fetchone())[0])
+        await cur.execute(
+            "UPDATE engagement_compaction SET last_event_id = %s, seen_event_id = %s, compacted_at = NOW() WHERE id = 1",
+            (upto, seen),
+        )
+        await conn.commit()
+    except BaseException:
+        await conn.rollback()
+        raise
+    return upto - last
+
+
+async def run_compaction(get_pool) -> Optional[int]:
+    """One compaction pass; None if another worker holds the lock."""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT GET_LOCK(%s, 0)", (COMPACT_LOCK,))
+            if not (await cur.fetchone())[0]:
+                return None
+            try:
+                await maintain_partitions(cur, datetime.utcnow().date())
+                total = 0
+                while True:
+                    covered = await compact(conn, cur)
+                    total += covered
+                    if covered < COMPACT_BATCH:
+                        return total
+            finally:
+                await cur.execute("SELECT RELEASE_LOCK(%s)", (COMPACT_LOCK,))
+
+
+class EngagementCompactor:
+    """Runs ``run_compaction()`` every ``interval`` seconds for the life of the app."""
+
+    def __init__(self, interval: float = ENGAGEMENT_COMPACT_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        import db
+
+        while True:
+            started = time.perf_counter()
+            try:
+                covered = await run_compaction(db.get_pool)
+                if covered:
+                    logger.info("engagement events compacted", extra={"fields": {
+                        "ids": covered, "ms": round((time.perf_counter() - started) * 1000, 1),
+                    }})
+            except Exception:
+                logger.exception("engagement compaction failed")
+            await asyncio.sleep(self.interval)
+
+
+compactor = EngagementCompactor()
@@ -0,0 +1,308 @@
+"""Home feed: friends' journeys and circle shares.
+
+Journeys are fanned out on write into ``user_feed_entries`` so reading a feed
+is a single index range scan. Authors and circles with more than
+``FEED_FANOUT_THRESHOLD`` followers/members are recorded in
+``feed_pull_sources`` instead and merged in at read time (fan-out on read),
+which keeps a single write from exploding into millions of rows.
+
+A journey reachable through several sources is listed once, at its newest
+entry; later pages skip journeys that already have an entry above the cursor.
+Private journeys never reach a feed: every source filters on visibility, a
+journey made private is taken out of all feeds and one made visible again is
+fanned out anew. Unfriending takes each user's journeys out of the other's
+feed.
+"""
+import os
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from pagination import encode_cursor, decode_cursor
+
+FEED_FANOUT_THRESHOLD = int(os.getenv('FEED_FANOUT_THRESHOLD', '1000'))
+# How many recent items to copy into a feed when a friend/circle is added
+FEED_BACKFILL_LIMIT = int(os.getenv('FEED_BACKFILL_LIMIT', '20'))
+FEED_MAX_PAGE = 100
+
+
+# ---------- Fan-out on write ----------
+async def _mark_pull_source(cur, source_type: str, source_id: str, audience: int):
+    await cur.execute(
+        """INSERT INTO feed_pull_sources (source_type, source_id, audience_size, updated_at)
+           VALUES (%s, %s, %s, NOW())
+           ON DUPLICATE KEY UPDATE audience_size = VALUES(audience_size), updated_at = NOW()""",
+        (source_type, source_id, audience),
+    )
+
+
+async def fan_out_journey(cur, journey_id: str, author_id: str, visibility: str):
+    """Push a new journey into the feeds of everyone who has the author as a friend."""
+    if visibility == 'private':
+        return
+    await cur.execute(
+        "SELECT COUNT(*) FROM user_friends WHERE friend_id = %s AND status = 'active'",
+        (author_id,),
+    )
+    followers = (await cur.fetchone())[0] or 0
+    if followers == 0:
+        return
+    if followers > FEED_FANOUT_THRESHOLD:
+        await _mark_pull_source(cur, 'user', author_id, followers)
+        return
+    await cur.execute(
+        """INSERT IGNORE INTO user_feed_entries (id, user_id, journey_id, actor_id, source_type, source_id, created_at)
+           SELECT UUID(), uf.user_id, j.id, j.user_id, 'friend', j.user_id, j.created_at
+           FROM user_friends uf
+           INNER JOIN journeys j ON j.id = %s
+           WHERE uf.friend_id = %s AND uf.status = 'active'""",
+        (journey_id, author_id),
+    )
+
+
+async def fan_out_circle_share(cur, circle_id: str, journey_id: str, shared_by: str):
+    """Push a journey shared into a circle to every member of that circle."""
+    await cur.execute(
+        "SELECT COUNT(*) FROM memory_circle_members WHERE circle_id = %s",
+        (circle_id,),
+    )
+    members = (await cur.fetchone())[0] or 0
+    if members > FEED_FANOUT_THRESHOLD:
+        await _mark_pull_source(cur, 'circle', circle_id, members)
+        return
+    await cur.execute(
+        """INSERT IGNORE INTO user_feed_entries (id, user_id, journey_id, actor_id, source_type, source_id, created_at)
+           SELECT UUID(), mcm.user_id, j.id, %s, 'circle', %s, NOW()
+           FROM memory_circle_members mcm
+           INNER JOIN journeys j ON j.id = %s AND j.visibility <> 'private'
+           WHERE mcm.circle_id = %s AND mcm.user_id <> %s""",
+        (shared_by, circle_id, journey_id, circle_id, shared_by),
+    )
+
+
+async def backfill_friend(cur, user_id: str, friend_id: str):
+    """Seed a feed with the most recent journeys of a newly added friend."""
+    await cur.execute(
+        "SELECT 1 FROM feed_pull_sources WHERE source_type = 'user' AND source_id = %s",
+        (friend_id,),
+    )
+    if await cur.fetchone():
+        return  # served at read time
+    await cur.execute(
+        """INSERT IGNORE INTO user_feed_entries (id, user_id, journey_id, actor_id, source_type, source_id, created_at)
+           SELECT UUID(), %s, j.id, j.user_id, 'friend', j.user_id, j.created_at
+           FROM journeys j
+           WHERE j.user_id = %s AND j.visibility <> 'private'
+           ORDER BY j.created_at DESC LIMIT %s""",
+        (user_id, friend_id, FEED_BACKFILL_LIMIT),
+    )
+
+
+async def backfill_circle_member(cur, circle_id: str, user_id: str):
+    """Seed a new circle member's feed with the circle's most recent shares."""
+    await cur.execute(
+        "SELECT 1 FROM feed_pull_sources WHERE source_type = 'circle' AND source_id = %s",
+        (circle_id,),
+    )
+    if await cur.fetchone():
+        return
+    await cur.execute(
+        """INSERT IGNORE INTO user_feed_entries (id, user_id, journey_id, actor_id, source_type, source_id, created_at)
+           SELECT UUID(), %s, mcj.journey_id, mcj.shared_by, 'circle', mcj.circle_id, mcj.shared_at
+           FROM memory_circle_journeys mcj
+           INNER JOIN journeys j ON j.id = mcj.journey_id AND j.visibility <> 'private'
+           WHERE mcj.circle_id = %s
+           ORDER BY mcj.shared_at DESC LIMIT %s""",
+        (user_id, circle_id, FEED_BACKFILL_LIMIT),
+    )
+
+
+async def remove_journey(cur, journey_id: str):
+    await cur.execute("DELETE FROM user_feed_entries WHERE journey_id = %s", (journey_id,))
+
+
+async def restore_journey(cur, journey_id: str, author_id: str, visibility: str):
+    """Fan a journey that stopped being private back out to friends and the circles it was shared to."""
+    await fan_out_journey(cur, journey_id, author_id, visibility)
+    await cur.execute(
+        """INSERT IGNORE INTO user_feed_entries (id, user_id, journey_id, actor_id, source_type, source_id, created_at)
+           SELECT UUID(), mcm.user_id, mcj.journey_id, mcj.shared_by, 'circle', mcj.circle_id, mcj.shared_at
+           FROM memory_circle_journeys mcj
+           INNER JOIN memory_circle_members mcm ON mcm.circle_id = mcj.circle_id AND mcm.user_id <> mcj.shared_by
+           LEFT JOIN feed_pull_sources s ON s.source_type = 'circle' AND s.source_id = mcj.circle_id
+           WHERE mcj.journey_id = %s AND s.source_id IS NULL""",
+        (journey_id,),
+    )
+
+
+async def remove_friend(cur, user_id: str, friend_id: str):
+    """Take each user's journeys out of the other's feed when they stop being friends."""
+    await cur.execute(
+        """DELETE FROM user_feed_entries
+           WHERE source_type = 'friend'
+             AND ((user_id = %s AND source_id = %s) OR (user_id = %s AND source_id = %s))""",
+        (user_id, friend_id, friend_id, user_id),
+    )
+
+
+# ---------- Read ----------
+_ENTRY_COLUMNS = (
+    "j.id, j.user_id, j.title, j.description, j.journey_type, j.departure_date, "
+    "j.return_date, j.likes_count, j.views_count"
+)
+
+
+def _sources(user_id: str) -> List[Tuple[str, tuple]]:
+    """Every source of a feed as (SQL, params) selecting journey_id, actor_id, source_type, source_id, created_at."""
+    return [
+        # Precomputed entries
+        ("""SELECT f.journey_id, f.actor_id, f.source_type, f.source_id, f.created_at
+            FROM user_feed_entries f
+            INNER JOIN journeys j ON j.id = f.journey_id AND j.visibility <> 'private'
+            WHERE f.user_id = %s""", (user_id,)),
+        # High-follower friends (fan-out on read)
+        ("""SELECT j.id AS journey_id, j.user_id AS actor_id, 'friend' AS source_type,
+                   j.user_id AS source_id, j.created_at
+            FROM user_friends uf
+            INNER JOIN feed_pull_sources s ON s.source_type = 'user' AND s.source_id = uf.friend_id
+            INNER JOIN journeys j ON j.user_id = uf.friend_id AND j.visibility <> 'private'
+            WHERE uf.user_id = %s AND uf.status = 'active'""", (user_id,)),
+        # Large circles (fan-out on read)
+        ("""SELECT mcj.journey_id, mcj.shared_by AS actor_id, 'circle' AS source_type,
+                   mcj.circle_id AS source_id, mcj.shared_at AS created_at
+            FROM memory_circle_members mcm
+            INNER JOIN feed_pull_sources s ON s.source_type = 'circle' AND s.source_id = mcm.circle_id
+            INNER JOIN memory_circle_journeys mcj ON mcj.circle_id = mcm.circle_id
+            INNER JOIN journeys j ON j.id = mcj.journey_id AND j.visibility <> 'private'
+            WHERE mcm.user_id = %s AND mcj.shared_by <> %s""", (user_id, user_id)),
+    ]
+
+
+def _cursor_clause(alias: str, after: Optional[Tuple[datetime, str]]):
+    if after is None:
+        return "", ()
+    ts, journey_id = after
+    return (
+        f" AND ({alias}.created_at < %s OR ({alias}.created_at = %s AND {alias}.journey_id < %s))",
+        (ts, ts, journey_id),
+    )
+
+
+async def _listed_before(cur, user_id: str, ids: List[str], after: Tuple[datetime, str]) -> set:
+    """Ids among ``ids`` that also have an entry at or above the cursor, i.e. on an earlier page.
+
+    Each branch starts from the candidate ids (``uniq_feed_user_journey``, the
+    journeys primary key, ``idx_mcj_journey``), so the cost follows the page
+    size rather than how deep into the feed the cursor is.
+    """
+    ts, journey_id = after
+    placeholders = ", ".join(["%s"] * len(ids))
+    above = "(%s > %%s OR (%s = %%s AND %s >= %%s))"
+    await cur.execute(
+        f"""SELECT f.journey_id
+            FROM user_feed_entries f
+            INNER JOIN journeys j ON j.id = f.journey_id AND j.visibility <> 'private'
+            WHERE f.user_id = %s AND f.journey_id IN ({placeholders})
+              AND {above % ("f.created_at", "f.created_at", "f.journey_id")}
+            UNION
+            SELECT j.id
+            FROM journeys j
+            INNER JOIN feed_pull_sources s ON s.source_type = 'user' AND s.source_id = j.user_id
+            INNER JOIN user_friends uf ON uf.user_id = %s AND uf.friend_id = j.user_id AND uf.status = 'active'
+            WHERE j.id IN ({placeholders}) AND j.visibility <> 'private'
+              AND {above % ("j.created_at", "j.created_at", "j.id")}
+            UNION
+            SELECT mcj.journey_id
+            FROM memory_circle_journeys mcj
+            INNER JOIN feed_pull_sources s ON s.source_type = 'circle' AND s.source_id = mcj.circle_id
+            INNER JOIN memory_circle_members mcm ON mcm.circle_id = mcj.circle_id AND mcm.user_id = %s
+            INNER JOIN journeys j ON j.id = mcj.journey_id AND j.visibility <> 'private'
+            WHERE mcj.journey_id IN ({placeholders}) AND mcj.shared_by <> %s
+              AND {above % ("mcj.shared_at", "mcj.shared_at", "mcj.journey_id")}""",
+        (user_id, *ids, ts, ts, journey_id,
+         user_id, *ids, ts, ts, journey_id,
+         user_id, *ids, user_id, ts, ts, journey_id),
+    )
+    return {r[0] for r in await cur.fetchall()}
+
+
+async def read_feed(cur, user_id: str, limit: int, cursor: Optional[str]) -> dict:
+    after = decode_cursor(cursor)
+    limit = max(1, min(limit, FEED_MAX_PAGE))
+
+    items: List[tuple] = []
+    # Below the last row of a source that filled its page that source may have
+    # unread rows, so only the merged rows above it are in their final order
+    boundary = None
+    clause, clause_params = _cursor_clause("p", after)
+    for sql, params in _sources(user_id):
+        await cur.execute(
+            f"""SELECT p.journey_id, p.actor_id, p.source_type, p.source_id, p.created_at
+                FROM ({sql}) p
+                WHERE 1 = 1{clause}
+                ORDER BY p.created_at DESC, p.journey_id DESC LIMIT %s""",
+            (*params, *clause_params, limit + 1),
+        )
+        rows = await cur.fetchall()
+        items.extend(rows)
+        if len(rows) > limit:
+            last = (rows[-1][4], rows[-1][0])
+            boundary = last if boundary is None else max(boundary, last)
+
+    # Merge, newest first. A journey reachable through several sources is
+    # listed once, at its newest entry, so it can't come back on a later page.
+    items.sort(key=lambda r: (r[4], r[0]), reverse=True)
+    shown = set()
+    if after and items:
+        shown = await _listed_before(cur, user_id, list({r[0] for r in items}), after)
+    page = []
+    last_key = None
+    has_more = boundary is not None
+    for r in items:
+        key = (r[4], r[0])
+        if len(page) == limit or (boundary is not None and key < boundary):
+            has_more = True
+            break
+        last_key = key
+        if r[0] in shown:
+            continue
+        shown.add(r[0])
+        page.append(r)
+
+    journeys = {}
+    if page:
+        ids = [r[0] for r in page]
+        placeholders = ", ".join(["%s"] * len(ids))
+        await cur.execute(
+            f"SELECT {_ENTRY_COLUMNS} FROM journeys j WHERE j.id IN ({placeholders}) AND j.visibility <> 'private'",
+            tuple(ids),
+        )
+        for j in await cur.fetchall():
+            journeys[j[0]] = j
+
+    entries = []
+    for r in page:
+        j = journeys.get(r[0])
+        if not j:
+            continue  # journey deleted or made private after fan-out
+        entries.append({
+            "journey_id": r[0],
+            "actor_id": r[1],
+            "source": r[2],
+            "source_id": r[3],
+            "created_at": r[4].isoformat() if r[4] else "",
+            "journey": {
+                "id": j[0],
+                "user_id": j[1],
+                "title": j[2],
+                "description": j[3] or "",
+                "journey_type": j[4],
+                "departure_date": j[5].isoformat() if j[5] else "",
+                "return_date": j[6].isoformat() if j[6] else "",
+                "likes_count": j[7] or 0,
+                "views_count": j[8] or 0,
+            },
+        })
+
+    # Past the last row looked at, duplicates included; a page may come back short
+    next_cursor = encode_cursor(*last_key) if has_more and last_key else None
+    return {"entries": entries, "next_cursor": next_cursor}
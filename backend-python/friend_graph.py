@@ -0,0 +1,195 @@
+"""Symmetric friend graph over ``user_friends`` with an in-memory adjacency cache.
+
+Every friendship is stored as two rows (A->B and B->A) so both sides can list
+it with the ``user_id`` index. Removals are soft (``status = 'removed'``) and
+every change bumps ``updated_at``, which lets each worker refresh its cached
+adjacency sets incrementally (keyset on ``(updated_at, id)``) instead of
+re-reading the table. ``updated_at`` is set when a statement runs but rows
+become visible in commit order, so, as with the journal sync cursor, the
+watermark stays ``FRIEND_GRAPH_OVERLAP_MS`` behind the database clock and
+changes inside that window are read again next time (re-applying a row's
+current status is harmless).
+"""
+import os
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import feed
+
+FRIEND_GRAPH_CACHE_SIZE = int(os.getenv('FRIEND_GRAPH_CACHE_SIZE', '50000'))
+FRIEND_GRAPH_REFRESH_SECONDS = float(os.getenv('FRIEND_GRAPH_REFRESH_SECONDS', '5'))
+# Longest commit delay tolerated for an edge change
+FRIEND_GRAPH_OVERLAP = timedelta(milliseconds=int(os.getenv('FRIEND_GRAPH_OVERLAP_MS', '2000')))
+# Friends whose own friend lists are expanded when computing suggestions
+SUGGESTION_FANOUT = int(os.getenv('FRIEND_SUGGESTION_FANOUT', '200'))
+REFRESH_BATCH = 5000
+
+
+# ---------- Writes ----------
+async def add_edge(cur, user_id: str, friend_id: str, name: str = "", email: str = "", avatar: str = "") -> str:
+    """Create (or reactivate) both directions of a friendship; returns the user's row id."""
+    await cur.execute(
+        """INSERT INTO user_friends (id, user_id, friend_id, friend_name, friend_email, friend_avatar, status, added_at, updated_at)
+           VALUES (UUID(), %s, %s, %s, %s, %s, 'active', NOW(), NOW(6))
+           ON DUPLICATE KEY UPDATE status = 'active', friend_name = VALUES(friend_name),
+             friend_email = VALUES(friend_email), friend_avatar = VALUES(friend_avatar), updated_at = NOW(6)""",
+        (user_id, friend_id, name, email, avatar),
+    )
+    await cur.execute(
+        """INSERT INTO user_friends (id, user_id, friend_id, status, added_at, updated_at)
+           VALUES (UUID(), %s, %s, 'active', NOW(), NOW(6))
+           ON DUPLICATE KEY UPDATE status = 'active', updated_at = NOW(6)""",
+        (friend_id, user_id),
+    )
+    await cur.execute(
+        "SELECT id FROM user_friends WHERE user_id = %s AND friend_id = %s LIMIT 1",
+        (user_id, friend_id),
+    )
+    row = await cur.fetchone()
+    get_graph().apply(user_id, friend_id, True)
+    return row[0]
+
+
+async def remove_edge(cur, row_id: str) -> bool:
+    """Soft-delete both directions of the friendship identified by one of its row ids.
+
+    Journeys fanned out between the two are removed from both feeds as well.
+    """
+    await cur.execute("SELECT user_id, friend_id FROM user_friends WHERE id = %s LIMIT 1", (row_id,))
+    row = await cur.fetchone()
+    if not row:
+        return False
+    user_id, friend_id = row
+    await cur.execute(
+        """UPDATE user_friends SET status = 'removed', updated_at = NOW(6)
+           WHERE (user_id = %s AND friend_id = %s) OR (user_id = %s AND friend_id = %s)""",
+        (user_id, friend_id, friend_id, user_id),
+    )
+    await feed.remove_friend(cur, user_id, friend_id)
+    get_graph().apply(user_id, friend_id, False)
+    return True
+
+
+# ---------- Adjacency cache ----------
+class FriendGraph:
+    def __init__(self, max_users: int = FRIEND_GRAPH_CACHE_SIZE):
+        self.max_users = max_users
+        self._adj: "OrderedDict[str, Set[str]]" = OrderedDict()
+        # (updated_at, id) up to which every change has been applied
+        self._watermark: Optional[Tuple[datetime, str]] = None
+        self._last_refresh = 0.0
+
+    def _touch(self, user_id: str, friends: Set[str]):
+        self._adj[user_id] = friends
+        self._adj.move_to_end(user_id)
+        while len(self._adj) > self.max_users:
+            self._adj.popitem(last=False)
+
+    def apply(self, user_id: str, friend_id: str, active: bool):
+        """Apply an edge change to whichever endpoints are cached."""
+        for a, b in ((user_id, friend_id), (friend_id, user_id)):
+            friends = self._adj.get(a)
+            if friends is None:
+                continue
+            if active:
+                friends.add(b)
+            else:
+                friends.discard(b)
+
+    async def refresh(self, cur, force: bool = False):
+        """Pull edge changes made since the last refresh (by any worker)."""
+        now = time.monotonic()
+        if not force and now - self._last_refresh < FRIEND_GRAPH_REFRESH_SECONDS:
+            return
+        self._last_refresh = now
+        await cur.execute("SELECT NOW(6)")
+        horizon = (await cur.fetchone())[0] - FRIEND_GRAPH_OVERLAP
+        if self._watermark is None:
+            # Nothing is cached yet; an edge committing late after this is still picked up
+            self._watermark = (horizon, "")
+            return
+        position = self._watermark
+        while True:
+            # Keyset on (updated_at, id) so a burst of changes sharing one timestamp can span batches
+            ts, row_id = position
+            await cur.execute(
+                """SELECT user_id, friend_id, status, updated_at, id FROM user_friends
+                   WHERE updated_at > %s OR (updated_at = %s AND id > %s)
+                   ORDER BY updated_at ASC, id ASC LIMIT %s""",
+                (ts, ts, row_id, REFRESH_BATCH),
+            )
+            rows = await cur.fetchall()
+            for user_id, friend_id, status, _, _ in rows:
+                friends = self._adj.get(user_id)
+                if friends is None:
+                    continue
+                if status == 'active':
+                    friends.add(friend_id)
+                else:
+                    friends.discard(friend_id)
+            if rows:
+                position = (rows[-1][3], rows[-1][4])
+                # Only past the horizon can no earlier change still commit
+                settled = [r for r in rows if r[3] < horizon]
+                if settled:
+                    self._watermark = (settled[-1][3], settled[-1][4])
+            if len(rows) < REFRESH_BATCH:
+                break
+
+    async def friends_of_many(self, cur, user_ids: Iterable[str]) -> Dict[str, Set[str]]:
+        await self.refresh(cur)
+        result: Dict[str, Set[str]] = {}
+        missing: List[str] = []
+        for uid in user_ids:
+            friends = self._adj.get(uid)
+            if friends is None:
+                missing.append(uid)
+            else:
+                self._adj.move_to_end(uid)
+                result[uid] = friends
+        if missing:
+            loaded: Dict[str, Set[str]] = {uid: set() for uid in missing}
+            placeholders = ", ".join(["%s"] * len(missing))
+            await cur.execute(
+                f"""SELECT user_id, friend_id FROM user_friends
+                    WHERE user_id IN ({placeholders}) AND status = 'active'""",
+                tuple(missing),
+            )
+            for user_id, friend_id in await cur.fetchall():
+                loaded[user_id].add(friend_id)
+            for uid, friends in loaded.items():
+                self._touch(uid, friends)
+                result[uid] = friends
+        return result
+
+    async def friends_of(self, cur, user_id: str) -> Set[str]:
+        return (await self.friends_of_many(cur, [user_id]))[user_id]
+
+    async def mutual_friends(self, cur, user_id: str, other_id: str) -> Set[str]:
+        adj = await self.friends_of_many(cur, [user_id, other_id])
+        return adj[user_id] & adj[other_id]
+
+    async def suggestions(self, cur, user_id: str, limit: int = 10) -> List[tuple]:
+        """Friends-of-friends ranked by number of mutual friends."""
+        mine = await self.friends_of(cur, user_id)
+        # Deterministic subset for users with very large friend lists
+        expand = sorted(mine)[:SUGGESTION_FANOUT]
+        adj = await self.friends_of_many(cur, expand)
+        counts: Counter = Counter()
+        for friend in expand:
+            for candidate in adj.get(friend, ()):
+                if candidate != user_id and candidate not in mine:
+                    counts[candidate] += 1
+        return sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+
+
+_graph: Optional[FriendGraph] = None
+
+
+def get_graph() -> FriendGraph:
+    global _graph
+    if _graph is None:
+        _graph = FriendGraph()
+    return _graph
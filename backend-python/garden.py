@@ -0,0 +1,38 @@
+"""Memory garden growth rules.
+
+``growth_stage`` stores the stage reached at ``last_watered``; plants then wilt
+one stage per ``GARDEN_DECAY_DAYS`` without water (never below 1). The
+current stage is derived from those two columns whenever a plant is read or
+watered, so no background job has to touch the table.
+"""
+import os
+from datetime import datetime
+from typing import Optional
+
+MAX_STAGE = 5
+GARDEN_DECAY_DAYS = int(os.getenv('GARDEN_DECAY_DAYS', '7'))
+
+# SQL form of effective_stage(), used inside single-statement updates
+EFFECTIVE_STAGE_SQL = (
+    f"GREATEST(1, growth_stage - FLOOR(TIMESTAMPDIFF(HOUR, last_watered, NOW()) / {GARDEN_DECAY_DAYS * 24}))"
+)
+WATERED_STAGE_SQL = f"LEAST({EFFECTIVE_STAGE_SQL} + 1, {MAX_STAGE})"
+
+# Column order of the compact layout payload
+LAYOUT_FIELDS = ["id", "journey_id", "plant_type", "plant_name", "growth_stage", "position_x", "position_y", "color", "needs_water"]
+
+
+def effective_stage(stage: int, last_watered: Optional[datetime], now: Optional[datetime] = None) -> int:
+    if not last_watered:
+        return stage or 1
+    now = now or datetime.now()
+    hours = max(0, int((now - last_watered).total_seconds() // 3600))
+    return max(1, (stage or 1) - hours // (GARDEN_DECAY_DAYS * 24))
+
+
+def needs_water(last_watered: Optional[datetime], now: Optional[datetime] = None) -> bool:
+    """True once a plant has gone a full decay period without water."""
+    if not last_watered:
+        return True
+    now = now or datetime.now()
+    return (now - last_watered).total_seconds() >= GARDEN_DECAY_DAYS * 86400
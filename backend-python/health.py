@@ -0,0 +1,110 @@
+"""Readiness checks: DB pool, DB round trip and event loop lag.
+
+``/api/health`` stays a cheap liveness probe that never touches the database;
+``readiness()`` backs ``/api/health/ready`` and reports ``ok``, ``degraded``
+(slow but working) or ``unavailable`` (pool exhausted or DB unreachable).
+"""
+import os
+import time
+import asyncio
+from typing import Optional, Tuple
+
+HEALTH_ACQUIRE_TIMEOUT = float(os.getenv('HEALTH_ACQUIRE_TIMEOUT_MS', '1000')) / 1000
+HEALTH_QUERY_TIMEOUT = float(os.getenv('HEALTH_QUERY_TIMEOUT_MS', '1000')) / 1000
+HEALTH_MAX_ACQUIRE_MS = float(os.getenv('HEALTH_MAX_ACQUIRE_MS', '250'))
+HEALTH_MAX_DB_MS = float(os.getenv('HEALTH_MAX_DB_MS', '250'))
+HEALTH_MAX_LOOP_LAG_MS = float(os.getenv('HEALTH_MAX_LOOP_LAG_MS', '200'))
+# Status code for "degraded"; orchestrators treat non-2xx as "stop routing here"
+HEALTH_DEGRADED_STATUS = int(os.getenv('HEALTH_DEGRADED_STATUS', '503'))
+LOOP_LAG_INTERVAL = 0.5
+
+
+class LoopLagMonitor:
+    """Measures how late a periodic timer fires, i.e. how long the loop is blocked."""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            self.max_lag_ms = max(self.max_lag_ms, self.lag_ms)
+
+
+loop_monitor = LoopLagMonitor()
+
+
+async def _ping(get_pool) -> Tuple[dict, Optional[str]]:
+    report = {"acquire_ms": None, "db_rtt_ms": None}
+    pool = await asyncio.wait_for(get_pool(), HEALTH_ACQUIRE_TIMEOUT)
+    report.update({"pool_size": pool.size, "pool_free": pool.freesize, "pool_max": pool.maxsize})
+
+    start = time.perf_counter()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), HEALTH_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        return report, "pool acquire timed out"
+    report["acquire_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    try:
+        start = time.perf_counter()
+        async with conn.cursor() as cur:
+            await asyncio.wait_for(cur.execute("SELECT 1"), HEALTH_QUERY_TIMEOUT)
+            await cur.fetchone()
+        report["db_rtt_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    except asyncio.TimeoutError:
+        # The connection may be mid-query; don't hand it back to other requests
+        conn.close()
+        return report, "database ping timed out"
+    finally:
+        pool.release(conn)
+    return report, None
+
+
+async def readiness(get_pool) -> Tuple[int, dict]:
+    """Return (HTTP status, report) for the readiness probe."""
+    report = {
+        "status": "ok",
+        "loop_lag_ms": round(loop_monitor.lag_ms, 2),
+        "loop_lag_max_ms": round(loop_monitor.max_lag_ms, 2),
+    }
+    try:
+        db_report, error = await _ping(get_pool)
+        report.update(db_report)
+    except Exception as e:
+        error = f"database unavailable: {e.__class__.__name__}"
+    if error:
+        report["status"] = "unavailable"
+        report["error"] = error
+        return 503, report
+
+    reasons = []
+    if report["acquire_ms"] > HEALTH_MAX_ACQUIRE_MS:
+        reasons.append("slow pool acquire")
+    if report["db_rtt_ms"] > HEALTH_MAX_DB_MS:
+        reasons.append("slow database")
+    if report["loop_lag_ms"] > HEALTH_MAX_LOOP_LAG_MS:
+        reasons.append("event loop lag")
+    if reasons:
+        report["status"] = "degraded"
+        report["reasons"] = reasons
+        return HEALTH_DEGRADED_STATUS, report
+    return 200, report
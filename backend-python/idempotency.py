@@ -0,0 +1,301 @@
+"""``Idempotency-Key`` support for POST/PATCH requests.
+
+A client that may retry a create (flaky mobile networks) sends a unique
+``Idempotency-Key`` header. The first request with a key runs normally and its
+response is stored; a retry from the same client (``X-User-Id``, else
+``user_id`` in the query, else the IP, as for rate limits) with the same key,
+method and path gets the stored
+status, headers and body back (with ``Idempotent-Replayed: true``) without
+running the handler again, so no duplicate journey, photo, friend or garden plant is
+written. While the first request is still running a retry gets ``409``; reusing
+a key for a different body gets ``422``. 5xx responses and failures are not
+stored, so a retry after those runs again. Response headers are replayed as
+sent (``ETag``, ``Location``, ``X-Next-Cursor``) except hop-by-hop ones,
+``Content-Length`` (recomputed), and ``Set-Cookie`` and ``Server-Timing``,
+which belong to the original exchange only.
+
+Requests without the header are untouched. ``/api/media`` is exempt: uploads
+are streamed rather than buffered and the blob store already dedupes them.
+
+Environment:
+  IDEMPOTENCY_STORE         ``db`` (shared by all workers, default) or ``memory``
+  IDEMPOTENCY_TTL_SECONDS   how long a key is remembered (default 86400)
+  IDEMPOTENCY_LOCK_SECONDS  after this an unfinished claim is assumed dead (default 60)
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from admission import client_key
+
+IDEMPOTENCY_STORE = os.getenv('IDEMPOTENCY_STORE', 'db')
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv('IDEMPOTENCY_LOCK_SECONDS', '60'))
+HEADER = b"idempotency-key"
+METHODS = ("POST", "PATCH")
+EXEMPT_PATHS = ("/api/media",)
+MAX_KEY_LENGTH = 255
+# Keys remembered by the in-memory store; the oldest are forgotten first
+MAX_MEMORY_KEYS = 50_000
+PURGE_INTERVAL = 300
+# Not stored with a response: hop-by-hop (RFC 9110 7.6.1), recomputed on replay,
+# or specific to the original exchange (cookies, server timings)
+UNSTORED_HEADERS = frozenset((
+    b"connection", b"keep-alive", b"proxy-connection", b"te", b"trailer", b"transfer-encoding", b"upgrade",
+    b"content-length", b"date", b"server", b"set-cookie", b"server-timing",
+))
+
+logger = logging.getLogger("idempotency")
+
+
+class Record:
+    __slots__ = ("fingerprint", "status", "headers", "body")
+
+    def __init__(self, fingerprint: str, status: Optional[int] = None,
+                 headers: Optional[List[Tuple[bytes, bytes]]] = None, body: bytes = b""):
+        self.fingerprint = fingerprint
+        self.status = status  # None while the first request is running
+        self.headers = headers or []
+        self.body = body
+
+    @property
+    def content_type(self) -> str:
+        return next((v for k, v in self.headers if k == b"content-type"), b"").decode("latin-1")
+
+
+def _encode_headers(headers: List[Tuple[bytes, bytes]]) -> str:
+    return json.dumps([[k.decode("latin-1"), v.decode("latin-1")] for k, v in headers])
+
+
+def _decode_headers(raw: Optional[str], content_type: Optional[str]) -> List[Tuple[bytes, bytes]]:
+    if raw is None:
+        # Stored before headers were kept
+        return [(b"content-type", content_type.encode("latin-1"))] if content_type else []
+    return [(k.encode("latin-1"), v.encode("latin-1")) for k, v in json.loads(raw)]
+
+
+class MemoryStore:
+    """Per-worker store; enough for a single worker or sticky load balancing."""
+
+    def __init__(self, ttl: int = IDEMPOTENCY_TTL_SECONDS, max_keys: int = MAX_MEMORY_KEYS):
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self._items: "OrderedDict[str, Tuple[float, float, Record]]" = OrderedDict()
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[Record]:
+        """Take ownership of ``key``: None if claimed, else the existing record."""
+        now = time.monotonic()
+        item = self._items.get(key)
+        if item is not None:
+            expires, claimed_at, record = item
+            stale = record.status is None and now - claimed_at > IDEMPOTENCY_LOCK_SECONDS
+            if expires > now and not stale:
+                return record
+        self._items[key] = (now + self.ttl, now, Record(fingerprint))
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_keys:
+            self._items.popitem(last=False)
+        return None
+
+    async def complete(self, key: str, record: Record):
+        item = self._items.get(key)
+        if item is not None:
+            self._items[key] = (item[0], item[1], record)
+
+    async def release(self, key: str):
+        self._items.pop(key, None)
+
+
+class DbStore:
+    """Keys in the ``idempotency_keys`` table, shared by every worker."""
+
+    def __init__(self, get_pool, ttl: int = IDEMPOTENCY_TTL_SECONDS):
+        self.get_pool = get_pool
+        self.ttl = ttl
+        self._next_purge = 0.0
+
+    async def claim(self, key: str, fingerprint: str) -> Optional[Record]:
+        pool = await self.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await self._purge(cur)
+                for _ in range(2):
+                    await cur.execute(
+                        """INSERT IGNORE INTO idempotency_keys (id, fingerprint, claimed_at, expires_at)
+                           VALUES (%s, %s, NOW(), NOW() + INTERVAL %s SECOND)""",
+                        (key, fingerprint, self.ttl),
+                    )
+                    if cur.rowcount:
+                        return None
+                    await cur.execute(
+                        """SELECT fingerprint, status, content_type, body,
+                                  expires_at < NOW(),
+                                  status IS NULL AND claimed_at < NOW() - INTERVAL %s SECOND,
+                                  headers
+                           FROM idempotency_keys WHERE id = %s""",
+                        (IDEMPOTENCY_LOCK_SECONDS, key),
+                    )
+                    row = await cur.fetchone()
+                    if row is None:
+                        continue  # released meanwhile
+                    if not (row[4] or row[5]):
+                        return Record(row[0], row[1], _decode_headers(row[6], row[2]), row[3] or b"")
+                    # Expired, or its owner died mid-request: drop it and claim again
+                    await cur.execute("DELETE FROM idempotency_keys WHERE id = %s AND fingerprint = %s AND status <=> %s",
+                                      (key, row[0], row[1]))
+        return Record(fingerprint)  # lost the race twice; report it as in progress
+
+    async def complete(self, key: str, record: Record):
+        pool = await self.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    "UPDATE idempotency_keys SET status = %s, content_type = %s, headers = %s, body = %s WHERE id = %s",
+                    (record.status, record.content_type, _encode_headers(record.headers), record.body, key),
+                )
+
+    async def release(self, key: str):
+        pool = await self.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute("DELETE FROM idempotency_keys WHERE id = %s AND status IS NULL", (key,))
+
+    async def _purge(self, cur):
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + PURGE_INTERVAL
+        await cur.execute("DELETE FROM idempotency_keys WHERE expires_at < NOW() LIMIT 1000")
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        if IDEMPOTENCY_STORE == "memory":
+            _store = MemoryStore()
+        else:
+            import db
+            _store = DbStore(db.get_pool)
+    return _store
+
+
+# ---------- ASGI middleware ----------
+def _header(scope, name: bytes) -> Optional[bytes]:
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value
+    return None
+
+
+async def _send_json(send, status: int, payload: dict, extra_headers=()):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1")),
+                    *extra_headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class IdempotencyMiddleware:
+    """Replays the stored response for a repeated ``Idempotency-Key``."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in METHODS or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        raw_key = _header(scope, HEADER)
+        if raw_key is None:
+            await self.app(scope, receive, send)
+            return
+        if not raw_key or len(raw_key) > MAX_KEY_LENGTH:
+            await _send_json(send, 400, {"detail": f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"})
+            return
+
+        # The body is needed up front to tell a retry from a key reused for something else
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        body = b"".join(chunks)
+        # Scoped to the caller, so clients that happen to pick the same key never see each other's responses
+        key = hashlib.sha256(b"%s\n%s %s\n%s" % (
+            client_key(scope).encode("utf-8"), scope["method"].encode(), scope["path"].encode(), raw_key)).hexdigest()
+        fingerprint = hashlib.sha256(scope.get("query_string", b"") + b"\n" + body).hexdigest()
+
+        store = get_store()
+        existing = await store.claim(key, fingerprint)
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                await _send_json(send, 422, {"detail": "Idempotency-Key was already used for a different request"})
+            elif existing.status is None:
+                await _send_json(send, 409, {"detail": "A request with this Idempotency-Key is still in progress"},
+                                 [(b"retry-after", b"1")])
+            else:
+                await send({
+                    "type": "http.response.start",
+                    "status": existing.status,
+                    "headers": [*existing.headers,
+                                (b"content-length", str(len(existing.body)).encode("latin-1")),
+                                (b"idempotent-replayed", b"true")],
+                })
+                await send({"type": "http.response.body", "body": existing.body})
+            return
+
+        replayed = False
+
+        async def replay_receive():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        response = {"status": None, "headers": [], "body": [], "streamed": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = [(k.lower(), v) for k, v in message.get("headers", ())
+                                       if k.lower() not in UNSTORED_HEADERS]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+                if message.get("more_body", False):
+                    response["streamed"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, send_wrapper)
+        except BaseException:
+            await self._release(store, key)
+            raise
+        status = response["status"]
+        if status is not None and status < 500 and not response["streamed"]:
+            try:
+                await store.complete(key, Record(fingerprint, status, response["headers"], b"".join(response["body"])))
+                return
+            except Exception:
+                logger.exception("could not store idempotent response")
+        await self._release(store, key)
+
+    @staticmethod
+    async def _release(store, key: str):
+        try:
+            await store.release(key)
+        except Exception:
+            logger.exception("could not release idempotency key")
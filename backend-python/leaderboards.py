@@ -0,0 +1,244 @@
+"""Trending and top-liked journeys, materialized into small leaderboard tables.
+
+Likes and views are counted per journey and UTC hour in
+``journey_engagement_hourly``, compacted from the engagement event log
+(see engagement.py). A background task
+rebuilds the top ``LEADERBOARD_SIZE`` of every board from those hourly
+counters into ``journey_leaderboards`` keyed by (board, position), so serving
+a page is a primary-key range read of ``limit`` rows whatever the number of
+journeys. Only public journeys are ranked; one that stops being public (or is
+deleted) is taken off every board at once by ``remove_journey()``, so pages
+never need to filter and always come back full while ranked entries remain.
+
+Boards:
+  trending_24h, trending_7d   likes x ``LEADERBOARD_LIKE_WEIGHT`` + views, each
+                              hour's counts halved every ``half_life`` hours
+  top_24h, top_7d             likes within the window
+  top_all                     ``likes_count`` (via ``idx_journeys_likes``)
+
+Every rebuild is a full re-rank of the board's window followed by a
+``DELETE`` and re-insert of its rows. What a pass saves is rebuilding boards
+that can't have changed: a board is skipped unless the counters changed since
+its last build (``MAX(updated_at)``), the window moved to a new hour, a
+journey was removed from it, or ``LEADERBOARD_MAX_AGE`` passed (journeys that
+became public). Exponential decay scales every score by the same factor as
+time passes, so an unchanged board keeps its order between rebuilds. One
+worker in the cluster refreshes at a time (``GET_LOCK``); the others skip the
+pass.
+
+Environment:
+  LEADERBOARD_REFRESH_SECONDS  seconds between refresh passes (default 60, 0 disables)
+  LEADERBOARD_MAX_AGE          rebuild at least this often, seconds (default 900)
+  LEADERBOARD_SIZE             journeys kept per board (default 1000)
+  LEADERBOARD_LIKE_WEIGHT      a like counts as this many views in trending (default 5)
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, NamedTuple, Optional
+
+import metrics
+
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv('LEADERBOARD_REFRESH_SECONDS', '60'))
+LEADERBOARD_MAX_AGE = float(os.getenv('LEADERBOARD_MAX_AGE', '900'))
+LEADERBOARD_SIZE = int(os.getenv('LEADERBOARD_SIZE', '1000'))
+LEADERBOARD_LIKE_WEIGHT = float(os.getenv('LEADERBOARD_LIKE_WEIGHT', '5'))
+LEADERBOARD_MAX_PAGE = 100
+# Hourly counters older than the longest window (plus a day of slack) are deleted
+ENGAGEMENT_RETENTION_HOURS = 8 * 24
+PURGE_BATCH = 5000
+REFRESH_LOCK = "memory_of_journeys.leaderboards"
+
+logger = logging.getLogger("leaderboards")
+
+
+class Board(NamedTuple):
+    kind: str                      # trending | top
+    window_hours: Optional[int]    # None = all time
+    half_life_hours: float = 0.0   # trending only
+
+
+BOARDS: Dict[str, Board] = {
+    "trending_24h": Board("trending", 24, 6),
+    "trending_7d": Board("trending", 7 * 24, 36),
+    "top_24h": Board("top", 24),
+    "top_7d": Board("top", 7 * 24),
+    "top_all": Board("top", None),
+}
+
+
+def board_name(kind: str, window: str) -> Optional[str]:
+    """``trending`` + ``24h`` -> ``trending_24h``; None if there is no such board."""
+    name = f"{kind}_{window}"
+    return name if name in BOARDS else None
+
+
+# ---------- Materialization ----------
+def _ranking_query(board: Board):
+    """SQL and parameters returning (journey_id, score), best first."""
+    if board.window_hours is None:
+        return (
+            """SELECT id, likes_count FROM journeys
+               WHERE visibility = 'public' AND likes_count > 0
+               ORDER BY likes_count DESC LIMIT %s""",
+            (LEADERBOARD_SIZE,),
+        )
+    if board.kind == "trending":
+        score = ("SUM((e.likes * %s + e.views) * "
+                 "POW(0.5, TIMESTAMPDIFF(SECOND, e.bucket_start, UTC_TIMESTAMP()) / %s))")
+        score_params = (LEADERBOARD_LIKE_WEIGHT, board.half_life_hours * 3600)
+    else:
+        score, score_params = "SUM(e.likes)", ()
+    return (
+        f"""SELECT e.journey_id, {score} AS score
+            FROM journey_engagement_hourly e
+            INNER JOIN journeys j ON j.id = e.journey_id AND j.visibility = 'public'
+            WHERE e.bucket_start > UTC_TIMESTAMP() - INTERVAL %s HOUR
+            GROUP BY e.journey_id
+            HAVING score > 0
+            ORDER BY score DESC LIMIT %s""",
+        score_params + (board.window_hours, LEADERBOARD_SIZE),
+    )
+
+
+async def _source_version(cur) -> str:
+    """Changes whenever a counter is written or a window moves to the next hour."""
+    await cur.execute(
+        "SELECT MAX(updated_at), UNIX_TIMESTAMP() DIV 3600 FROM journey_engagement_hourly"
+    )
+    latest, hour = await cur.fetchone()
+    return f"{latest.isoformat() if latest else ''}|{hour}"
+
+
+async def refresh_board(conn, cur, name: str, version: str):
+    """Rebuild one board; readers see the old or the new ranking, never a mix."""
+    sql, params = _ranking_query(BOARDS[name])
+    await cur.execute(sql, params)
+    rows = await cur.fetchall()
+    await conn.begin()
+    try:
+        await cur.execute("DELETE FROM journey_leaderboards WHERE board = %s", (name,))
+        if rows:
+            await cur.executemany(
+                "INSERT INTO journey_leaderboards (board, position, journey_id, score) VALUES (%s, %s, %s, %s)",
+                [(name, i, r[0], float(r[1])) for i, r in enumerate(rows, start=1)],
+            )
+        await cur.execute(
+            """REPLACE INTO journey_leaderboard_meta (board, source_version, entries, refreshed_at)
+               VALUES (%s, %s, %s, NOW())""",
+            (name, version, len(rows)),
+        )
+        await conn.commit()
+    except BaseException:
+        await conn.rollback()
+        raise
+
+
+async def refresh(get_pool, force: bool = False) -> Dict[str, str]:
+    """One refresh pass over every board: ``{board: refreshed|unchanged}``, empty if another worker holds the lock."""
+    pool = await get_pool()
+    results = {}
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT GET_LOCK(%s, 0)", (REFRESH_LOCK,))
+            if not (await cur.fetchone())[0]:
+                return results
+            try:
+                version = await _source_version(cur)
+                await cur.execute(
+                    "SELECT board, source_version, TIMESTAMPDIFF(SECOND, refreshed_at, NOW()) FROM journey_leaderboard_meta"
+                )
+                built = {r[0]: (r[1], r[2]) for r in await cur.fetchall()}
+                for name in BOARDS:
+                    previous = built.get(name)
+                    if not force and previous and previous[0] == version and previous[1] < LEADERBOARD_MAX_AGE:
+                        results[name] = "unchanged"
+                    else:
+                        await refresh_board(conn, cur, name, version)
+                        results[name] = "refreshed"
+                    metrics.leaderboard_refresh_total.inc(name, results[name])
+                await cur.execute(
+                    "DELETE FROM journey_engagement_hourly WHERE bucket_start < UTC_TIMESTAMP() - INTERVAL %s HOUR LIMIT %s",
+                    (ENGAGEMENT_RETENTION_HOURS, PURGE_BATCH),
+                )
+            finally:
+                await cur.execute("SELECT RELEASE_LOCK(%s)", (REFRESH_LOCK,))
+    return results
+
+
+class LeaderboardRefresher:
+    """Runs ``refresh()`` every ``interval`` seconds for the life of the app."""
+
+    def __init__(self, interval: float = LEADERBOARD_REFRESH_SECONDS):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        import db
+
+        while True:
+            started = time.perf_counter()
+            try:
+                results = await refresh(db.get_pool)
+                if "refreshed" in results.values():
+                    logger.info("leaderboards refreshed", extra={"fields": {
+                        "boards": [b for b, r in results.items() if r == "refreshed"],
+                        "ms": round((time.perf_counter() - started) * 1000, 1),
+                    }})
+            except Exception:
+                logger.exception("leaderboard refresh failed")
+            await asyncio.sleep(self.interval)
+
+
+refresher = LeaderboardRefresher()
+
+
+async def remove_journey(cur, journey_id: str):
+    """Take a journey off every board now; the next pass rebuilds those boards to close the gap."""
+    # Clearing source_version forces the rebuild; the lower entry count changes the boards' ETags
+    await cur.execute(
+        """UPDATE journey_leaderboard_meta m
+           INNER JOIN (SELECT board, COUNT(*) AS n FROM journey_leaderboards
+                       WHERE journey_id = %s GROUP BY board) d ON d.board = m.board
+           SET m.entries = m.entries - d.n, m.source_version = ''""",
+        (journey_id,),
+    )
+    if cur.rowcount:
+        await cur.execute("DELETE FROM journey_leaderboards WHERE journey_id = %s", (journey_id,))
+
+
+# ---------- Reads ----------
+async def board_version(cur, name: str):
+    """(entries, refreshed_at) of the board's last build, or None before the first one."""
+    await cur.execute("SELECT entries, refreshed_at FROM journey_leaderboard_meta WHERE board = %s", (name,))
+    return await cur.fetchone()
+
+
+async def page(cur, name: str, after: int, limit: int, columns: str):
+    """Rows ``(position, score, *columns)`` ranked after ``after``; reads ``limit`` index entries.
+
+    Boards hold public journeys only (see ``remove_journey``), so nothing is filtered here.
+    """
+    await cur.execute(
+        f"""SELECT l.position, l.score, {columns}
+            FROM journey_leaderboards l
+            INNER JOIN journeys ON journeys.id = l.journey_id
+            WHERE l.board = %s AND l.position > %s
+            ORDER BY l.position LIMIT %s""",
+        (name, after, limit),
+    )
+    return await cur.fetchall()
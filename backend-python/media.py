@@ -0,0 +1,340 @@
+"""Content-addressed media storage for album photos.
+
+Uploads are streamed to disk while being hashed; the file is stored under its
+SHA-256 (``<digest>.<ext>``), so the same image uploaded twice is kept once,
+and only the short ``/api/media/<key>`` URL goes into ``album_photos.image_url``.
+Blobs are immutable, which lets ``/api/media/{key}`` be cached forever. The URL
+sits under ``/api`` so it reaches the backend through the same dev proxy and
+deployment rewrites as the rest of the API.
+
+``MEDIA_STORE`` selects the store: empty for the local filesystem under
+``MEDIA_ROOT``, or ``package.module:ClassName`` for a custom store with the
+same interface (``writer()``, ``path()``/``public_url()``, ``exists()``).
+
+Move inline ``data:`` URLs already in the database into the store with:
+
+    python media.py migrate
+"""
+import os
+import re
+import sys
+import uuid
+import base64
+import asyncio
+import hashlib
+import importlib
+from typing import AsyncIterator, Optional, Tuple
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    from multipart.multipart import MultipartParser, parse_options_header
+
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'media'))
+MEDIA_STORE = os.getenv('MEDIA_STORE', '')
+MEDIA_URL_PREFIX = "/api/media/"
+MEDIA_MAX_BYTES = int(os.getenv('MEDIA_MAX_BYTES', str(25 * 1024 * 1024)))
+# Writes are batched into chunks this big before going to a worker thread
+WRITE_BUFFER = 256 * 1024
+
+CONTENT_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/avif": ".avif",
+    "image/heic": ".heic",
+}
+EXTENSION_TYPES = {ext: ctype for ctype, ext in CONTENT_TYPES.items()}
+KEY_RE = re.compile(r"^[0-9a-f]{64}\.[a-z]{3,4}$")
+
+
+class MediaError(ValueError):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def media_url(key: str) -> str:
+    return MEDIA_URL_PREFIX + key
+
+
+def key_from_url(url: Optional[str]) -> Optional[str]:
+    """The blob key of an ``/api/media/<key>`` URL, or None for external URLs."""
+    if url and url.startswith(MEDIA_URL_PREFIX):
+        key = url[len(MEDIA_URL_PREFIX):]
+        if KEY_RE.match(key):
+            return key
+    return None
+
+
+def content_type_for(key: str) -> str:
+    return EXTENSION_TYPES.get(os.path.splitext(key)[1], "application/octet-stream")
+
+
+class BlobWriter:
+    """Streams one upload to a temp file, hashing as it goes."""
+
+    def __init__(self, store: "LocalBlobStore", content_type: str, max_bytes: int = MEDIA_MAX_BYTES):
+        ctype = content_type.split(";")[0].strip().lower()
+        if ctype not in CONTENT_TYPES:
+            raise MediaError(f"Unsupported media type: {ctype or 'unknown'}", 415)
+        self.store = store
+        self.content_type = ctype
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+        self._tmp_path = os.path.join(store.tmp_dir, uuid.uuid4().hex)
+        self._file = open(self._tmp_path, "wb")
+
+    async def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise MediaError(f"File exceeds {self.max_bytes} bytes", 413)
+        self._hash.update(data)
+        self._buffer += data
+        if len(self._buffer) >= WRITE_BUFFER:
+            await self._flush()
+
+    async def _flush(self):
+        if self._buffer:
+            chunk, self._buffer = bytes(self._buffer), bytearray()
+            await asyncio.to_thread(self._file.write, chunk)
+
+    async def commit(self) -> dict:
+        if self.size == 0:
+            await self.abort()
+            raise MediaError("Empty file")
+        await self._flush()
+        await asyncio.to_thread(self._file.close)
+        digest = self._hash.hexdigest()
+        key = digest + CONTENT_TYPES[self.content_type]
+        deduplicated = await asyncio.to_thread(self.store._place, self._tmp_path, key)
+        return {
+            "key": key,
+            "url": media_url(key),
+            "sha256": digest,
+            "size": self.size,
+            "content_type": self.content_type,
+            "deduplicated": deduplicated,
+        }
+
+    async def abort(self):
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+class LocalBlobStore:
+    """Files under ``root/ab/cd/<key>``; the fan-out keeps directories small."""
+
+    def __init__(self, root: str = MEDIA_ROOT):
+        self.root = root
+        self.tmp_dir = os.path.join(root, ".tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, key: str) -> Optional[str]:
+        if not KEY_RE.match(key):
+            return None
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def public_url(self, key: str) -> Optional[str]:
+        return None  # served by /api/media/{key}
+
+    def exists(self, key: str) -> bool:
+        path = self.path(key)
+        return path is not None and os.path.exists(path)
+
+    def writer(self, content_type: str) -> BlobWriter:
+        return BlobWriter(self, content_type)
+
+    def _place(self, tmp_path: str, key: str) -> bool:
+        """Move a finished upload into place; True if the blob already existed."""
+        final = self.path(key)
+        if os.path.exists(final):
+            os.remove(tmp_path)
+            return True
+        os.makedirs(os.path.dirname(final), exist_ok=True)
+        os.replace(tmp_path, final)
+        return False
+
+    async def put_bytes(self, data: bytes, content_type: str) -> dict:
+        writer = self.writer(content_type)
+        try:
+            await writer.write(data)
+            return await writer.commit()
+        except BaseException:
+            await writer.abort()
+            raise
+
+
+_store = None
+
+
+def get_store() -> LocalBlobStore:
+    global _store
+    if _store is None:
+        if MEDIA_STORE:
+            module_name, _, class_name = MEDIA_STORE.partition(":")
+            _store = getattr(importlib.import_module(module_name), class_name)()
+        else:
+            _store = LocalBlobStore()
+    return _store
+
+
+async def save_multipart(store, content_type: str, chunks: AsyncIterator[bytes], field: str = "file") -> dict:
+    """Store the first file part named ``field`` of a multipart body as it arrives."""
+    _, params = parse_options_header(content_type)
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise MediaError("Expected multipart/form-data with a boundary")
+
+    events = []
+    current = {"field": b"", "value": b""}
+    headers = {}
+
+    def on_header_field(data, start, end):
+        current["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        current["value"] += data[start:end]
+
+    def on_header_end():
+        headers[current["field"].lower()] = current["value"]
+        current["field"], current["value"] = b"", b""
+
+    def on_headers_finished():
+        events.append(("headers", dict(headers)))
+        headers.clear()
+
+    def on_part_data(data, start, end):
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = MultipartParser(boundary, callbacks={
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    writer: Optional[BlobWriter] = None
+    result = None
+    try:
+        async for chunk in chunks:
+            parser.write(chunk)
+            for kind, value in events:
+                if kind == "headers" and result is None:
+                    _, options = parse_options_header(value.get(b"content-disposition", b""))
+                    if options.get(b"name") == field.encode() and b"filename" in options:
+                        writer = store.writer(value.get(b"content-type", b"").decode("latin-1"))
+                elif kind == "data" and writer is not None:
+                    await writer.write(value)
+                elif kind == "end" and writer is not None:
+                    result = await writer.commit()
+                    writer = None
+            events.clear()
+        parser.finalize()
+    finally:
+        if writer is not None:
+            await writer.abort()
+    if result is None:
+        raise MediaError(f"No file part named '{field}'")
+    return result
+
+
+def decode_data_url(url: str) -> Tuple[str, bytes]:
+    """(content type, bytes) of a base64 ``data:`` URL."""
+    header, sep, payload = url.partition(",")
+    if not sep or not header.startswith("data:") or not header.endswith(";base64"):
+        raise MediaError("Only base64 data URLs are supported")
+    if len(payload) * 3 // 4 > MEDIA_MAX_BYTES:
+        raise MediaError(f"File exceeds {MEDIA_MAX_BYTES} bytes", 413)
+    try:
+        data = base64.b64decode(payload, validate=True)
+    except ValueError:
+        raise MediaError("Invalid base64 in data URL")
+    return header[5:-7], data
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """Inclusive (start, end) for a single ``bytes=`` range; None means send everything.
+
+    Multiple ranges are answered with the full body, which RFC 9110 allows.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    first, _, last = header[6:].strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            length = int(last)
+            if length == 0:
+                raise MediaError("Range not satisfiable", 416)
+            start, end = max(0, size - length), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise MediaError("Range not satisfiable", 416)
+    return start, min(end, size - 1)
+
+
+async def iter_file(path: str, start: int, length: int, chunk_size: int = 256 * 1024) -> AsyncIterator[bytes]:
+    with open(path, "rb") as f:
+        await asyncio.to_thread(f.seek, start)
+        while length > 0:
+            chunk = await asyncio.to_thread(f.read, min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+# ---------- Migration of inline data URLs ----------
+async def migrate_data_urls(batch: int = 50) -> int:
+    import db
+
+    store = get_store()
+    pool = await db.get_pool()
+    moved, last_id = 0, ""
+    while True:
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """SELECT id, image_url FROM album_photos
+                       WHERE id > %s AND image_url LIKE 'data:%%' ORDER BY id LIMIT %s""",
+                    (last_id, batch),
+                )
+                rows = await cur.fetchall()
+                if not rows:
+                    break
+                for photo_id, url in rows:
+                    last_id = photo_id
+                    try:
+                        content_type, data = decode_data_url(url)
+                        blob = await store.put_bytes(data, content_type)
+                    except MediaError as e:
+                        print(f"skipped {photo_id}: {e}", file=sys.stderr)
+                        continue
+                    await cur.execute(
+                        "UPDATE album_photos SET image_url = %s WHERE id = %s AND image_url = %s",
+                        (blob["url"], photo_id, url),
+                    )
+                    moved += 1
+    await db.close_pool()
+    return moved
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["migrate"]:
+        sys.exit("usage: python media.py migrate")
+    print(f"moved {asyncio.run(migrate_data_urls())} photos into {MEDIA_ROOT}")
@@ -0,0 +1,201 @@
+"""Pairs an anonymous memory with a stranger's memory for story exchange.
+
+Each memory is reduced to a small sparse vector of features (keywords,
+location parts, travel type) weighted by inverse document frequency. An
+inverted index maps every feature to the memories that have it, so a match
+only scores memories sharing at least one reasonably rare feature instead of
+scanning the table. The index is loaded once per worker at startup
+(``preloader``) and then extended incrementally, keyset on
+``anonymous_memories (created_at, id)``. ``created_at`` has one-second
+precision, ids are random and rows become visible in commit order, so the
+watermark stays ``MATCH_REFRESH_OVERLAP_MS`` behind the database clock and
+the memories inside that window are read again (``add()`` skips known ids).
+"""
+import os
+import json
+import math
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, List, Optional, Set, Tuple
+
+MATCH_REFRESH_SECONDS = float(os.getenv('MATCH_REFRESH_SECONDS', '5'))
+# Upper bound on memories scored per match request
+MATCH_MAX_CANDIDATES = int(os.getenv('MATCH_MAX_CANDIDATES', '2000'))
+# Longest commit delay tolerated, on top of created_at's one-second precision
+MATCH_REFRESH_OVERLAP = timedelta(milliseconds=int(os.getenv('MATCH_REFRESH_OVERLAP_MS', '2000')))
+LOAD_BATCH = 10000
+
+logger = logging.getLogger("memory_matcher")
+
+# Relative importance of each feature family
+FEATURE_WEIGHTS = {'kw': 1.0, 'loc': 0.6, 'type': 0.4}
+
+
+def memory_features(location: Optional[str], travel_type: Optional[str], keywords: List[str]) -> Set[str]:
+    features = {f"kw:{k.strip().lower()}" for k in keywords if k and k.strip()}
+    for part in (location or "").split(","):
+        part = part.strip().lower()
+        if part:
+            features.add(f"loc:{part}")
+    if travel_type:
+        features.add(f"type:{travel_type.strip().lower()}")
+    return features
+
+
+class MemoryIndex:
+    def __init__(self):
+        self._owner: Dict[str, str] = {}
+        self._features: Dict[str, Set[str]] = {}
+        self._postings: Dict[str, Set[str]] = {}
+        self._watermark: Optional[Tuple[datetime, str]] = None  # (created_at, id) up to which every memory is loaded
+        self._lock = asyncio.Lock()
+        self._last_refresh = 0.0
+
+    def __len__(self):
+        return len(self._owner)
+
+    def add(self, memory_id: str, owner_id: str, location: Optional[str], travel_type: Optional[str], keywords: List[str]):
+        if memory_id in self._owner:
+            return
+        features = memory_features(location, travel_type, keywords)
+        self._owner[memory_id] = owner_id
+        self._features[memory_id] = features
+        for f in features:
+            self._postings.setdefault(f, set()).add(memory_id)
+
+    def _idf(self, feature: str) -> float:
+        df = len(self._postings.get(feature, ()))
+        return FEATURE_WEIGHTS[feature.split(":", 1)[0]] * math.log(1 + len(self._owner) / (1 + df))
+
+    async def refresh(self, cur, force: bool = False):
+        if not force and time.monotonic() - self._last_refresh < MATCH_REFRESH_SECONDS:
+            return
+        # One load at a time, so requests during the startup load wait for it rather than repeat it
+        async with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_refresh < MATCH_REFRESH_SECONDS:
+                return
+            self._last_refresh = now
+            await cur.execute("SELECT NOW()")
+            horizon = (await cur.fetchone())[0] - MATCH_REFRESH_OVERLAP
+            position = self._watermark or (datetime.min, "")
+            while True:
+                # Keyset on (created_at, id) so memories sharing one timestamp can span batches
+                ts, row_id = position
+                await cur.execute(
+                    """SELECT id, original_user_id, location, travel_type, keywords, created_at
+                       FROM anonymous_memories
+                       WHERE created_at > %s OR (created_at = %s AND id > %s)
+                       ORDER BY created_at ASC, id ASC LIMIT %s""",
+                    (ts, ts, row_id, LOAD_BATCH),
+                )
+                rows = await cur.fetchall()
+                for r in rows:
+                    self.add(r[0], r[1], r[2], r[3], json.loads(r[4]) if r[4] else [])
+                if rows:
+                    position = (rows[-1][5], rows[-1][0])
+                    # Only before the horizon can no other memory still commit
+                    settled = [r for r in rows if r[5] < horizon]
+                    if settled:
+                        self._watermark = (settled[-1][5], settled[-1][0])
+                if len(rows) < LOAD_BATCH:
+                    break
+
+    async def match(self, cur, memory_id: str, user_id: str, exclude: Set[str], limit: int = 5) -> List[Tuple[str, float]]:
+        """Best-scoring memories from other users, skipping ``exclude``."""
+        await self.refresh(cur)
+        features = self._features.get(memory_id)
+        if features is None:
+            await self.refresh(cur, force=True)
+            features = self._features.get(memory_id)
+            if features is None:
+                return []
+        weights = {f: self._idf(f) for f in features}
+
+        # Rarest features first so common ones (e.g. "type:solo") only top up the pool
+        candidates: Set[str] = set()
+        for f in sorted(features, key=lambda f: len(self._postings.get(f, ()))):
+            posting = self._postings.get(f, ())
+            room = MATCH_MAX_CANDIDATES - len(candidates)
+            if room <= 0:
+                break
+            if len(posting) <= room:
+                candidates.update(posting)
+            else:
+                candidates.update(islice(posting, room))
+                break
+
+        scored = []
+        for cid in candidates:
+            if cid == memory_id or cid in exclude or self._owner.get(cid) == user_id:
+                continue
+            shared = features & self._features[cid]
+            score = sum(weights[f] for f in shared)
+            if score > 0:
+                scored.append((cid, score))
+        scored.sort(key=lambda kv: (-kv[1], kv[0]))
+        return scored[:limit]
+
+
+async def exchanged_memory_ids(cur, user_id: str) -> Set[str]:
+    await cur.execute(
+        "SELECT memory1_id, memory2_id FROM memory_exchanges WHERE user1_id = %s OR user2_id = %s",
+        (user_id, user_id),
+    )
+    ids: Set[str] = set()
+    for m1, m2 in await cur.fetchall():
+        ids.add(m1)
+        ids.add(m2)
+    return ids
+
+
+_index: Optional[MemoryIndex] = None
+
+
+def get_index() -> MemoryIndex:
+    global _index
+    if _index is None:
+        _index = MemoryIndex()
+    return _index
+
+
+class IndexPreloader:
+    """Loads the index in the background at startup, so no request pays for the full load."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        import db
+
+        started = time.perf_counter()
+        try:
+            pool = await db.get_pool()
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cur:
+                    await get_index().refresh(cur, force=True)
+            logger.info("memory index loaded", extra={"fields": {
+                "memories": len(get_index()), "ms": round((time.perf_counter() - started) * 1000, 1),
+            }})
+        except Exception:
+            # The first match request loads it instead
+            logger.exception("memory index preload failed")
+
+
+preloader = IndexPreloader()
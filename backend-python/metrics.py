@@ -0,0 +1,231 @@
+"""Minimal Prometheus-compatible metrics (no external dependency).
+
+Collects per-route request counts, latency histograms and in-flight gauges via
+``MetricsMiddleware``, plus DB pool wait and per-SQL-template query timings via
+``instrument_pool`` / ``observe_query``. ``render()`` produces the Prometheus text
+exposition format served at ``/metrics``.
+"""
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Cap on distinct SQL templates tracked; the rest are folded into "other"
+MAX_SQL_TEMPLATES = 500
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.doc, self.labelnames = name, doc, labelnames
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, doc: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.doc, self.labelnames = name, doc, labelnames
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, *labels: str, value: float):
+        self._values[labels] = value
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} gauge"]
+        for labels, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name, self.doc, self.labelnames = name, doc, labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, *labels: str, value: float):
+        data = self._values.get(labels)
+        if data is None:
+            data = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                data[i] += 1
+        data[-2] += value
+        data[-1] += 1
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        for labels, data in self._values.items():
+            for i, bound in enumerate(self.buckets):
+                le = _labels(self.labelnames, labels, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {data[i]}")
+            le = _labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {data[-1]}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {data[-2]}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {data[-1]}")
+        return lines
+
+
+# ---------- Registry ----------
+http_requests_total = Counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+http_requests_in_progress = Gauge(
+    "http_requests_in_progress", "HTTP requests currently being served.", ("method",))
+db_pool_acquire_duration = Histogram(
+    "db_pool_acquire_seconds", "Time spent waiting for a pooled DB connection.")
+db_query_duration = Histogram(
+    "db_query_duration_seconds", "DB statement latency by SQL template.", ("sql",))
+db_pool_size = Gauge("db_pool_size", "Open connections in the DB pool.")
+db_pool_free = Gauge("db_pool_free", "Idle connections in the DB pool.")
+db_read_route_total = Counter(
+    "db_read_route_total", "Pools handed to read-only handlers, by target (primary when pinned or no replica is up).", ("target",))
+admission_rejected_total = Counter(
+    "admission_rejected_total", "Requests turned away by admission control.", ("reason", "budget"))
+admission_wait_duration = Histogram(
+    "admission_wait_seconds", "Time queued requests waited for a concurrency slot.")
+http_compression_total = Counter(
+    "http_compression_total", "Compressed responses by encoding and cache result.", ("encoding", "cache"))
+http_compression_bytes_total = Counter(
+    "http_compression_bytes_total", "Response bytes before (in) and after (out) compression.", ("encoding", "direction"))
+engagement_events_total = Counter(
+    "engagement_events_total", "Engagement events by kind and result (written, dropped when the buffer was full).", ("kind", "result"))
+leaderboard_refresh_total = Counter(
+    "leaderboard_refresh_total", "Leaderboard refresh passes by board and result (refreshed, unchanged).", ("board", "result"))
+
+REGISTRY = [
+    http_requests_total,
+    http_request_duration,
+    http_requests_in_progress,
+    db_pool_acquire_duration,
+    db_query_duration,
+    db_pool_size,
+    db_pool_free,
+    db_read_route_total,
+    admission_rejected_total,
+    admission_wait_duration,
+    http_compression_total,
+    http_compression_bytes_total,
+    engagement_events_total,
+    leaderboard_refresh_total,
+]
+
+
+def render(pool=None) -> str:
+    if pool is not None:
+        db_pool_size.set(value=pool.size)
+        db_pool_free.set(value=pool.freesize)
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return "\n".join(lines) + "\n"
+
+
+# ---------- SQL templates ----------
+_WS = re.compile(r"\s+")
+_IN_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)")
+_templates: Dict[str, str] = {}
+_known_templates = set()
+
+
+def sql_template(sql: str) -> str:
+    """Collapse whitespace and variable-length IN lists so one query shape is one label."""
+    template = _templates.get(sql)
+    if template is None:
+        template = _IN_LIST.sub("(%s, ...)", _WS.sub(" ", sql).strip())[:200]
+        if template not in _known_templates:
+            if len(_known_templates) >= MAX_SQL_TEMPLATES:
+                template = "other"
+            else:
+                _known_templates.add(template)
+        if len(_templates) < MAX_SQL_TEMPLATES * 4:
+            _templates[sql] = template
+    return template
+
+
+# ---------- DB instrumentation ----------
+def instrument_pool(pool):
+    """Time every pool.acquire() wait by wrapping the pool's internal acquire coroutine."""
+    acquire = pool._acquire
+
+    async def timed_acquire():
+        start = time.perf_counter()
+        try:
+            return await acquire()
+        finally:
+            db_pool_acquire_duration.observe(value=time.perf_counter() - start)
+
+    pool._acquire = timed_acquire
+    return pool
+
+
+def observe_query(sql: str, seconds: float):
+    db_query_duration.observe(sql_template(sql), value=seconds)
+
+
+# ---------- HTTP middleware ----------
+class MetricsMiddleware:
+    """ASGI middleware recording per-route counts, latency and in-flight requests."""
+
+    def __init__(self, app, skip_paths: Tuple[str, ...] = ("/metrics",)):
+        self.app = app
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "GET")
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_requests_in_progress.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_progress.dec(method)
+            route = route_template(scope)
+            http_request_duration.observe(method, route, value=elapsed)
+            http_requests_total.inc(method, route, str(status["code"]))
+
+
+def route_template(scope) -> str:
+    """The matched route's path template (e.g. /api/journeys/{journey_id}), never the raw path."""
+    route = scope.get("route")
+    path: Optional[str] = getattr(route, "path", None)
+    return path or "unmatched"
@@ -0,0 +1,20 @@
+"""Opaque keyset cursors over (timestamp, id) ordered rows."""
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+
+
+def encode_cursor(ts: datetime, row_id: str) -> str:
+    raw = f"{ts.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, str]]:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, row_id = base64.urlsafe_b64decode(padded).decode().split("|", 1)
+        return datetime.fromisoformat(ts), row_id
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
@@ -0,0 +1,161 @@
+"""Per-request SQL profiler and slow-query log.
+
+Every profiled request gets a summary line on the ``profiler`` logger, which
+makes N+1 loops easy to spot. Requests are profiled when sampled
+(``PROFILE_SAMPLE_RATE``, 0.0-1.0) or when they send ``X-Profile: <token>``
+matching the operator's ``PROFILE_TOKEN``; only the latter also get a
+``Server-Timing`` header with the statement fingerprints, since those give the
+schema and queries away. Without ``PROFILE_TOKEN`` the header is never sent.
+Independently, every statement slower than ``SLOW_QUERY_MS`` is written to the
+``slow_query`` logger with a normalized fingerprint.
+"""
+import os
+import re
+import time
+import random
+import hmac
+import hashlib
+import logging
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_TOKEN = os.getenv('PROFILE_TOKEN', '')
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', '200'))
+# Distinct statements listed individually in Server-Timing
+SERVER_TIMING_TOP = 5
+
+slow_query_log = logging.getLogger("slow_query")
+profile_log = logging.getLogger("profiler")
+
+
+# ---------- Fingerprints ----------
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM = re.compile(r"%s")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WS = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """Normalize SQL so statements differing only in literals/parameters compare equal."""
+    fp = _STRING.sub("?", sql)
+    fp = _NUMBER.sub("?", fp)
+    fp = _PARAM.sub("?", fp)
+    fp = _WS.sub(" ", fp).strip().lower()
+    return _IN_LIST.sub("(?+)", fp)
+
+
+def fingerprint_id(fp: str) -> str:
+    return hashlib.sha1(fp.encode()).hexdigest()[:16]
+
+
+# ---------- Request profile ----------
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.queries: List[Tuple[str, float, int]] = []
+
+    def by_fingerprint(self) -> List[Tuple[str, int, float, int]]:
+        """(fingerprint, count, total seconds, total rows), slowest first."""
+        agg: Dict[str, List[float]] = {}
+        for fp, seconds, rows in self.queries:
+            entry = agg.setdefault(fp, [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += rows
+        return sorted(
+            ((fp, int(v[0]), v[1], int(v[2])) for fp, v in agg.items()),
+            key=lambda item: -item[2],
+        )
+
+    def server_timing(self) -> str:
+        total_db = sum(q[1] for q in self.queries)
+        parts = [
+            f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}",
+            f'db;dur={total_db * 1000:.2f};desc="{len(self.queries)} queries"',
+        ]
+        for i, (fp, count, seconds, _) in enumerate(self.by_fingerprint()[:SERVER_TIMING_TOP]):
+            desc = fp[:80].replace('"', "'")
+            parts.append(f'sql{i};dur={seconds * 1000:.2f};desc="x{count} {desc}"')
+        return ", ".join(parts)
+
+    def summary(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "query_count": len(self.queries),
+            "db_ms": round(sum(q[1] for q in self.queries) * 1000, 2),
+            "statements": [
+                {"fingerprint": fp, "id": fingerprint_id(fp), "count": count,
+                 "total_ms": round(seconds * 1000, 2), "rows": rows}
+                for fp, count, seconds, rows in self.by_fingerprint()
+            ],
+        }
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("request_profile", default=None)
+_current_path: ContextVar[str] = ContextVar("request_path", default="")
+
+
+def record_query(sql: str, seconds: float, rows: int):
+    """Called by the DB cursor after every statement."""
+    profile = _current.get()
+    if profile is not None or seconds * 1000 >= SLOW_QUERY_MS:
+        fp = fingerprint(sql)
+        if profile is not None:
+            profile.queries.append((fp, seconds, max(rows, 0)))
+        if seconds * 1000 >= SLOW_QUERY_MS:
+            slow_query_log.warning("slow query", extra={"fields": {
+                "fingerprint": fp,
+                "fingerprint_id": fingerprint_id(fp),
+                "duration_ms": round(seconds * 1000, 2),
+                "rows": rows,
+                "path": _current_path.get(),
+            }})
+
+
+class ProfilerMiddleware:
+    """ASGI middleware that enables profiling for opted-in or sampled requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path_token = _current_path.set(scope.get("path", ""))
+        # Only an operator holding the token sees statements; sampled profiles go to the log alone
+        requested = next((v for k, v in scope.get("headers", ()) if k == PROFILE_HEADER), None)
+        expose = bool(PROFILE_TOKEN) and requested is not None and hmac.compare_digest(
+            requested, PROFILE_TOKEN.encode("latin-1"))
+        enabled = expose or (PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE)
+        if not enabled:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _current_path.reset(path_token)
+            return
+
+        profile = RequestProfile(scope.get("method", ""), scope.get("path", ""))
+        token = _current.set(profile)
+
+        async def send_wrapper(message):
+            if expose and message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            _current_path.reset(path_token)
+            profile_log.info("request profile", extra={"fields": profile.summary()})
@@ -0,0 +1,47 @@
+"""API routers, one module per domain, registered on the app by ``load()``.
+
+``ROUTERS`` lists the modules in registration order. A deployment that only
+serves part of the API (or a test that needs one domain) sets
+``API_ROUTERS=journeys,garden``; the other modules are never imported. Health
+and metrics (``ops``) are always loaded. How long each import took is kept in
+``load_times`` and logged once at startup.
+"""
+import os
+import time
+import importlib
+from typing import Dict, Iterable, Optional
+
+from fastapi.responses import Response
+
+import serializers
+
+ROUTERS = ("albums", "plans", "journeys", "social", "garden", "ops")
+API_ROUTERS = [name.strip() for name in os.getenv('API_ROUTERS', '').split(',') if name.strip()]
+
+load_times: Dict[str, float] = {}
+
+
+class FastJSONResponse(Response):
+    """orjson-encoded response. Returned directly so FastAPI skips ``jsonable_encoder``."""
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return serializers.dumps(content)
+
+
+def load(app, names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Import the named router modules (all of ``ROUTERS`` by default) and include them."""
+    selected = list(names or API_ROUTERS or ROUTERS)
+    unknown = set(selected) - set(ROUTERS)
+    if unknown:
+        raise ValueError(f"Unknown API_ROUTERS: {', '.join(sorted(unknown))}")
+    if "ops" not in selected:
+        selected.append("ops")
+    for name in ROUTERS:
+        if name not in selected:
+            continue
+        start = time.perf_counter()
+        module = importlib.import_module(f"{__name__}.{name}")
+        app.include_router(module.router)
+        load_times[name] = time.perf_counter() - start
+    return load_times
@@ -0,0 +1,409 @@
+"""Albums, their photos and pages, and the media store endpoints."""
+import os
+import uuid
+import logging
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Path, Query, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from pydantic import BaseModel
+
+from db import get_pool, read_only
+from serializers import ALBUM_COLUMNS, PHOTO_COLUMNS, album_row, photo_row
+from routes import FastJSONResponse
+import conditional
+import media
+import thumbnails
+
+logger = logging.getLogger("api")
+router = APIRouter()
+
+
+# ---------- Models ----------
+class AlbumCreateBody(BaseModel):
+    user_id: str
+    title: str
+    description: Optional[str] = ""
+    journey_id: Optional[str] = None
+    visibility: str = "public"
+
+
+class AlbumUpdateBody(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    journey_id: Optional[str] = None
+    visibility: Optional[str] = None
+
+
+class CreatePhotoBody(BaseModel):
+    user_id: str
+    image_url: str
+    caption: Optional[str] = ""
+    page_number: Optional[int] = 1
+    meta: Optional[str] = None
+
+
+class UpdatePhotoBody(BaseModel):
+    caption: Optional[str] = None
+    page_number: Optional[int] = None
+    meta: Optional[str] = None
+
+
+class PageUpsertBody(BaseModel):
+    album_id: Optional[str] = None
+    page_number: Optional[int] = None
+    content: str
+
+
+# ---------- Albums ----------
+@router.get("/api/albums")
+@read_only
+async def list_albums(user_id: str = Query(...)):
+    """List all albums for a specific user"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"SELECT {ALBUM_COLUMNS} FROM albums WHERE user_id = %s ORDER BY created_at DESC",
+                (user_id,)
+            )
+            rows = await cur.fetchall()
+            return FastJSONResponse([album_row(r) for r in rows])
+
+
+@router.post("/api/albums", status_code=201)
+async def create_album(body: AlbumCreateBody):
+    """Create a new photo album"""
+    if not body.user_id or not body.title:
+        raise HTTPException(status_code=400, detail="Missing user_id or title")
+    
+    album_id = str(uuid.uuid4())
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                INSERT INTO albums (id, user_id, title, description, journey_id, visibility, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, NOW(), NOW())
+                """,
+                (
+                    album_id,
+                    body.user_id,
+                    body.title,
+                    body.description or "",
+                    body.journey_id,
+                    body.visibility,
+                ),
+            )
+            return {
+                "id": album_id,
+                "user_id": body.user_id,
+                "title": body.title,
+                "description": body.description or "",
+                "journey_id": body.journey_id,
+                "visibility": body.visibility,
+                "created_at": datetime.utcnow().isoformat(),
+                "updated_at": datetime.utcnow().isoformat(),
+            }
+
+
+@router.get("/api/albums/{album_id}")
+async def get_album(album_id: str, request: Request):
+    """Get a single album by ID"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT updated_at, row_version FROM albums WHERE id = %s", (album_id,))
+            version = await cur.fetchone()
+            if not version:
+                raise HTTPException(status_code=404, detail="Album not found")
+            etag = conditional.make_etag("album", album_id, version[0], version[1])
+            cached = conditional.not_modified(request, etag, version[0])
+            if cached:
+                return cached
+
+            await cur.execute(
+                f"SELECT {ALBUM_COLUMNS} FROM albums WHERE id = %s",
+                (album_id,)
+            )
+            row = await cur.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Album not found")
+            
+            return FastJSONResponse(album_row(row), headers=conditional.validators(etag, version[0]))
+
+
+@router.put("/api/albums/{album_id}")
+async def update_album(album_id: str, body: AlbumUpdateBody):
+    """Update an existing album"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # Build dynamic update
+            fields = []
+            values = []
+            
+            if body.title is not None:
+                fields.append("title = %s")
+                values.append(body.title)
+            if body.description is not None:
+                fields.append("description = %s")
+                values.append(body.description)
+            if body.journey_id is not None:
+                fields.append("journey_id = %s")
+                values.append(body.journey_id)
+            if body.visibility is not None:
+                fields.append("visibility = %s")
+                values.append(body.visibility)
+            
+            if not fields:
+                raise HTTPException(status_code=400, detail="No fields to update")
+            
+            fields.append("updated_at = NOW()")
+            fields.append("row_version = row_version + 1")
+            values.append(album_id)
+            
+            sql = f"UPDATE albums SET {', '.join(fields)} WHERE id = %s"
+            await cur.execute(sql, tuple(values))
+            
+            # Return updated album
+            await cur.execute(
+                f"SELECT {ALBUM_COLUMNS} FROM albums WHERE id = %s",
+                (album_id,)
+            )
+            row = await cur.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Album not found")
+            
+            return FastJSONResponse(album_row(row))
+
+
+@router.delete("/api/albums/{album_id}", status_code=204)
+async def delete_album(album_id: str):
+    """Delete an album and all its photos and pages"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # Delete photos first
+            await cur.execute("DELETE FROM album_photos WHERE album_id = %s", (album_id,))
+            # Delete pages
+            await cur.execute("DELETE FROM album_pages WHERE album_id = %s", (album_id,))
+            # Delete album
+            await cur.execute("DELETE FROM albums WHERE id = %s", (album_id,))
+            return None
+
+
+# ---------- Album Photos ----------
+@router.get("/api/albums/{album_id}/photos")
+@read_only
+async def list_photos(album_id: str, width: Optional[int] = Query(None, ge=1, le=8192)):
+    """`width` (display px x device pixel ratio) selects each photo's `display_url` variant"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"SELECT {PHOTO_COLUMNS} FROM album_photos WHERE album_id = %s ORDER BY created_at DESC",
+                (album_id,),
+            )
+            rows = await cur.fetchall()
+            return FastJSONResponse([photo_row(r, width) for r in rows])
+
+
+@router.post("/api/albums/{album_id}/photos", status_code=201)
+async def create_photo(album_id: str, body: CreatePhotoBody):
+    try:
+        if not body.image_url or not body.user_id:
+            raise HTTPException(status_code=400, detail="Missing image_url or user_id")
+        
+        image_url = body.image_url
+        if image_url.startswith("data:"):
+            # Keep image bytes out of MySQL: store the blob, save only its URL
+            try:
+                content_type, data = media.decode_data_url(image_url)
+                image_url = (await media.get_store().put_bytes(data, content_type))["url"]
+            except media.MediaError as e:
+                raise HTTPException(status_code=e.status_code, detail=str(e))
+
+        pid = str(uuid.uuid4())
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    INSERT INTO album_photos (id, album_id, user_id, image_url, caption, page_number, meta, created_at)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, NOW())
+                    """,
+                    (
+                        pid,
+                        album_id,
+                        body.user_id,
+                        image_url,
+                        body.caption or "",
+                        int(body.page_number or 1),
+                        body.meta or None,
+                    ),
+                )
+                
+                logger.info("photo saved", extra={"fields": {"photo_id": pid, "album_id": album_id, "user_id": body.user_id}})
+                thumbnails.get_pipeline().submit(pid, image_url)
+                return {"id": pid, "album_id": album_id, **body.model_dump(), "image_url": image_url}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception("error saving photo", extra={"fields": {"album_id": album_id}})
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+@router.put("/api/albums/{album_id}/photos/{photo_id}")
+async def update_photo(album_id: str, photo_id: str, body: UpdatePhotoBody):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # Build dynamic update
+            fields = []
+            values = []
+            if body.caption is not None:
+                fields.append("caption=%s")
+                values.append(body.caption)
+            if body.page_number is not None:
+                fields.append("page_number=%s")
+                values.append(int(body.page_number))
+            if body.meta is not None:
+                fields.append("meta=%s")
+                values.append(body.meta)
+            if not fields:
+                return {"ok": True}
+            values.extend([photo_id, album_id])
+            sql = f"UPDATE album_photos SET {', '.join(fields)} WHERE id = %s AND album_id = %s"
+            await cur.execute(sql, tuple(values))
+            return {"ok": True}
+
+
+@router.delete("/api/albums/{album_id}/photos/{photo_id}", status_code=204)
+async def delete_photo(album_id: str, photo_id: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "DELETE FROM album_photos WHERE id = %s AND album_id = %s",
+                (photo_id, album_id),
+            )
+            return None
+
+
+# ---------- Album Pages ----------
+@router.get("/api/albums/{album_id}/pages")
+@read_only
+async def list_pages(album_id: str, request: Request):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT COUNT(*), MAX(updated_at) FROM album_pages WHERE album_id = %s",
+                (album_id,),
+            )
+            count, last_modified = await cur.fetchone()
+            etag = conditional.make_etag("pages", album_id, count, last_modified)
+            cached = conditional.not_modified(request, etag, last_modified)
+            if cached:
+                return cached
+
+            await cur.execute(
+                "SELECT page_number, content FROM album_pages WHERE album_id = %s ORDER BY page_number ASC",
+                (album_id,),
+            )
+            rows = await cur.fetchall()
+            return FastJSONResponse(
+                [{"page_number": r[0], "content": r[1] or ""} for r in rows],
+                headers=conditional.validators(etag, last_modified),
+            )
+
+
+@router.put("/api/albums/{album_id}/pages/{page_number}")
+async def update_page(album_id: str, page_number: int = Path(..., ge=1), body: PageUpsertBody = ...):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "UPDATE album_pages SET content = %s WHERE album_id = %s AND page_number = %s",
+                (body.content, album_id, page_number),
+            )
+            if cur.rowcount == 0:
+                await cur.execute(
+                    "INSERT INTO album_pages (id, album_id, page_number, content, updated_at) VALUES (%s, %s, %s, %s, NOW())",
+                    (str(uuid.uuid4()), album_id, page_number, body.content),
+                )
+            return {"ok": True}
+
+
+@router.post("/api/albums/{album_id}/pages")
+async def upsert_page(album_id: str, body: PageUpsertBody):
+    if body.page_number is None:
+        raise HTTPException(status_code=400, detail="Missing page_number")
+    page_number = int(body.page_number)
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # Try update, else insert
+            await cur.execute(
+                "UPDATE album_pages SET content = %s WHERE album_id = %s AND page_number = %s",
+                (body.content, album_id, page_number),
+            )
+            if cur.rowcount == 0:
+                await cur.execute(
+                    "INSERT INTO album_pages (id, album_id, page_number, content, updated_at) VALUES (%s, %s, %s, %s, NOW())",
+                    (str(uuid.uuid4()), album_id, page_number, body.content),
+                )
+            return {"ok": True}
+
+
+# ---------- Media ----------
+@router.post("/api/media", status_code=201)
+async def upload_media(request: Request):
+    """Streaming multipart upload (form field `file`); returns the content-addressed key and URL"""
+    try:
+        return await media.save_multipart(media.get_store(), request.headers.get("content-type", ""), request.stream())
+    except media.MediaError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+
+@router.api_route("/api/media/{key}", methods=["GET", "HEAD"], include_in_schema=False)
+async def get_media(key: str, request: Request):
+    """Serve a stored blob; immutable, with single-range support"""
+    store = media.get_store()
+    path = store.path(key) if media.KEY_RE.match(key) else None
+    if path is None:
+        url = store.public_url(key) if media.KEY_RE.match(key) else None
+        if url:
+            return RedirectResponse(url, status_code=307)
+        raise HTTPException(status_code=404, detail="Media not found")
+    try:
+        size = os.stat(path).st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Media not found")
+
+    etag = '"' + key.split(".")[0] + '"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=31536000, immutable", "Accept-Ranges": "bytes"}
+    if conditional.is_fresh(request, etag):
+        return Response(status_code=304, headers=headers)
+    content_type = media.content_type_for(key)
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if if_range and if_range.strip() != etag:
+        range_header = None
+    try:
+        byte_range = media.parse_range(range_header, size)
+    except media.MediaError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+    if byte_range is None:
+        # Starlette 0.38's FileResponse streams the file in chunks through a worker thread;
+        # it has no ASGI pathsend/zero-copy path, so every byte passes through Python
+        return FileResponse(path, media_type=content_type, headers=headers)
+
+    start, end = byte_range
+    length = end - start + 1
+    headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(length)})
+    if request.method == "HEAD":
+        return Response(status_code=206, media_type=content_type, headers=headers)
+    return StreamingResponse(media.iter_file(path, start, length), status_code=206, media_type=content_type, headers=headers)
@@ -0,0 +1,142 @@
+"""Memory garden: plants grown from journeys, and watering."""
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from db import get_pool, read_only
+from pagination import encode_cursor, decode_cursor
+from routes import FastJSONResponse
+import garden
+import conditional
+
+router = APIRouter()
+
+
+# ---------- Memory Garden ----------
+@router.get("/api/garden/{user_id}")
+@read_only
+async def get_garden(
+    user_id: str,
+    request: Request,
+    layout: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=2000)
+):
+    """List a user's plants with their current (decayed) growth stage.
+
+    `layout=compact` returns `{"fields": [...], "plants": [[...]], "next_cursor"}`
+    and pages 500 plants at a time by default.
+    """
+    compact = layout == "compact"
+    if compact and limit is None:
+        limit = 500
+    try:
+        before = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # Stages decay with time, so the version includes the current minute
+            # and there is no Last-Modified; a cached garden is at most a minute stale.
+            await cur.execute(
+                """SELECT COUNT(*), MAX(planted_at), MAX(last_watered), SUM(growth_stage),
+                          DATE_FORMAT(NOW(), '%%Y%%m%%d%%H%%i')
+                   FROM memory_garden_plants WHERE user_id = %s""",
+                (user_id,)
+            )
+            version = await cur.fetchone()
+            etag = conditional.make_etag("garden", user_id, *version, layout, cursor, limit)
+            cached = conditional.not_modified(request, etag)
+            if cached:
+                return cached
+
+            query = "SELECT id, user_id, journey_id, plant_type, plant_name, growth_stage, planted_at, last_watered, position_x, position_y, color, NOW() FROM memory_garden_plants WHERE user_id = %s"
+            params = [user_id]
+            if before:
+                query += " AND (planted_at < %s OR (planted_at = %s AND id < %s))"
+                params.extend([before[0], before[0], before[1]])
+            query += " ORDER BY planted_at DESC, id DESC"
+            if limit is not None:
+                query += " LIMIT %s"
+                params.append(limit + 1)
+            await cur.execute(query, tuple(params))
+            rows = await cur.fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][6], rows[-1][0])
+
+    headers = conditional.validators(etag)
+    if compact:
+        return FastJSONResponse({
+            "fields": garden.LAYOUT_FIELDS,
+            "plants": [
+                [r[0], r[2], r[3], r[4], garden.effective_stage(r[5], r[7], r[11]), r[8], r[9], r[10], garden.needs_water(r[7], r[11])]
+                for r in rows
+            ],
+            "next_cursor": next_cursor,
+        }, headers=headers)
+
+    plants = []
+    for r in rows:
+        plants.append({
+            "id": r[0],
+            "user_id": r[1],
+            "journey_id": r[2],
+            "plant_type": r[3],
+            "plant_name": r[4],
+            "growth_stage": garden.effective_stage(r[5], r[7], r[11]),
+            "planted_at": r[6].isoformat() if r[6] else None,
+            "last_watered": r[7].isoformat() if r[7] else None,
+            "needs_water": garden.needs_water(r[7], r[11]),
+            "position_x": r[8],
+            "position_y": r[9],
+            "color": r[10]
+        })
+    return FastJSONResponse(plants, headers=headers)
+
+
+@router.post("/api/garden/water/{plant_id}")
+async def water_plant(plant_id: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # Single atomic statement; LAST_INSERT_ID(expr) hands the new stage back in the OK packet
+            await cur.execute(
+                f"""UPDATE memory_garden_plants
+                    SET growth_stage = LAST_INSERT_ID({garden.WATERED_STAGE_SQL}), last_watered = NOW()
+                    WHERE id = %s""",
+                (plant_id,)
+            )
+            new_stage = cur.lastrowid
+            if not new_stage:
+                raise HTTPException(status_code=404, detail="Plant not found")
+            
+            return {
+                "id": plant_id,
+                "growth_stage": new_stage,
+                "last_watered": datetime.utcnow().isoformat()
+            }
+
+
+@router.post("/api/garden/{user_id}/water-all")
+async def water_all_plants(user_id: str):
+    """Water every plant in a user's garden in one statement"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"""UPDATE memory_garden_plants
+                    SET growth_stage = {garden.WATERED_STAGE_SQL}, last_watered = NOW()
+                    WHERE user_id = %s""",
+                (user_id,)
+            )
+            return {
+                "user_id": user_id,
+                "watered": cur.rowcount,
+                "last_watered": datetime.utcnow().isoformat()
+            }
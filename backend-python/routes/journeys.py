@@ -0,0 +1,431 @@
+"""Journeys: CRUD, the public list and likes."""
+import uuid
+import json
+import logging
+import random
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import BaseModel, Field
+
+from db import get_pool, read_only
+from serializers import JOURNEY_COLUMNS, JOURNEY_FIELDS, journey_row, journey_projection
+from routes import FastJSONResponse
+from admission import client_key
+import feed
+import conditional
+import engagement
+import leaderboards
+
+logger = logging.getLogger("api")
+router = APIRouter()
+
+# Most journeys one batchGet call may ask for
+JOURNEY_BATCH_MAX = 100
+
+
+# ---------- Models ----------
+class JourneyCreateBody(BaseModel):
+    user_id: str
+    title: str
+    description: Optional[str] = ""
+    journey_type: str = "solo"
+    departure_date: Optional[str] = None
+    return_date: Optional[str] = None
+    legs: List[dict] = []
+    keywords: List[str] = []
+    ai_story: Optional[str] = ""
+    similarity_score: Optional[float] = 0.0
+    rarity_score: Optional[float] = 50.0
+    cultural_insights: Optional[dict] = {}
+    visibility: str = "public"
+
+
+class JourneyUpdateBody(BaseModel):
+    title: Optional[str] = None
+    description: Optional[str] = None
+    journey_type: Optional[str] = None
+    departure_date: Optional[str] = None
+    return_date: Optional[str] = None
+    legs: Optional[List[dict]] = None
+    keywords: Optional[List[str]] = None
+    ai_story: Optional[str] = None
+    similarity_score: Optional[float] = None
+    rarity_score: Optional[float] = None
+    cultural_insights: Optional[dict] = None
+    visibility: Optional[str] = None
+
+
+class JourneyBatchGetBody(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=JOURNEY_BATCH_MAX)
+    fields: Optional[List[str]] = None  # projection; all fields when omitted
+
+
+# ---------- Journeys ----------
+@router.get("/api/journeys")
+@read_only
+async def list_journeys(
+    visibility: str = Query("public"),
+    journey_type: Optional[str] = Query(None),
+    limit: int = Query(20)
+):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            query = f"SELECT {JOURNEY_COLUMNS} FROM journeys WHERE visibility = %s"
+            params = [visibility]
+            
+            if journey_type and journey_type != 'all':
+                query += " AND journey_type = %s"
+                params.append(journey_type)
+            
+            query += " ORDER BY created_at DESC LIMIT %s"
+            params.append(limit)
+            
+            await cur.execute(query, tuple(params))
+            rows = await cur.fetchall()
+            
+            return FastJSONResponse([journey_row(r) for r in rows])
+
+
+@router.get("/api/users/{user_id}/journeys")
+@read_only
+async def get_user_journeys(user_id: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                f"SELECT {JOURNEY_COLUMNS} FROM journeys WHERE user_id = %s ORDER BY created_at DESC LIMIT 100",
+                (user_id,)
+            )
+            rows = await cur.fetchall()
+            
+            return FastJSONResponse([journey_row(r) for r in rows])
+
+
+@router.post("/api/journeys", status_code=201)
+async def create_journey(body: JourneyCreateBody):
+    if not body.user_id or not body.title:
+        raise HTTPException(status_code=400, detail="Missing user_id or title")
+    
+    journey_id = str(uuid.uuid4())
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                INSERT INTO journeys (
+                    id, user_id, title, description, journey_type, 
+                    departure_date, return_date, legs, keywords, ai_story, 
+                    similarity_score, rarity_score, cultural_insights, visibility, 
+                    likes_count, views_count, created_at, updated_at
+                )
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+                """,
+                (
+                    journey_id,
+                    body.user_id,
+                    body.title,
+                    body.description or "",
+                    body.journey_type,
+                    body.departure_date,
+                    body.return_date,
+                    json.dumps(body.legs),
+                    json.dumps(body.keywords),
+                    body.ai_story or "",
+                    body.similarity_score,
+                    body.rarity_score,
+                    json.dumps(body.cultural_insights or {}),
+                    body.visibility,
+                    0,  # likes_count
+                    0,  # views_count
+                ),
+            )
+            
+            # Auto-plant a flower in the garden if user is authenticated
+            if body.user_id and not body.user_id.startswith('anon_'):
+                plant_types = ['rose', 'tulip', 'sunflower', 'lotus', 'orchid', 'lily', 'daisy', 'cherry_blossom']
+                colors = ['#ef4444', '#f59e0b', '#eab308', '#22c55e', '#3b82f6', '#a855f7', '#ec4899', '#f472b6']
+                random_plant = random.choice(plant_types)
+                random_color = random.choice(colors)
+                
+                plant_id = str(uuid.uuid4())
+                position_x = random.randint(50, 750)
+                position_y = random.randint(50, 550)
+                
+                await cur.execute(
+                    """INSERT INTO memory_garden_plants 
+                       (id, user_id, journey_id, plant_type, plant_name, growth_stage, position_x, position_y, color) 
+                       VALUES (%s, %s, %s, %s, %s, 1, %s, %s, %s)""",
+                    (plant_id, body.user_id, journey_id, random_plant, body.title or random_plant,
+                     position_x, position_y, random_color)
+                )
+                
+                logger.debug("planted garden flower", extra={"fields": {
+                    "journey_id": journey_id, "plant_type": random_plant, "x": position_x, "y": position_y}})
+            
+            await feed.fan_out_journey(cur, journey_id, body.user_id, body.visibility)
+            
+            # Return the created journey
+            return {
+                "id": journey_id,
+                "user_id": body.user_id,
+                "title": body.title,
+                "description": body.description or "",
+                "journey_type": body.journey_type,
+                "departure_date": body.departure_date or "",
+                "return_date": body.return_date or "",
+                "legs": body.legs,
+                "keywords": body.keywords,
+                "ai_story": body.ai_story or "",
+                "similarity_score": body.similarity_score,
+                "rarity_score": body.rarity_score,
+                "cultural_insights": body.cultural_insights or {},
+                "visibility": body.visibility,
+                "likes_count": 0,
+                "views_count": 0,
+                "created_at": datetime.utcnow().isoformat(),
+                "updated_at": datetime.utcnow().isoformat(),
+            }
+
+
+@router.post("/api/journeys:batchGet")
+@read_only
+async def batch_get_journeys(body: JourneyBatchGetBody):
+    """Several journeys in one query, in request order. Not counted as views.
+
+    Each id missing from the database is answered with ``{"id": ..., "not_found": true}``.
+    """
+    if body.fields:
+        unknown = sorted(set(body.fields) - set(JOURNEY_FIELDS))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        fields = ["id"] + [f for f in JOURNEY_FIELDS if f in body.fields and f != "id"]
+        columns = ", ".join(fields)
+    else:
+        fields, columns = None, JOURNEY_COLUMNS
+
+    ids = list(dict.fromkeys(body.ids))
+    placeholders = ", ".join(["%s"] * len(ids))
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(f"SELECT {columns} FROM journeys WHERE id IN ({placeholders})", tuple(ids))
+            rows = await cur.fetchall()
+
+    found = {r[0]: (journey_projection(r, fields) if fields else journey_row(r)) for r in rows}
+    return FastJSONResponse({
+        "journeys": [found.get(jid) or {"id": jid, "not_found": True} for jid in body.ids],
+    })
+
+
+async def _leaderboard(request: Request, kind: str, window: str, cursor: Optional[str], limit: int):
+    name = leaderboards.board_name(kind, window)
+    if name is None:
+        windows = sorted(b.split("_", 1)[1] for b in leaderboards.BOARDS if b.startswith(kind + "_"))
+        raise HTTPException(status_code=400, detail=f"window must be one of: {', '.join(windows)}")
+    try:
+        after = int(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # The board changes when it is rebuilt or a journey is removed from it
+            version = await leaderboards.board_version(cur, name)
+            refreshed_at = version[1] if version else None
+            etag = conditional.make_etag("leaderboard", name, refreshed_at, version and version[0], after, limit)
+            cached = conditional.not_modified(request, etag, refreshed_at)
+            if cached:
+                return cached
+            rows = await leaderboards.page(cur, name, after, limit + 1, JOURNEY_COLUMNS)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = str(rows[-1][0])
+    return FastJSONResponse({
+        "window": window,
+        "refreshed_at": refreshed_at.isoformat() if refreshed_at else None,
+        "journeys": [{**journey_row(r[2:]), "rank": r[0], "score": round(r[1], 3)} for r in rows],
+        "next_cursor": next_cursor,
+    }, headers=conditional.validators(etag, refreshed_at))
+
+
+@router.get("/api/journeys/trending")
+@read_only
+async def trending_journeys(
+    request: Request,
+    window: str = Query("24h"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=leaderboards.LEADERBOARD_MAX_PAGE)
+):
+    """Public journeys by time-decayed likes and views over `window` (`24h` or `7d`).
+
+    Served from the materialized board, at most `LEADERBOARD_REFRESH_SECONDS` old.
+    """
+    return await _leaderboard(request, "trending", window, cursor, limit)
+
+
+@router.get("/api/journeys/top")
+@read_only
+async def top_journeys(
+    request: Request,
+    window: str = Query("all"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=leaderboards.LEADERBOARD_MAX_PAGE)
+):
+    """Most liked public journeys over `window` (`24h`, `7d` or `all`)."""
+    return await _leaderboard(request, "top", window, cursor, limit)
+
+
+@router.get("/api/journeys/{journey_id}")
+async def get_journey(journey_id: str, request: Request):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT updated_at, row_version, likes_count FROM journeys WHERE id = %s", (journey_id,))
+            version = await cur.fetchone()
+            if not version:
+                raise HTTPException(status_code=404, detail="Journey not found")
+            # Buffered; compaction adds it to views_count
+            engagement.emit("view", journey_id, client_key(request.scope))
+            etag = conditional.make_etag("journey", journey_id, *version)
+            cached = conditional.not_modified(request, etag, version[0])
+            if cached:
+                return cached
+
+            await cur.execute(
+                f"SELECT {JOURNEY_COLUMNS} FROM journeys WHERE id = %s",
+                (journey_id,)
+            )
+            row = await cur.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Journey not found")
+            
+            return FastJSONResponse(journey_row(row), headers=conditional.validators(etag, version[0]))
+
+
+@router.put("/api/journeys/{journey_id}")
+async def update_journey(journey_id: str, body: JourneyUpdateBody):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # Build dynamic update
+            fields = []
+            values = []
+            
+            if body.title is not None:
+                fields.append("title = %s")
+                values.append(body.title)
+            if body.description is not None:
+                fields.append("description = %s")
+                values.append(body.description)
+            if body.journey_type is not None:
+                fields.append("journey_type = %s")
+                values.append(body.journey_type)
+            if body.departure_date is not None:
+                fields.append("departure_date = %s")
+                values.append(body.departure_date)
+            if body.return_date is not None:
+                fields.append("return_date = %s")
+                values.append(body.return_date)
+            if body.legs is not None:
+                fields.append("legs = %s")
+                values.append(json.dumps(body.legs))
+            if body.keywords is not None:
+                fields.append("keywords = %s")
+                values.append(json.dumps(body.keywords))
+            if body.ai_story is not None:
+                fields.append("ai_story = %s")
+                values.append(body.ai_story)
+            if body.similarity_score is not None:
+                fields.append("similarity_score = %s")
+                values.append(body.similarity_score)
+            if body.rarity_score is not None:
+                fields.append("rarity_score = %s")
+                values.append(body.rarity_score)
+            if body.cultural_insights is not None:
+                fields.append("cultural_insights = %s")
+                values.append(json.dumps(body.cultural_insights))
+            if body.visibility is not None:
+                fields.append("visibility = %s")
+                values.append(body.visibility)
+            
+            if not fields:
+                raise HTTPException(status_code=400, detail="No fields to update")
+            
+            fields.append("updated_at = NOW()")
+            fields.append("row_version = row_version + 1")
+            values.append(journey_id)
+
+            previous = None
+            if body.visibility is not None:
+                await cur.execute("SELECT user_id, visibility FROM journeys WHERE id = %s", (journey_id,))
+                previous = await cur.fetchone()
+
+            sql = f"UPDATE journeys SET {', '.join(fields)} WHERE id = %s"
+            await cur.execute(sql, tuple(values))
+
+            # Keep feeds in step with visibility: private journeys leave every feed
+            if previous is not None:
+                author_id, was = previous
+                if body.visibility == 'private' and was != 'private':
+                    await feed.remove_journey(cur, journey_id)
+                elif was == 'private' and body.visibility != 'private':
+                    await feed.restore_journey(cur, journey_id, author_id, body.visibility)
+                # Boards rank public journeys only
+                if was == 'public' and body.visibility != 'public':
+                    await leaderboards.remove_journey(cur, journey_id)
+            
+            # Return updated journey
+            await cur.execute(
+                f"SELECT {JOURNEY_COLUMNS} FROM journeys WHERE id = %s",
+                (journey_id,)
+            )
+            row = await cur.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Journey not found")
+            
+            return FastJSONResponse(journey_row(row))
+
+
+@router.delete("/api/journeys/{journey_id}", status_code=204)
+async def delete_journey(journey_id: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # Delete likes first
+            await cur.execute("DELETE FROM journey_likes WHERE journey_id = %s", (journey_id,))
+            await feed.remove_journey(cur, journey_id)
+            await leaderboards.remove_journey(cur, journey_id)
+            # Delete journey
+            await cur.execute("DELETE FROM journeys WHERE id = %s", (journey_id,))
+            return None
+
+
+@router.post("/api/journeys/{journey_id}/like")
+async def like_journey(journey_id: str, request: Request):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # For now, just increment the counter (we can add user tracking later)
+            await cur.execute(
+                "UPDATE journeys SET likes_count = likes_count + 1 WHERE id = %s",
+                (journey_id,)
+            )
+            if cur.rowcount:
+                engagement.emit("like", journey_id, client_key(request.scope))
+            
+            # Get updated likes_count
+            await cur.execute(
+                "SELECT likes_count FROM journeys WHERE id = %s",
+                (journey_id,)
+            )
+            row = await cur.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Journey not found")
+            
+            return {"likes_count": row[0] or 0}
@@ -0,0 +1,34 @@
+"""Health probes and Prometheus metrics."""
+from datetime import datetime
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from db import get_pool
+import metrics
+import health
+
+router = APIRouter()
+
+
+# Healthcheck
+@router.get("/api/health")
+@router.get("/api/health/live")
+async def liveness():
+    """Liveness probe; never touches the database"""
+    return {"ok": True, "time": datetime.utcnow().isoformat()}
+
+
+@router.get("/api/health/ready")
+async def readiness():
+    """Readiness probe: pool acquire, DB round trip and event loop lag (503 when not ready)"""
+    status_code, report = await health.readiness(get_pool)
+    report["time"] = datetime.utcnow().isoformat()
+    return JSONResponse(report, status_code=status_code, headers={"Cache-Control": "no-store"})
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus text exposition of request, pool and query metrics"""
+    pool = await get_pool()
+    return PlainTextResponse(metrics.render(pool), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,132 @@
+"""Future travel plans."""
+import uuid
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from db import get_pool, read_only
+from serializers import to_iso_date
+
+router = APIRouter()
+
+
+# ---------- Models ----------
+class PlanCreateBody(BaseModel):
+    user_id: str
+    destination: str
+    start_date: Optional[str] = None  # YYYY-MM-DD
+    end_date: Optional[str] = None
+    reason: Optional[str] = ""
+    notes: Optional[str] = ""
+
+
+class PlanUpdateBody(BaseModel):
+    destination: Optional[str] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    reason: Optional[str] = None
+    notes: Optional[str] = None
+
+
+# ---------- Future Plans ----------
+@router.get("/api/users/{user_id}/plans")
+@read_only
+async def list_plans(user_id: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT id, user_id, destination, start_date, end_date, reason, notes, created_at, updated_at FROM future_plans WHERE user_id = %s ORDER BY created_at DESC LIMIT 200",
+                (user_id,),
+            )
+            rows = await cur.fetchall()
+            plans = []
+            for r in rows:
+                plans.append({
+                    "id": r[0],
+                    "user_id": r[1],
+                    "destination": r[2],
+                    "start_date": to_iso_date(r[3])[:10] if r[3] else "",
+                    "end_date": to_iso_date(r[4])[:10] if r[4] else "",
+                    "reason": r[5] or "",
+                    "notes": r[6] or "",
+                    "created_at": r[7].isoformat() if r[7] else "",
+                    "updated_at": r[8].isoformat() if r[8] else "",
+                })
+            return plans
+
+
+@router.post("/api/plans", status_code=201)
+async def create_plan(body: PlanCreateBody):
+    if not body.user_id or not body.destination:
+        raise HTTPException(status_code=400, detail="Missing user_id or destination")
+    pid = str(uuid.uuid4())
+    sd = body.start_date if body.start_date else None
+    ed = body.end_date if body.end_date else None
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                INSERT INTO future_plans (id, user_id, destination, start_date, end_date, reason, notes, created_at, updated_at)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+                """,
+                (pid, body.user_id, body.destination, sd, ed, body.reason or "", body.notes or ""),
+            )
+            return {"id": pid, **body.model_dump()}
+
+
+@router.put("/api/plans/{plan_id}")
+async def update_plan(plan_id: str, body: PlanUpdateBody):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                UPDATE future_plans
+                SET destination = COALESCE(%s, destination),
+                    start_date = COALESCE(%s, start_date),
+                    end_date = COALESCE(%s, end_date),
+                    reason = COALESCE(%s, reason),
+                    notes = COALESCE(%s, notes),
+                    updated_at = NOW()
+                WHERE id = %s
+                """,
+                (
+                    body.destination,
+                    body.start_date,
+                    body.end_date,
+                    body.reason,
+                    body.notes,
+                    plan_id,
+                ),
+            )
+            # Return updated row
+            await cur.execute(
+                "SELECT id, user_id, destination, start_date, end_date, reason, notes, created_at, updated_at FROM future_plans WHERE id = %s LIMIT 1",
+                (plan_id,),
+            )
+            row = await cur.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Not found")
+            return {
+                "id": row[0],
+                "user_id": row[1],
+                "destination": row[2],
+                "start_date": to_iso_date(row[3])[:10] if row[3] else "",
+                "end_date": to_iso_date(row[4])[:10] if row[4] else "",
+                "reason": row[5] or "",
+                "notes": row[6] or "",
+                "created_at": row[7].isoformat() if row[7] else "",
+                "updated_at": row[8].isoformat() if row[8] else "",
+            }
+
+
+@router.delete("/api/plans/{plan_id}", status_code=204)
+async def delete_plan(plan_id: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("DELETE FROM future_plans WHERE id = %s", (plan_id,))
+            return None
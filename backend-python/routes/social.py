@@ -0,0 +1,874 @@
+"""Social features: memory circles, collaborative journals, the anonymous story
+exchange, friends and the home feed."""
+import os
+import uuid
+import json
+import asyncio
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+
+from db import get_pool, read_only
+from broker import get_broker, journal_topic
+from pagination import encode_cursor, decode_cursor
+from routes import FastJSONResponse
+import feed
+import friend_graph
+import memory_matcher
+import conditional
+import engagement
+
+router = APIRouter()
+
+
+# ---------- Models ----------
+class MemoryCircleCreate(BaseModel):
+    name: str
+    description: Optional[str] = ""
+    owner_id: str
+
+class CircleMemberAdd(BaseModel):
+    user_id: str
+
+class CircleJourneyShare(BaseModel):
+    journey_id: str
+    shared_by: str
+
+class CollaborativeJournalCreate(BaseModel):
+    title: str
+    description: Optional[str] = ""
+    created_by: str
+    members: List[dict] = []
+
+class JournalEntryCreate(BaseModel):
+    user_id: str
+    user_name: str
+    content: str
+    entry_type: str = "text"
+    image_url: Optional[str] = None
+    location: Optional[str] = None
+
+class JournalMemberAdd(BaseModel):
+    user_id: str
+    user_name: Optional[str] = None
+
+class AnonymousMemoryCreate(BaseModel):
+    journey_id: str
+    user_id: str
+    title: str
+    story: str
+    location: Optional[str] = ""
+    travel_type: Optional[str] = "solo"
+    keywords: List[str] = []
+
+class MemoryExchangeCreate(BaseModel):
+    user1_id: str
+    user2_id: str
+    memory1_id: str
+    memory2_id: str
+
+class MemoryMatchRequest(BaseModel):
+    user_id: str
+    memory_id: str
+
+class FriendCreate(BaseModel):
+    user_id: str
+    friend_id: str
+    friend_name: Optional[str] = ""
+    friend_email: Optional[str] = ""
+    friend_avatar: Optional[str] = ""
+
+
+# ---------- Memory Circles ----------
+@router.post("/api/memory-circles", status_code=201)
+async def create_memory_circle(body: MemoryCircleCreate):
+    if not body.name or not body.owner_id:
+        raise HTTPException(status_code=400, detail="Missing name or owner_id")
+    
+    circle_id = str(uuid.uuid4())
+    member_id = str(uuid.uuid4())
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """INSERT INTO memory_circles (id, name, description, owner_id, created_at, updated_at)
+                   VALUES (%s, %s, %s, %s, NOW(), NOW())""",
+                (circle_id, body.name, body.description or "", body.owner_id)
+            )
+            # Auto-add owner as admin
+            await cur.execute(
+                """INSERT INTO memory_circle_members (id, circle_id, user_id, role, joined_at)
+                   VALUES (%s, %s, %s, 'admin', NOW())""",
+                (member_id, circle_id, body.owner_id)
+            )
+            return {
+                "id": circle_id,
+                "name": body.name,
+                "description": body.description or "",
+                "owner_id": body.owner_id
+            }
+
+
+@router.get("/api/memory-circles")
+@read_only
+async def list_memory_circles(user_id: Optional[str] = Query(None)):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            if user_id:
+                await cur.execute(
+                    """SELECT mc.*, mcm.role FROM memory_circles mc
+                       INNER JOIN memory_circle_members mcm ON mc.id = mcm.circle_id
+                       WHERE mcm.user_id = %s ORDER BY mc.created_at DESC""",
+                    (user_id,)
+                )
+            else:
+                await cur.execute("SELECT *, 'member' as role FROM memory_circles ORDER BY created_at DESC LIMIT 50")
+            
+            rows = await cur.fetchall()
+            circles = []
+            for r in rows:
+                circles.append({
+                    "id": r[0],
+                    "name": r[1],
+                    "description": r[2] or "",
+                    "owner_id": r[3],
+                    "role": r[6] if len(r) > 6 else "member",
+                    "created_at": r[4].isoformat() if r[4] else ""
+                })
+            return circles
+
+
+@router.get("/api/memory-circles/{circle_id}")
+@read_only
+async def get_memory_circle(circle_id: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT * FROM memory_circles WHERE id = %s LIMIT 1", (circle_id,))
+            row = await cur.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Circle not found")
+            
+            # Get members
+            await cur.execute("SELECT * FROM memory_circle_members WHERE circle_id = %s", (circle_id,))
+            members = await cur.fetchall()
+            
+            # Get journeys
+            await cur.execute(
+                """SELECT j.*, mcj.shared_by FROM journeys j
+                   INNER JOIN memory_circle_journeys mcj ON j.id = mcj.journey_id
+                   WHERE mcj.circle_id = %s ORDER BY mcj.shared_at DESC""",
+                (circle_id,)
+            )
+            journeys = await cur.fetchall()
+            
+            return {
+                "id": row[0],
+                "name": row[1],
+                "description": row[2] or "",
+                "owner_id": row[3],
+                "created_at": row[4].isoformat() if row[4] else "",
+                "members": [{"user_id": m[2], "role": m[3]} for m in members],
+                "journeys": [{"id": j[0], "title": j[2], "shared_by": j[18]} for j in journeys] if journeys else []
+            }
+
+
+@router.post("/api/memory-circles/{circle_id}/members", status_code=201)
+async def add_circle_member(circle_id: str, body: CircleMemberAdd):
+    if not body.user_id:
+        raise HTTPException(status_code=400, detail="Missing user_id")
+    
+    member_id = str(uuid.uuid4())
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """INSERT INTO memory_circle_members (id, circle_id, user_id, role, joined_at)
+                   VALUES (%s, %s, %s, 'member', NOW())""",
+                (member_id, circle_id, body.user_id)
+            )
+            await feed.backfill_circle_member(cur, circle_id, body.user_id)
+            return {"id": member_id, "circle_id": circle_id, "user_id": body.user_id}
+
+
+@router.post("/api/memory-circles/{circle_id}/journeys", status_code=201)
+async def share_journey_to_circle(circle_id: str, body: CircleJourneyShare):
+    if not body.journey_id or not body.shared_by:
+        raise HTTPException(status_code=400, detail="Missing journey_id or shared_by")
+    
+    share_id = str(uuid.uuid4())
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """INSERT INTO memory_circle_journeys (id, circle_id, journey_id, shared_by, shared_at)
+                   VALUES (%s, %s, %s, %s, NOW())""",
+                (share_id, circle_id, body.journey_id, body.shared_by)
+            )
+            await feed.fan_out_circle_share(cur, circle_id, body.journey_id, body.shared_by)
+            engagement.emit("share", body.journey_id, "user:" + body.shared_by, circle_id)
+            return {"id": share_id, "circle_id": circle_id, "journey_id": body.journey_id}
+
+
+# ---------- Collaborative Journals ----------
+@router.post("/api/collaborative-journals", status_code=201)
+async def create_collaborative_journal(body: CollaborativeJournalCreate):
+    if not body.title or not body.created_by:
+        raise HTTPException(status_code=400, detail="Missing title or created_by")
+    
+    journal_id = str(uuid.uuid4())
+    member_id = str(uuid.uuid4())
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """INSERT INTO collaborative_journals (id, title, description, created_by, created_at, updated_at)
+                   VALUES (%s, %s, %s, %s, NOW(), NOW())""",
+                (journal_id, body.title, body.description or "", body.created_by)
+            )
+            # Auto-add creator as admin
+            await cur.execute(
+                """INSERT INTO collaborative_journal_members (id, journal_id, user_id, user_name, role, joined_at)
+                   VALUES (%s, %s, %s, %s, 'admin', NOW())""",
+                (member_id, journal_id, body.created_by, "Creator")
+            )
+            return {
+                "id": journal_id,
+                "title": body.title,
+                "description": body.description or "",
+                "created_by": body.created_by
+            }
+
+
+@router.get("/api/collaborative-journals")
+@read_only
+async def list_collaborative_journals(user_id: Optional[str] = Query(None)):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            if user_id:
+                await cur.execute(
+                    """SELECT cj.*, cjm.role FROM collaborative_journals cj
+                       INNER JOIN collaborative_journal_members cjm ON cj.id = cjm.journal_id
+                       WHERE cjm.user_id = %s ORDER BY cj.created_at DESC""",
+                    (user_id,)
+                )
+            else:
+                await cur.execute("SELECT *, 'member' as role FROM collaborative_journals ORDER BY created_at DESC LIMIT 50")
+            
+            rows = await cur.fetchall()
+            journals = []
+            for r in rows:
+                journals.append({
+                    "id": r[0],
+                    "title": r[1],
+                    "description": r[2] or "",
+                    "created_by": r[3],
+                    "role": r[6] if len(r) > 6 else "member",
+                    "created_at": r[4].isoformat() if r[4] else "",
+                    "updated_at": r[5].isoformat() if r[5] else ""
+                })
+            return journals
+
+
+@router.get("/api/collaborative-journals/{journal_id}")
+@read_only
+async def get_collaborative_journal(journal_id: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT * FROM collaborative_journals WHERE id = %s LIMIT 1", (journal_id,))
+            row = await cur.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Journal not found")
+            
+            # Get members
+            await cur.execute("SELECT * FROM collaborative_journal_members WHERE journal_id = %s", (journal_id,))
+            members = await cur.fetchall()
+            
+            # Get entries
+            await cur.execute(
+                "SELECT * FROM collaborative_journal_entries WHERE journal_id = %s ORDER BY created_at DESC",
+                (journal_id,)
+            )
+            entries = await cur.fetchall()
+            
+            return {
+                "id": row[0],
+                "title": row[1],
+                "description": row[2] or "",
+                "created_by": row[3],
+                "created_at": row[4].isoformat() if row[4] else "",
+                "updated_at": row[5].isoformat() if row[5] else "",
+                "members": [{"user_id": m[2], "user_name": m[3] or "", "role": m[4]} for m in members],
+                "entries": [{"id": e[0], "user_id": e[2], "user_name": e[3] or "", "content": e[4] or "", "entry_type": e[5], "image_url": e[6], "location": e[7], "created_at": e[8].isoformat() if e[8] else ""} for e in entries]
+            }
+
+
+JOURNAL_ENTRY_COLUMNS = "id, user_id, user_name, content, entry_type, image_url, location, created_at"
+# created_at is taken when an INSERT starts but the row only shows up when it
+# commits, so concurrent writers can make an older entry appear after a newer
+# one. Cursors handed out stay this far behind the newest entry; entries inside
+# the window are sent again on the next sync (clients dedupe by id).
+JOURNAL_SYNC_OVERLAP = timedelta(milliseconds=int(os.getenv('JOURNAL_SYNC_OVERLAP_MS', '2000')))
+
+
+def journal_resume_cursor(created_at: datetime) -> str:
+    """A ``since`` cursor that re-reads the overlap window before ``created_at``."""
+    return encode_cursor(created_at - JOURNAL_SYNC_OVERLAP, "")
+
+
+def journal_entry_row(e) -> dict:
+    return {
+        "id": e[0],
+        "user_id": e[1],
+        "user_name": e[2] or "",
+        "content": e[3] or "",
+        "entry_type": e[4],
+        "image_url": e[5],
+        "location": e[6],
+        "created_at": e[7].isoformat() if e[7] else "",
+    }
+
+
+@router.get("/api/collaborative-journals/{journal_id}/header")
+@read_only
+async def get_collaborative_journal_header(journal_id: str, request: Request):
+    """Journal title, description and members without entries (cacheable)"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # Title and description never change and members are only added, so
+            # the member count and latest join are the version
+            await cur.execute(
+                """SELECT cj.created_at, COUNT(cjm.id), MAX(cjm.joined_at)
+                   FROM collaborative_journals cj
+                   LEFT JOIN collaborative_journal_members cjm ON cjm.journal_id = cj.id
+                   WHERE cj.id = %s GROUP BY cj.id""",
+                (journal_id,)
+            )
+            version = await cur.fetchone()
+            if not version:
+                raise HTTPException(status_code=404, detail="Journal not found")
+            last_modified = version[2] or version[0]
+            etag = conditional.make_etag("journal-header", journal_id, *version)
+            cached = conditional.not_modified(request, etag, last_modified)
+            if cached:
+                return cached
+
+            await cur.execute(
+                "SELECT id, title, description, created_by, created_at FROM collaborative_journals WHERE id = %s LIMIT 1",
+                (journal_id,)
+            )
+            row = await cur.fetchone()
+            if not row:
+                raise HTTPException(status_code=404, detail="Journal not found")
+            await cur.execute(
+                "SELECT user_id, user_name, role FROM collaborative_journal_members WHERE journal_id = %s ORDER BY joined_at ASC",
+                (journal_id,)
+            )
+            members = await cur.fetchall()
+
+    return FastJSONResponse({
+        "id": row[0],
+        "title": row[1],
+        "description": row[2] or "",
+        "created_by": row[3],
+        "created_at": row[4].isoformat() if row[4] else "",
+        "members": [{"user_id": m[0], "user_name": m[1] or "", "role": m[2]} for m in members],
+    }, headers=conditional.validators(etag, last_modified))
+
+
+@router.get("/api/collaborative-journals/{journal_id}/entries")
+async def list_journal_entries(
+    journal_id: str,
+    since: Optional[str] = Query(None),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Entries added after the `since` cursor (oldest first), or the latest `limit` entries without one.
+
+    Entries from the last `JOURNAL_SYNC_OVERLAP_MS` may be returned again on the next call.
+    """
+    try:
+        after = decode_cursor(since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Primary only: a lagging replica would hand out a cursor past rows it hasn't applied yet
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT NOW(6)")
+            horizon = (await cur.fetchone())[0] - JOURNAL_SYNC_OVERLAP
+            if after:
+                ts, entry_id = after
+                await cur.execute(
+                    f"""SELECT {JOURNAL_ENTRY_COLUMNS} FROM collaborative_journal_entries
+                        WHERE journal_id = %s AND (created_at > %s OR (created_at = %s AND id > %s))
+                        ORDER BY created_at ASC, id ASC LIMIT %s""",
+                    (journal_id, ts, ts, entry_id, limit + 1)
+                )
+                rows = list(await cur.fetchall())
+                has_more = len(rows) > limit
+                rows = rows[:limit]
+            else:
+                await cur.execute(
+                    f"""SELECT {JOURNAL_ENTRY_COLUMNS} FROM collaborative_journal_entries
+                        WHERE journal_id = %s
+                        ORDER BY created_at DESC, id DESC LIMIT %s""",
+                    (journal_id, limit)
+                )
+                rows = list(reversed(await cur.fetchall()))
+                has_more = False
+
+    # Advance only over entries older than the horizon; anything committed
+    # before this read with an earlier created_at is already among them
+    settled = [r for r in rows if r[7] < horizon]
+    if settled:
+        cursor = encode_cursor(settled[-1][7], settled[-1][0])
+    elif rows and not after:
+        cursor = encode_cursor(rows[0][7], "")
+    else:
+        cursor = since
+    return {
+        "entries": [journal_entry_row(e) for e in rows],
+        "cursor": cursor,
+        "has_more": has_more,
+    }
+
+
+@router.post("/api/collaborative-journals/{journal_id}/entries", status_code=201)
+async def add_journal_entry(journal_id: str, body: JournalEntryCreate):
+    if not body.user_id or not body.content:
+        raise HTTPException(status_code=400, detail="Missing user_id or content")
+    
+    entry_id = str(uuid.uuid4())
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """INSERT INTO collaborative_journal_entries (id, journal_id, user_id, user_name, content, entry_type, image_url, location, created_at)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(6))""",
+                (entry_id, journal_id, body.user_id, body.user_name, body.content, body.entry_type, body.image_url, body.location)
+            )
+            await cur.execute("SELECT created_at FROM collaborative_journal_entries WHERE id = %s", (entry_id,))
+            created_at = (await cur.fetchone())[0]
+            # Update journal timestamp
+            await cur.execute("UPDATE collaborative_journals SET updated_at = NOW() WHERE id = %s", (journal_id,))
+    await get_broker().publish(journal_topic(journal_id), {
+        "event": "entry",
+        "id": entry_id,
+        "data": {
+            "id": entry_id,
+            "user_id": body.user_id,
+            "user_name": body.user_name or "",
+            "content": body.content,
+            "entry_type": body.entry_type,
+            "image_url": body.image_url,
+            "location": body.location,
+            "created_at": created_at.isoformat(),
+            # Pass as `since` to /entries to catch up after a dropped stream
+            "cursor": journal_resume_cursor(created_at),
+        },
+    })
+    return {"id": entry_id, "journal_id": journal_id}
+
+
+@router.post("/api/collaborative-journals/{journal_id}/members", status_code=201)
+async def add_journal_member(journal_id: str, body: JournalMemberAdd):
+    if not body.user_id:
+        raise HTTPException(status_code=400, detail="Missing user_id")
+    
+    member_id = str(uuid.uuid4())
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """INSERT INTO collaborative_journal_members (id, journal_id, user_id, user_name, role, joined_at)
+                   VALUES (%s, %s, %s, %s, 'contributor', NOW())""",
+                (member_id, journal_id, body.user_id, body.user_name or "")
+            )
+    await get_broker().publish(journal_topic(journal_id), {
+        "event": "member",
+        "id": member_id,
+        "data": {"user_id": body.user_id, "user_name": body.user_name or "", "role": "contributor"},
+    })
+    return {"id": member_id, "journal_id": journal_id, "user_id": body.user_id}
+
+
+SSE_KEEPALIVE_SECONDS = 15
+
+
+@router.get("/api/collaborative-journals/{journal_id}/events")
+async def stream_journal_events(journal_id: str, request: Request):
+    """Server-Sent Events stream of new entries and members for a journal"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT 1 FROM collaborative_journals WHERE id = %s LIMIT 1", (journal_id,))
+            if not await cur.fetchone():
+                raise HTTPException(status_code=404, detail="Journal not found")
+
+    async def event_stream():
+        async with get_broker().subscribe(journal_topic(journal_id)) as queue:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    msg = await asyncio.wait_for(queue.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {msg['id']}\nevent: {msg['event']}\ndata: {json.dumps(msg['data'])}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ---------- Anonymous Story Exchange ----------
+@router.post("/api/anonymous-memories", status_code=201)
+async def create_anonymous_memory(body: AnonymousMemoryCreate):
+    if not body.journey_id or not body.user_id or not body.title or not body.story:
+        raise HTTPException(status_code=400, detail="Missing required fields")
+    
+    memory_id = str(uuid.uuid4())
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """INSERT INTO anonymous_memories (id, journey_id, original_user_id, title, story, location, travel_type, keywords, created_at)
+                   VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW())""",
+                (memory_id, body.journey_id, body.user_id, body.title, body.story, body.location or "", body.travel_type or "solo", json.dumps(body.keywords))
+            )
+            memory_matcher.get_index().add(memory_id, body.user_id, body.location, body.travel_type or "solo", body.keywords)
+            return {
+                "id": memory_id,
+                "title": body.title,
+                "story": body.story,
+                "location": body.location or "",
+                "travel_type": body.travel_type or "solo"
+            }
+
+
+@router.get("/api/anonymous-memories")
+@read_only
+async def list_anonymous_memories(travel_type: Optional[str] = Query(None)):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            if travel_type:
+                await cur.execute(
+                    "SELECT * FROM anonymous_memories WHERE travel_type = %s ORDER BY created_at DESC LIMIT 50",
+                    (travel_type,)
+                )
+            else:
+                await cur.execute("SELECT * FROM anonymous_memories ORDER BY created_at DESC LIMIT 50")
+            
+            rows = await cur.fetchall()
+            memories = []
+            for r in rows:
+                memories.append({
+                    "id": r[0],
+                    "title": r[3],
+                    "story": r[4] or "",
+                    "location": r[5] or "",
+                    "travel_type": r[6] or "solo",
+                    "keywords": json.loads(r[7]) if r[7] else [],
+                    "created_at": r[8].isoformat() if r[8] else ""
+                })
+            return memories
+
+
+async def find_memory_matches(cur, memory_id: str, user_id: str, limit: int) -> list:
+    exclude = await memory_matcher.exchanged_memory_ids(cur, user_id)
+    ranked = await memory_matcher.get_index().match(cur, memory_id, user_id, exclude, limit)
+    if not ranked:
+        return []
+    ids = [mid for mid, _ in ranked]
+    placeholders = ", ".join(["%s"] * len(ids))
+    await cur.execute(
+        f"SELECT id, original_user_id, title, story, location, travel_type, keywords FROM anonymous_memories WHERE id IN ({placeholders})",
+        tuple(ids)
+    )
+    rows = {r[0]: r for r in await cur.fetchall()}
+    matches = []
+    for mid, score in ranked:
+        r = rows.get(mid)
+        if not r:
+            continue
+        matches.append({
+            "id": r[0],
+            "original_user_id": r[1],
+            "title": r[2],
+            "story": r[3] or "",
+            "location": r[4] or "",
+            "travel_type": r[5] or "solo",
+            "keywords": json.loads(r[6]) if r[6] else [],
+            "score": round(score, 4),
+        })
+    return matches
+
+
+@router.get("/api/anonymous-memories/{memory_id}/matches")
+async def list_memory_matches(memory_id: str, user_id: str = Query(...), limit: int = Query(5, ge=1, le=50)):
+    """Strangers' memories that best complement the given memory"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            matches = await find_memory_matches(cur, memory_id, user_id, limit)
+            # Don't reveal who wrote the other stories
+            return [{k: v for k, v in m.items() if k != "original_user_id"} for m in matches]
+
+
+@router.post("/api/memory-exchanges/match", status_code=201)
+async def match_memory_exchange(body: MemoryMatchRequest):
+    """Exchange the user's memory with the best matching stranger's memory"""
+    if not body.user_id or not body.memory_id:
+        raise HTTPException(status_code=400, detail="Missing user_id or memory_id")
+    
+    exchange_id = str(uuid.uuid4())
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT id, title, story, location FROM anonymous_memories WHERE id = %s AND original_user_id = %s LIMIT 1",
+                (body.memory_id, body.user_id)
+            )
+            mine = await cur.fetchone()
+            if not mine:
+                raise HTTPException(status_code=404, detail="Memory not found")
+            matches = await find_memory_matches(cur, body.memory_id, body.user_id, 1)
+            if not matches:
+                raise HTTPException(status_code=404, detail="No matching memory found")
+            match = matches[0]
+            
+            await cur.execute(
+                """INSERT INTO memory_exchanges (id, user1_id, user2_id, memory1_id, memory2_id, exchanged_at)
+                   VALUES (%s, %s, %s, %s, %s, NOW())""",
+                (exchange_id, body.user_id, match["original_user_id"], body.memory_id, match["id"])
+            )
+            return {
+                "id": exchange_id,
+                "exchanged_at": datetime.utcnow().isoformat(),
+                "score": match["score"],
+                "memories": [
+                    {"id": mine[0], "title": mine[1], "story": mine[2] or "", "location": mine[3] or ""},
+                    {"id": match["id"], "title": match["title"], "story": match["story"], "location": match["location"]},
+                ]
+            }
+
+
+@router.post("/api/memory-exchanges", status_code=201)
+async def create_memory_exchange(body: MemoryExchangeCreate):
+    if not body.user1_id or not body.memory1_id or not body.memory2_id:
+        raise HTTPException(status_code=400, detail="Missing required fields")
+    
+    exchange_id = str(uuid.uuid4())
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """INSERT INTO memory_exchanges (id, user1_id, user2_id, memory1_id, memory2_id, exchanged_at)
+                   VALUES (%s, %s, %s, %s, %s, NOW())""",
+                (exchange_id, body.user1_id, body.user2_id, body.memory1_id, body.memory2_id)
+            )
+            
+            # Get both memories
+            await cur.execute(
+                "SELECT * FROM anonymous_memories WHERE id IN (%s, %s)",
+                (body.memory1_id, body.memory2_id)
+            )
+            memories = await cur.fetchall()
+            
+            return {
+                "id": exchange_id,
+                "exchanged_at": datetime.utcnow().isoformat(),
+                "memories": [{"id": m[0], "title": m[3], "story": m[4] or "", "location": m[5] or ""} for m in memories]
+            }
+
+
+@router.get("/api/memory-exchanges/{user_id}")
+@read_only
+async def get_user_exchanges(user_id: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                "SELECT * FROM memory_exchanges WHERE user1_id = %s OR user2_id = %s ORDER BY exchanged_at DESC",
+                (user_id, user_id)
+            )
+            rows = await cur.fetchall()
+            
+            exchanges = []
+            for r in rows:
+                # Get memories for this exchange
+                await cur.execute(
+                    "SELECT * FROM anonymous_memories WHERE id IN (%s, %s)",
+                    (r[3], r[4])
+                )
+                memories = await cur.fetchall()
+                
+                exchanges.append({
+                    "id": r[0],
+                    "exchanged_at": r[5].isoformat() if r[5] else "",
+                    "memories": [{"id": m[0], "title": m[3], "story": m[4] or "", "location": m[5] or ""} for m in memories]
+                })
+            return exchanges
+
+
+# ---------- Friends/Contacts ----------
+@router.post("/api/friends", status_code=201)
+async def add_friend(body: FriendCreate):
+    if not body.user_id or not body.friend_id:
+        raise HTTPException(status_code=400, detail="Missing user_id or friend_id")
+    if body.user_id == body.friend_id:
+        raise HTTPException(status_code=400, detail="Cannot add yourself as a friend")
+    
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # Stores both directions so the friendship shows up for either user
+            friend_id = await friend_graph.add_edge(
+                cur, body.user_id, body.friend_id,
+                body.friend_name or "", body.friend_email or "", body.friend_avatar or ""
+            )
+            await feed.backfill_friend(cur, body.user_id, body.friend_id)
+            await feed.backfill_friend(cur, body.friend_id, body.user_id)
+            return {
+                "id": friend_id,
+                "user_id": body.user_id,
+                "friend_id": body.friend_id,
+                "friend_name": body.friend_name or "",
+                "friend_email": body.friend_email or "",
+                "friend_avatar": body.friend_avatar or ""
+            }
+
+
+@router.get("/api/friends")
+@read_only
+async def list_friends(
+    request: Request,
+    response: Response,
+    user_id: str = Query(...),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(200, ge=1, le=500)
+):
+    """List a user's friends, newest first. The next page cursor is sent in X-Next-Cursor."""
+    try:
+        before = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            # Soft deletes and re-adds bump updated_at, so this covers every change
+            await cur.execute(
+                "SELECT COUNT(*), MAX(updated_at) FROM user_friends WHERE user_id = %s",
+                (user_id,)
+            )
+            count, last_modified = await cur.fetchone()
+            etag = conditional.make_etag("friends", user_id, count, last_modified, cursor, limit)
+            cached = conditional.not_modified(request, etag, last_modified)
+            if cached:
+                return cached
+            response.headers.update(conditional.validators(etag, last_modified))
+
+            query = "SELECT id, user_id, friend_id, friend_name, friend_email, friend_avatar, status, added_at FROM user_friends WHERE user_id = %s AND status = 'active'"
+            params = [user_id]
+            if before:
+                query += " AND (added_at < %s OR (added_at = %s AND id < %s))"
+                params.extend([before[0], before[0], before[1]])
+            query += " ORDER BY added_at DESC, id DESC LIMIT %s"
+            params.append(limit + 1)
+            await cur.execute(query, tuple(params))
+            rows = await cur.fetchall()
+            
+            if len(rows) > limit:
+                rows = rows[:limit]
+                response.headers["X-Next-Cursor"] = encode_cursor(rows[-1][7], rows[-1][0])
+            
+            friends = []
+            for r in rows:
+                friends.append({
+                    "id": r[0],
+                    "user_id": r[1],
+                    "friend_id": r[2],
+                    "friend_name": r[3] or "",
+                    "friend_email": r[4] or "",
+                    "friend_avatar": r[5] or "",
+                    "status": r[6],
+                    "added_at": r[7].isoformat() if r[7] else ""
+                })
+            return friends
+
+
+@router.get("/api/friends/suggestions")
+async def friend_suggestions(user_id: str = Query(...), limit: int = Query(10, ge=1, le=50)):
+    """People the user may know, ranked by number of mutual friends"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            ranked = await friend_graph.get_graph().suggestions(cur, user_id, limit)
+            if not ranked:
+                return []
+            ids = [uid for uid, _ in ranked]
+            placeholders = ", ".join(["%s"] * len(ids))
+            # Display details as other users saved them
+            await cur.execute(
+                f"""SELECT friend_id, MAX(friend_name), MAX(friend_avatar) FROM user_friends
+                    WHERE friend_id IN ({placeholders}) GROUP BY friend_id""",
+                tuple(ids)
+            )
+            details = {r[0]: r for r in await cur.fetchall()}
+            return [
+                {
+                    "user_id": uid,
+                    "friend_name": (details.get(uid) or (None, "", ""))[1] or "",
+                    "friend_avatar": (details.get(uid) or (None, "", ""))[2] or "",
+                    "mutual_count": count,
+                }
+                for uid, count in ranked
+            ]
+
+
+@router.get("/api/friends/{user_id}/mutual/{other_id}")
+async def mutual_friends(user_id: str, other_id: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            mutual = await friend_graph.get_graph().mutual_friends(cur, user_id, other_id)
+            return {"count": len(mutual), "friend_ids": sorted(mutual)}
+
+
+@router.delete("/api/friends/{friend_id}", status_code=204)
+async def delete_friend(friend_id: str):
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            await friend_graph.remove_edge(cur, friend_id)
+            return None
+
+
+# ---------- Home Feed ----------
+@router.get("/api/users/{user_id}/feed")
+@read_only
+async def get_feed(
+    user_id: str,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=feed.FEED_MAX_PAGE)
+):
+    """Journeys posted by friends and shared into the user's circles, newest first"""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.cursor() as cur:
+            try:
+                return await feed.read_feed(cur, user_id, limit, cursor)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
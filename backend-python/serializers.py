@@ -0,0 +1,135 @@
+"""Row-to-JSON conversion shared by the list and detail endpoints.
+
+JSON columns (legs, keywords, cultural_insights) are passed through as
+``orjson.Fragment`` so the text MySQL returns is spliced into the response
+without a decode/re-encode round trip. Handlers return these dicts wrapped in
+``FastJSONResponse``, which skips FastAPI's ``jsonable_encoder`` walk. Without
+orjson (or with one older than 3.9) the columns are decoded and the stdlib
+encoder is used, producing the same output.
+
+Kept free of FastAPI imports so ``bench/serialization.py`` can time the exact
+code the handlers run.
+"""
+import json
+from datetime import date, datetime
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the stdlib encoder
+    orjson = None
+
+import thumbnails
+
+_FRAGMENTS = orjson is not None and hasattr(orjson, "Fragment")
+
+JOURNEY_COLUMNS = (
+    "id, user_id, title, description, journey_type, departure_date, return_date, legs, keywords, "
+    "ai_story, similarity_score, rarity_score, cultural_insights, visibility, likes_count, views_count, "
+    "created_at, updated_at"
+)
+
+
+def to_iso_date(d: Optional[date]) -> str:
+    return d.isoformat() if isinstance(d, (date, datetime)) else (d or "")
+
+
+def raw_json(text: Optional[str], default):
+    """A JSON column as stored; spliced verbatim when the encoder supports it."""
+    if not text:
+        return default
+    if _FRAGMENTS:
+        return orjson.Fragment(text)
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+
+def dumps(content) -> bytes:
+    """Encode a response body; the counterpart of ``raw_json``."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def journey_row(r) -> dict:
+    """Build the API dict for a row selected with ``JOURNEY_COLUMNS``."""
+    return {
+        "id": r[0],
+        "user_id": r[1],
+        "title": r[2],
+        "description": r[3] or "",
+        "journey_type": r[4],
+        "departure_date": to_iso_date(r[5]),
+        "return_date": to_iso_date(r[6]),
+        "legs": raw_json(r[7], []),
+        "keywords": raw_json(r[8], []),
+        "ai_story": r[9] or "",
+        "similarity_score": float(r[10]) if r[10] else 0.0,
+        "rarity_score": float(r[11]) if r[11] else 50.0,
+        "cultural_insights": raw_json(r[12], {}),
+        "visibility": r[13],
+        "likes_count": r[14] or 0,
+        "views_count": r[15] or 0,
+        "created_at": r[16].isoformat() if r[16] else "",
+        "updated_at": r[17].isoformat() if r[17] else "",
+    }
+
+
+JOURNEY_FIELDS = tuple(c.strip() for c in JOURNEY_COLUMNS.split(","))
+# Per-field version of journey_row, for projections; keep the two in step
+_JOURNEY_CONVERTERS = {
+    "description": lambda v: v or "",
+    "departure_date": to_iso_date,
+    "return_date": to_iso_date,
+    "legs": lambda v: raw_json(v, []),
+    "keywords": lambda v: raw_json(v, []),
+    "ai_story": lambda v: v or "",
+    "similarity_score": lambda v: float(v) if v else 0.0,
+    "rarity_score": lambda v: float(v) if v else 50.0,
+    "cultural_insights": lambda v: raw_json(v, {}),
+    "likes_count": lambda v: v or 0,
+    "views_count": lambda v: v or 0,
+    "created_at": lambda v: v.isoformat() if v else "",
+    "updated_at": lambda v: v.isoformat() if v else "",
+}
+
+
+def journey_projection(r, fields) -> dict:
+    """API dict for a row selected with just ``fields`` (names from ``JOURNEY_FIELDS``)."""
+    return {f: _JOURNEY_CONVERTERS[f](v) if f in _JOURNEY_CONVERTERS else v for f, v in zip(fields, r)}
+
+
+ALBUM_COLUMNS = "id, user_id, title, description, journey_id, visibility, created_at, updated_at"
+
+
+def album_row(r) -> dict:
+    return {
+        "id": r[0],
+        "user_id": r[1],
+        "title": r[2],
+        "description": r[3] or "",
+        "journey_id": r[4],
+        "visibility": r[5],
+        "created_at": r[6].isoformat() if r[6] else "",
+        "updated_at": r[7].isoformat() if r[7] else "",
+    }
+
+
+PHOTO_COLUMNS = "id, album_id, user_id, image_url, caption, page_number, meta, created_at, variants"
+
+
+def photo_row(r, width: Optional[int] = None) -> dict:
+    """``display_url`` is the narrowest rendered variant covering ``width`` (CSS px x DPR)."""
+    variants = thumbnails.variant_urls(r[8])
+    return {
+        "id": r[0],
+        "album_id": r[1],
+        "user_id": r[2],
+        "image_url": r[3],
+        "caption": r[4],
+        "page_number": r[5],
+        "meta": r[6],
+        "created_at": r[7].isoformat() if r[7] else None,
+        "display_url": thumbnails.pick_url(variants, width, r[3]),
+        "thumbnail_url": next(iter(variants.values()), r[3]),
+        "variants": {str(w): url for w, url in variants.items()},
+    }
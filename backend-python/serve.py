@@ -0,0 +1,101 @@
+"""Production entry point: several uvicorn workers sharing one port.
+
+    python serve.py
+
+Every worker is a separate process with its own DB pool, so the pool size is
+derived from one connection budget for the whole server:
+``DB_POOL_SIZE = DB_CONNECTION_BUDGET // WEB_CONCURRENCY``. Keep the budget
+below MySQL's ``max_connections`` (151 by default) minus what other clients
+and replication need.
+
+On SIGTERM/SIGINT uvicorn stops accepting connections and gives in-flight
+requests up to ``GRACEFUL_TIMEOUT`` seconds; each worker then runs the app's
+lifespan shutdown, which drains the thumbnail queue, flushes buffered engagement
+events and the log queue and closes every pool. Event streams are cut at the
+timeout and clients reconnect.
+
+Environment:
+  HOST, PORT              bind address (default 0.0.0.0:8000)
+  WEB_CONCURRENCY         worker processes (default: usable CPUs)
+  DB_CONNECTION_BUDGET    connections all workers may open together (default 100)
+  DB_POOL_SIZE            per-worker pool size; overrides the budget split
+  GRACEFUL_TIMEOUT        seconds in-flight requests get on shutdown (default 30)
+  FORWARDED_ALLOW_IPS     proxies trusted for X-Forwarded-* (default 127.0.0.1)
+"""
+import os
+import sys
+import logging
+
+import uvicorn
+
+HOST = os.getenv('HOST', '0.0.0.0')
+PORT = int(os.getenv('PORT', '8000'))
+GRACEFUL_TIMEOUT = int(os.getenv('GRACEFUL_TIMEOUT', '30'))
+FORWARDED_ALLOW_IPS = os.getenv('FORWARDED_ALLOW_IPS', '127.0.0.1')
+DB_CONNECTION_BUDGET = int(os.getenv('DB_CONNECTION_BUDGET', '100'))
+# Past this an async worker gains nothing from more connections
+MAX_POOL_SIZE = 20
+
+logger = logging.getLogger("serve")
+
+
+def cpu_count() -> int:
+    """CPUs this process may run on (respects affinity / container cpusets)."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def plan() -> dict:
+    """Worker count and per-worker settings, exported to the workers' environment."""
+    cpus = cpu_count()
+    workers = int(os.getenv('WEB_CONCURRENCY') or cpus)
+    if os.getenv('DB_POOL_SIZE'):
+        pool_size = int(os.environ['DB_POOL_SIZE'])
+    else:
+        pool_size = min(MAX_POOL_SIZE, DB_CONNECTION_BUDGET // workers)
+    if pool_size < 2:
+        sys.exit(f"DB_CONNECTION_BUDGET={DB_CONNECTION_BUDGET} leaves fewer than 2 connections for each of "
+                 f"{workers} workers; raise the budget or lower WEB_CONCURRENCY")
+    return {
+        "WEB_CONCURRENCY": str(workers),
+        "DB_POOL_SIZE": str(pool_size),
+        # Thumbnail processes per worker, so all workers together use about one per CPU
+        "THUMBNAIL_PROCESSES": os.getenv('THUMBNAIL_PROCESSES') or str(max(1, cpus // workers)),
+    }
+
+
+def warn_single_process_state(workers: int):
+    if workers < 2:
+        return
+    if not os.getenv('BROKER_URL'):
+        logger.warning("BROKER_URL is not set: live journal events only reach clients on the publishing worker")
+    if os.getenv('IDEMPOTENCY_STORE') == 'memory':
+        logger.warning("IDEMPOTENCY_STORE=memory: retries that land on another worker are not deduplicated")
+    if not os.getenv('RATE_LIMIT_URL'):
+        logger.warning("RATE_LIMIT_URL is not set: each worker enforces the rate limits on its own")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    settings = plan()
+    os.environ.update(settings)
+    workers = int(settings["WEB_CONCURRENCY"])
+    logger.info("starting %d workers on %s:%d, %s DB connections each (%d total)",
+                workers, HOST, PORT, settings["DB_POOL_SIZE"], workers * int(settings["DB_POOL_SIZE"]))
+    warn_single_process_state(workers)
+    uvicorn.run(
+        "main:app",
+        app_dir=os.path.dirname(os.path.abspath(__file__)),
+        host=HOST,
+        port=PORT,
+        workers=workers,
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        timeout_graceful_shutdown=GRACEFUL_TIMEOUT,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import asyncio
+import gzip
+
+import compression
+
+
+def run(app, headers=((b"accept-encoding", b"gzip"),)):
+    """Drive CompressionMiddleware around ``app``; returns the messages it sent."""
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": list(headers)}
+    asyncio.run(compression.CompressionMiddleware(app, minimum_size=16)(scope, receive, send))
+    return sent
+
+
+def start(content_type=b"application/json"):
+    return {"type": "http.response.start", "status": 200, "headers": [(b"content-type", content_type)]}
+
+
+def test_pathsend_passes_through_after_start():
+    async def app(scope, receive, send):
+        await send(start(b"image/jpeg"))
+        await send({"type": "http.response.pathsend", "path": "/tmp/photo.jpg"})
+
+    sent = run(app)
+    assert [m["type"] for m in sent] == ["http.response.start", "http.response.pathsend"]
+    assert sent[1]["path"] == "/tmp/photo.jpg"
+
+
+def test_complete_body_is_compressed():
+    body = b'{"journeys": [' + b'{"title": "Lisbon"},' * 50 + b'{}]}'
+
+    async def app(scope, receive, send):
+        await send(start())
+        await send({"type": "http.response.body", "body": body})
+
+    sent = run(app)
+    headers = dict(sent[0]["headers"])
+    assert headers[b"content-encoding"] == b"gzip"
+    assert headers[b"vary"] == b"Accept-Encoding"
+    assert gzip.decompress(sent[1]["body"]) == body
+
+
+def test_streaming_body_is_untouched():
+    async def app(scope, receive, send):
+        await send(start(b"text/event-stream"))
+        await send({"type": "http.response.body", "body": b"data: 1\n\n" * 10, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    sent = run(app)
+    assert [m["type"] for m in sent] == ["http.response.start"] + ["http.response.body"] * 2
+    assert sent[0]["headers"] == [(b"content-type", b"text/event-stream")]
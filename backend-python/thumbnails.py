@@ -0,0 +1,274 @@
+"""Resized variants of album photos, rendered in a process pool.
+
+``create_photo`` queues each new photo; workers decode it once, write WebP
+variants at ``THUMBNAIL_WIDTHS`` (never upscaling) into the media store and
+record their keys in ``album_photos.variants``::
+
+    {"160": "<key>", "320": "<key>", ...}
+
+The column belongs to the server; clients own ``meta`` and can't touch it.
+
+``list_photos`` then hands out the smallest variant that covers the requested
+width. Photos in the media store are always processed; external URLs only
+when their host is listed in ``THUMBNAIL_FETCH_HOSTS`` (comma separated), so
+the server never fetches arbitrary user-supplied URLs.
+
+The queue is bounded: when it is full new photos are skipped (and logged) and
+picked up later by the backfill, which also covers photos that predate this:
+
+    python thumbnails.py backfill
+"""
+import io
+import os
+import sys
+import json
+import asyncio
+import logging
+import multiprocessing
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import media
+
+THUMBNAIL_WIDTHS = tuple(int(w) for w in os.getenv('THUMBNAIL_WIDTHS', '160,320,640,1280').split(','))
+THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', '80'))
+THUMBNAIL_PROCESSES = int(os.getenv('THUMBNAIL_PROCESSES', '2'))
+THUMBNAIL_QUEUE_SIZE = int(os.getenv('THUMBNAIL_QUEUE_SIZE', '1000'))
+THUMBNAIL_RETRIES = int(os.getenv('THUMBNAIL_RETRIES', '3'))
+THUMBNAIL_DRAIN_SECONDS = float(os.getenv('THUMBNAIL_DRAIN_SECONDS', '10'))
+THUMBNAIL_FETCH_HOSTS = {h.strip().lower() for h in os.getenv('THUMBNAIL_FETCH_HOSTS', '').split(',') if h.strip()}
+FETCH_TIMEOUT = 20
+
+logger = logging.getLogger("thumbnails")
+
+
+# ---------- Worker process ----------
+def render_variants(source: str, widths: Tuple[int, ...], quality: int, max_bytes: int) -> dict:
+    """Decode ``source`` (a local path or an allowed URL) and encode each narrower width as WebP."""
+    from PIL import Image, ImageOps
+
+    if source.startswith(("http://", "https://")):
+        with urllib.request.urlopen(source, timeout=FETCH_TIMEOUT) as resp:
+            data = resp.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            raise ValueError(f"source exceeds {max_bytes} bytes")
+        image = Image.open(io.BytesIO(data))
+    else:
+        image = Image.open(source)
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    variants = {}
+    for width in sorted(widths):
+        if width >= image.width:
+            break
+        height = max(1, round(image.height * width / image.width))
+        out = io.BytesIO()
+        image.resize((width, height), Image.LANCZOS).save(out, "WEBP", quality=quality, method=4)
+        variants[width] = out.getvalue()
+    return {"width": image.width, "height": image.height, "variants": variants}
+
+
+# ---------- variants helpers ----------
+def variant_urls(raw: Optional[str]) -> Dict[int, str]:
+    """Width -> URL of each rendered variant in ``album_photos.variants``, narrowest first.
+
+    Entries that aren't ``"<width>": "<key>"`` are skipped rather than failing the whole album.
+    """
+    if not raw:
+        return {}
+    try:
+        variants = json.loads(raw)
+    except ValueError:
+        return {}
+    if not isinstance(variants, dict):
+        return {}
+    urls = {}
+    for width, key in variants.items():
+        if isinstance(width, str) and width.isdigit() and isinstance(key, str) and media.KEY_RE.match(key):
+            urls[int(width)] = media.media_url(key)
+    return dict(sorted(urls.items()))
+
+
+def pick_url(variants: Dict[int, str], width: Optional[int], original: str) -> str:
+    """Narrowest variant at least ``width`` wide; the original when none is wide enough."""
+    if width:
+        for w, url in variants.items():
+            if w >= width:
+                return url
+    return original
+
+
+def source_for(image_url: str) -> Optional[str]:
+    key = media.key_from_url(image_url)
+    if key:
+        return media.get_store().path(key)
+    if THUMBNAIL_FETCH_HOSTS and (urlparse(image_url).hostname or "").lower() in THUMBNAIL_FETCH_HOSTS:
+        return image_url
+    return None
+
+
+# ---------- Pipeline ----------
+class ThumbnailPipeline:
+    def __init__(self, get_pool, processes: int = THUMBNAIL_PROCESSES, queue_size: int = THUMBNAIL_QUEUE_SIZE):
+        self.get_pool = get_pool
+        self.processes = processes
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # spawn: forking a process that runs an event loop and logging threads is unsafe
+        return ProcessPoolExecutor(max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+
+    def start(self):
+        if self._executor is None:
+            self._executor = self._new_executor()
+            # One consumer per process keeps every process busy without oversubscribing
+            self._tasks = [asyncio.create_task(self._consume()) for _ in range(self.processes)]
+
+    async def drain(self, timeout: float = THUMBNAIL_DRAIN_SECONDS):
+        """Wait for queued photos to finish; whatever is left is picked up by the backfill."""
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("thumbnail queue not drained, left for backfill",
+                           extra={"fields": {"pending": self.queue.qsize()}})
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def submit(self, photo_id: str, image_url: str) -> bool:
+        """Queue a photo without waiting; False if it can't be processed or the queue is full."""
+        source = source_for(image_url)
+        if source is None:
+            return False
+        try:
+            self.queue.put_nowait((photo_id, source))
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning("thumbnail queue full, photo left for backfill", extra={"fields": {"photo_id": photo_id}})
+            return False
+
+    async def put(self, photo_id: str, image_url: str) -> bool:
+        """Queue a photo, waiting for room (backfill)."""
+        source = source_for(image_url)
+        if source is None:
+            return False
+        await self.queue.put((photo_id, source))
+        return True
+
+    async def _consume(self):
+        while True:
+            photo_id, source = await self.queue.get()
+            try:
+                await self._process(photo_id, source)
+            except Exception:
+                logger.exception("thumbnail generation failed", extra={"fields": {"photo_id": photo_id}})
+            finally:
+                self.queue.task_done()
+
+    async def _process(self, photo_id: str, source: str):
+        loop = asyncio.get_running_loop()
+        for attempt in range(THUMBNAIL_RETRIES + 1):
+            try:
+                rendered = await loop.run_in_executor(
+                    self._executor, render_variants, source, THUMBNAIL_WIDTHS, THUMBNAIL_QUALITY, media.MEDIA_MAX_BYTES)
+                break
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    # A worker died (e.g. OOM on a huge image); later jobs need a fresh pool
+                    self._executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._new_executor()
+                if attempt == THUMBNAIL_RETRIES:
+                    raise
+                delay = 2 ** attempt
+                logger.warning("thumbnail attempt failed, retrying", extra={"fields": {
+                    "photo_id": photo_id, "attempt": attempt + 1, "retry_in_s": delay, "error": repr(e)}})
+                await asyncio.sleep(delay)
+
+        store = media.get_store()
+        keys = {}
+        for width, data in rendered["variants"].items():
+            keys[str(width)] = (await store.put_bytes(data, "image/webp"))["key"]
+        await self._record(photo_id, keys)
+        logger.info("thumbnails ready", extra={"fields": {
+            "photo_id": photo_id, "variants": len(keys), "width": rendered["width"], "height": rendered["height"]}})
+
+    async def _record(self, photo_id: str, keys: Dict[str, str]):
+        pool = await self.get_pool()
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cur:
+                # An image narrower than every width still records {}, so the backfill skips it
+                await cur.execute("UPDATE album_photos SET variants = %s WHERE id = %s", (json.dumps(keys), photo_id))
+
+
+_pipeline: Optional[ThumbnailPipeline] = None
+
+
+def get_pipeline() -> ThumbnailPipeline:
+    global _pipeline
+    if _pipeline is None:
+        import db
+        _pipeline = ThumbnailPipeline(db.get_pool)
+    return _pipeline
+
+
+# ---------- Backfill ----------
+async def backfill(batch: int = 200) -> int:
+    """Queue every photo without variants, in id order."""
+    import db
+
+    pipeline = get_pipeline()
+    pipeline.start()
+    pool = await db.get_pool()
+    queued, last_id = 0, ""
+    try:
+        while True:
+            async with pool.acquire() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(
+                        """SELECT id, image_url FROM album_photos
+                           WHERE id > %s AND variants IS NULL
+                             AND image_url NOT LIKE 'data:%%'
+                           ORDER BY id LIMIT %s""",
+                        (last_id, batch),
+                    )
+                    rows = await cur.fetchall()
+            if not rows:
+                break
+            for photo_id, image_url in rows:
+                last_id = photo_id
+                if await pipeline.put(photo_id, image_url):
+                    queued += 1
+            print(f"queued {queued} photos (last id {last_id})")
+        await pipeline.queue.join()
+    finally:
+        await pipeline.stop()
+        await db.close_pool()
+    return queued
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] != ["backfill"]:
+        sys.exit("usage: python thumbnails.py backfill")
+    logging.basicConfig(level=logging.INFO)
+    print(f"processed {asyncio.run(backfill())} photos")
@@ -155,10 +155,19 @@ export default function MemoryCircles({ user, journeys }: Props) {
   const loadFriends = async () => {
     if (!user?.uid) return;
     try {
-      const res = await fetch(`/api/friends?user_id=${user!.uid}`);
-      if (!res.ok) throw new Error('Failed to fetch friends');
-      const data = await res.json();
-      setFriends(Array.isArray(data) ? data : []);
+      // The list is paginated; follow X-Next-Cursor until the last page
+      const all: Friend[] = [];
+      let cursor: string | null = null;
+      do {
+        const params = new URLSearchParams({ user_id: user!.uid });
+        if (cursor) params.set('cursor', cursor);
+        const res = await fetch(`/api/friends?${params}`);
+        if (!res.ok) throw new Error('Failed to fetch friends');
+        const data = await res.json();
+        if (Array.isArray(data)) all.push(...data);
+        cursor = res.headers.get('X-Next-Cursor');
+      } while (cursor);
+      setFriends(all);
     } catch (err) {
       console.error('Failed to load friends:', err);
     }
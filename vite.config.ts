@@ -9,6 +9,7 @@ export default defineConfig({
   },
   server: {
     proxy: {
+      // Everything the backend serves lives under /api, including uploaded media (/api/media/<key>)
       '/api': {
         target: 'http://localhost:8000',  // Python backend
         changeOrigin: true,